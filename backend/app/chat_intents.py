@@ -0,0 +1,133 @@
+"""
+Intent dispatch for the chatbot
+
+IntentMatcher is built once from ordered rules. All keywords are compiled
+into a single regex, scanned in one pass per message. The rules are then
+checked in priority order against the bitmask of keyword groups found, so
+adding keywords or intents does not add more passes over the text.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex alternation of words factored by common prefix
+
+    Each position in the text then costs one branch per character instead of
+    one attempt per keyword. Longer words win over their prefixes.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Optional tail when a word ends here
+        return f"(?:{pattern})?" if "" in node else pattern
+
+    return build(trie)
+
+
+class IntentMatcher:
+    """Maps a lower-cased message to the first matching intent
+
+    Rule kinds, checked in the order they were added:
+        prefix:   message starts with one of the phrases (optionally with at
+                  most max_extra_chars after it)
+        keywords: every group has at least one keyword somewhere in the message
+        exact:    message equals one of the phrases
+    """
+
+    def __init__(self):
+        self._rules: List[Tuple[str, str, Any]] = []
+        # keyword -> bitmask of the keyword groups it belongs to
+        self._keyword_bits: Dict[str, int] = {}
+        self._group_count = 0
+        self._pattern: Optional[re.Pattern] = None
+        self._bits_by_match: Dict[str, int] = {}
+
+    def add_prefix(self, intent: str, phrases: Iterable[str], max_extra_chars: Optional[int] = None) -> "IntentMatcher":
+        """Match messages that start with a phrase"""
+        phrases = [phrase.lower() for phrase in phrases]
+        self._rules.append((intent, "prefix", (phrases, max_extra_chars)))
+        return self
+
+    def add_keywords(self, intent: str, *groups: Iterable[str]) -> "IntentMatcher":
+        """Match messages containing a keyword of every group (substring match)"""
+        required = 0
+        for words in groups:
+            bit = 1 << self._group_count
+            self._group_count += 1
+            for word in words:
+                word = word.lower()
+                self._keyword_bits[word] = self._keyword_bits.get(word, 0) | bit
+            required |= bit
+        self._rules.append((intent, "keywords", required))
+        return self
+
+    def add_exact(self, intent: str, phrases: Iterable[str]) -> "IntentMatcher":
+        """Match messages equal to a phrase"""
+        self._rules.append((intent, "exact", frozenset(phrase.lower() for phrase in phrases)))
+        return self
+
+    def compile(self) -> "IntentMatcher":
+        """Build the combined keyword regex; call once after adding rules"""
+        if not self._keyword_bits:
+            return self
+        # The lookahead reports the longest keyword starting at every
+        # position; a hit also counts for the shorter keywords it starts
+        # with ("como estás" -> "como"), so no occurrence is missed.
+        self._bits_by_match = {
+            keyword: self._prefix_bits(keyword) for keyword in self._keyword_bits
+        }
+        self._pattern = re.compile(f"(?=({_trie_pattern(self._keyword_bits)}))")
+        return self
+
+    def _prefix_bits(self, keyword: str) -> int:
+        bits = 0
+        for other, other_bits in self._keyword_bits.items():
+            if keyword.startswith(other):
+                bits |= other_bits
+        return bits
+
+    def keyword_bits(self, text: str) -> int:
+        """Bitmask of the keyword groups with an occurrence in text"""
+        found = 0
+        if self._pattern is not None:
+            bits_by_match = self._bits_by_match
+            for keyword in self._pattern.findall(text):
+                found |= bits_by_match[keyword]
+        return found
+
+    def match(self, text: str) -> Tuple[Optional[str], Optional[str]]:
+        """First intent whose rule matches text
+
+        Args:
+            text: Lower-cased, stripped message
+
+        Returns:
+            (intent, matched phrase) for prefix rules, (intent, None) for the
+            others, or (None, None) if nothing matched
+        """
+        found: Optional[int] = None
+        for intent, kind, data in self._rules:
+            if kind == "exact":
+                if text in data:
+                    return intent, None
+            elif kind == "keywords":
+                if found is None:
+                    found = self.keyword_bits(text)
+                if found & data == data:
+                    return intent, None
+            else:
+                phrases, max_extra_chars = data
+                for phrase in phrases:
+                    if text.startswith(phrase) and (max_extra_chars is None or len(text) <= len(phrase) + max_extra_chars):
+                        return intent, phrase
+        return None, None
@@ -0,0 +1,247 @@
+"""
+Chatbot session storage
+
+Sessions keep only their last `history_size` messages (a ring buffer), are
+dropped after `ttl_seconds` without activity, and at most `max_sessions`
+are kept, least recently active evicted first. The in-memory store is per
+worker; the SQLite store survives restarts and is shared by all workers.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class SessionStore:
+    """Bounded in-memory session store with idle TTL and LRU eviction"""
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 3600.0, history_size: int = 20):
+        """Initialize session store
+
+        Args:
+            max_sessions: Maximum number of sessions kept
+            ttl_seconds: Idle time after which a session is dropped
+            history_size: Messages kept per session
+        """
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl_seconds
+        self.history_size = max(1, history_size)
+
+        # session_id -> (last activity, message ring buffer), least recently active first
+        self._sessions: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def _evict(self, now: float) -> None:
+        """Drop idle sessions and the least recently active beyond the limit (lock held)"""
+        cutoff = now - self.ttl
+        while self._sessions:
+            session_id, (last_seen, _) = next(iter(self._sessions.items()))
+            if last_seen < cutoff:
+                self.expired += 1
+            elif len(self._sessions) > self.max_sessions:
+                self.evicted += 1
+            else:
+                break
+            del self._sessions[session_id]
+
+    def _touch(self, session_id: str, now: float) -> Deque[Dict[str, Any]]:
+        """Session's message buffer, created if needed, marked as most recent (lock held)"""
+        entry = self._sessions.get(session_id)
+        if entry is not None and entry[0] < now - self.ttl:
+            self.expired += 1
+            entry = None
+        if entry is None:
+            entry = [now, deque(maxlen=self.history_size)]
+            self._sessions[session_id] = entry
+        entry[0] = now
+        self._sessions.move_to_end(session_id)
+        return entry[1]
+
+    def append(self, session_id: str, message: Dict[str, Any]) -> None:
+        """Record a message, dropping the oldest one past history_size"""
+        now = time.monotonic()
+        with self._lock:
+            self._touch(session_id, now).append(message)
+            self._evict(now)
+
+    def recent(self, session_id: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Last `limit` messages of a session, oldest first"""
+        now = time.monotonic()
+        with self._lock:
+            messages = list(self._touch(session_id, now))
+            self._evict(now)
+        return messages[-limit:]
+
+    def reset(self, session_id: str) -> None:
+        """Forget a session's messages"""
+        now = time.monotonic()
+        with self._lock:
+            self._touch(session_id, now).clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._evict(time.monotonic())
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl,
+                "history_size": self.history_size,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    session_id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_seen ON chat_sessions (last_seen);
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL REFERENCES chat_sessions (session_id) ON DELETE CASCADE,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, id);
+"""
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store in a SQLite file, shared by every worker using it"""
+
+    def __init__(
+        self,
+        filepath: str = "data/chat_sessions.db",
+        max_sessions: int = 10000,
+        ttl_seconds: float = 3600.0,
+        history_size: int = 20,
+    ):
+        """Initialize SQLite session store
+
+        Args:
+            filepath: Path to the SQLite database file
+            max_sessions: Maximum number of sessions kept
+            ttl_seconds: Idle time after which a session is dropped
+            history_size: Messages kept per session
+        """
+        super().__init__(max_sessions, ttl_seconds, history_size)
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.filepath = filepath
+        self._conn = sqlite3.connect(filepath, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SQLITE_SCHEMA)
+
+    def _write(self, session_id: str, statements: List[tuple]) -> None:
+        """Touch the session, run statements and evict, in one transaction"""
+        # Wall-clock time, since several processes share last_seen
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.expired += self._conn.execute(
+                    "DELETE FROM chat_sessions WHERE session_id = ? AND last_seen < ?",
+                    (session_id, now - self.ttl),
+                ).rowcount
+                created = self._conn.execute(
+                    "INSERT OR IGNORE INTO chat_sessions (session_id, last_seen) VALUES (?, ?)",
+                    (session_id, now),
+                ).rowcount
+                if not created:
+                    self._conn.execute(
+                        "UPDATE chat_sessions SET last_seen = ? WHERE session_id = ?", (now, session_id)
+                    )
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+                self.expired += self._conn.execute(
+                    "DELETE FROM chat_sessions WHERE last_seen < ?", (now - self.ttl,)
+                ).rowcount
+                if created:
+                    # Only a new session can push the store past max_sessions
+                    self.evicted += self._conn.execute(
+                        "DELETE FROM chat_sessions WHERE session_id IN "
+                        "(SELECT session_id FROM chat_sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?)",
+                        (self.max_sessions,),
+                    ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def append(self, session_id: str, message: Dict[str, Any]) -> None:
+        """Record a message, dropping the oldest one past history_size"""
+        self._write(session_id, [
+            (
+                "INSERT INTO chat_messages (session_id, message) VALUES (?, ?)",
+                (session_id, json.dumps(message, ensure_ascii=False)),
+            ),
+            (
+                "DELETE FROM chat_messages WHERE session_id = ? AND id NOT IN "
+                "(SELECT id FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.history_size),
+            ),
+        ])
+
+    def recent(self, session_id: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Last `limit` messages of a session, oldest first"""
+        self._write(session_id, [])
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT message FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, limit),
+            ).fetchall()
+        return [json.loads(message) for (message,) in reversed(rows)]
+
+    def reset(self, session_id: str) -> None:
+        """Forget a session's messages"""
+        self._write(session_id, [("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (sessions,) = self._conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()
+        return {
+            "backend": "sqlite",
+            "sessions": sessions,
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl,
+            "history_size": self.history_size,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+
+# Global instance
+_session_store: Optional[SessionStore] = None
+_session_store_lock = threading.Lock()
+
+
+def create_session_store() -> SessionStore:
+    """Create the session store selected by CHAT_SESSION_BACKEND (memory or sqlite)"""
+    options = {
+        "max_sessions": int(os.getenv("CHAT_SESSION_MAX", "10000")),
+        "ttl_seconds": float(os.getenv("CHAT_SESSION_TTL_SECONDS", "3600")),
+        "history_size": int(os.getenv("CHAT_SESSION_HISTORY", "20")),
+    }
+    if os.getenv("CHAT_SESSION_BACKEND", "memory").lower() == "sqlite":
+        return SQLiteSessionStore(os.getenv("CHAT_SESSION_SQLITE_PATH", "data/chat_sessions.db"), **options)
+    return SessionStore(**options)
+
+
+def get_session_store() -> SessionStore:
+    """Get or create the global session store instance"""
+    global _session_store
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                _session_store = create_session_store()
+    return _session_store
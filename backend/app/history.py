@@ -1,24 +1,146 @@
 """
 History management module for storing and retrieving fraud detection predictions
 """
+import base64
+import bisect
 import json
+import logging
 import os
+import tempfile
+import threading
+import time
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import Callable, Iterator, List, Dict, Any, Optional, Tuple
 from pathlib import Path
 
+from app.history_stats import HistoryStats, load_stats, replace_keeping_mode, save_stats
+from app.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+SortKey = Tuple[str, str, int]
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(direction: str, key: SortKey) -> str:
+    """Opaque cursor for keyset pagination
+
+    Args:
+        direction: "next" (older items) or "prev" (newer items)
+        key: Sort key of the boundary item (see HistoryManager._sort_key)
+    """
+    raw = json.dumps([direction, key[0], key[1], -key[2]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, SortKey]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, timestamp, transaction_id, sequence_number = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid pagination cursor") from e
+    if (
+        direction not in ("next", "prev")
+        or not isinstance(timestamp, str)
+        or not isinstance(transaction_id, str)
+        or type(sequence_number) is not int
+    ):
+        raise InvalidCursorError("Invalid pagination cursor")
+    return direction, (timestamp, transaction_id, -sequence_number)
+
+
 class HistoryManager:
     """Manages prediction history persistence"""
     
-    def __init__(self, filepath: str = "data/history.json"):
+    def __init__(
+        self,
+        filepath: str = "data/history.json",
+        cache_max_items: int = 500_000,
+        stats_persist_seconds: float = 30.0,
+    ):
         """Initialize history manager
         
         Args:
             filepath: Path to JSON file where history will be stored
+            cache_max_items: Maximum number of predictions kept in memory
+            stats_persist_seconds: Minimum interval between saves of the aggregates
         """
         self.filepath = filepath
+        self.stats_persist_seconds = stats_persist_seconds
         self._ensure_directory()
         self._ensure_file()
+        self._init_cache(cache_max_items)
+        self._init_stats()
+
+    def _init_cache(self, cache_max_items: int) -> None:
+        """Set up the in-memory cache of parsed, sorted predictions
+
+        The cache holds predictions in ascending (timestamp, transaction_id)
+        order, so reading it backwards gives the newest-first order of
+        get_all_predictions and the sorted keys double as the keyset index. It is updated in place on
+        writes and reloaded when the storage signature (mtime/size) changes,
+        i.e. when another process wrote. Past cache_max_items only the newest
+        predictions stay cached; reads that need older ones go to storage.
+        """
+        self._lock = threading.RLock()
+        self.cache_max_items = max(1, cache_max_items)
+        self._cache: Optional[List[Dict[str, Any]]] = None
+        self._cache_keys: List[SortKey] = []
+        self._cache_complete = True
+        self._cache_total = 0
+        self._cache_signature: Any = None
+        self._id_index: Dict[Any, Dict[str, Any]] = {}
+        self._stats: Optional[HistoryStats] = None
+        self._stats_signature: Any = None
+        self._stats_dirty = False
+        self._next_stats_persist = 0.0
+
+    def _stats_path(self) -> str:
+        """File where running aggregates are persisted, next to the history"""
+        return os.path.splitext(self.filepath)[0] + ".stats.json"
+
+    def _init_stats(self) -> None:
+        """Load persisted aggregates, or rebuild them from the stored history
+
+        Persisted aggregates are only trusted when they were saved against
+        the current storage signature; otherwise the history is parsed once
+        (which also warms the cache).
+        """
+        with self._lock:
+            signature = self._source_signature()
+            stats, saved_signature = load_stats(self._stats_path())
+            if stats is not None and saved_signature == signature:
+                self._stats = stats
+                self._stats_signature = signature
+            else:
+                self._reload_cache(signature)
+
+    def _persist_stats(self, force: bool = True) -> None:
+        """Save the aggregates, at most every stats_persist_seconds unless forced
+
+        Skipped saves only leave the file behind the storage signature, which
+        makes the next startup rebuild the aggregates instead of trusting it.
+        """
+        now = time.monotonic()
+        if not force and now < self._next_stats_persist:
+            self._stats_dirty = True
+            return
+        try:
+            save_stats(self._stats_path(), self._stats, self._stats_signature)
+        except OSError as e:
+            logger.warning("Could not persist history statistics: %s", e)
+        self._stats_dirty = False
+        self._next_stats_persist = now + self.stats_persist_seconds
+
+    def flush_stats(self) -> None:
+        """Save aggregates whose periodic save is still pending (e.g. at shutdown)"""
+        with self._lock:
+            if self._stats_dirty and self._stats is not None:
+                self._persist_stats()
     
     def _ensure_directory(self) -> None:
         """Ensure the directory exists"""
@@ -35,15 +157,156 @@ class HistoryManager:
     def _load_history(self) -> Dict[str, Any]:
         """Load history from JSON file"""
         try:
-            with open(self.filepath, 'r') as f:
+            with stage_timer("history_load"), open(self.filepath, 'r') as f:
                 return json.load(f)
         except (json.JSONDecodeError, FileNotFoundError):
             return {"predictions": []}
     
     def _save_history(self, data: Dict[str, Any]) -> None:
-        """Save history to JSON file"""
-        with open(self.filepath, 'w') as f:
-            json.dump(data, f, indent=2)
+        """Save history to JSON file
+
+        Writes a temporary file next to the history and renames it over the
+        old one, so readers and crashes never see a half-written file.
+        """
+        directory = os.path.dirname(self.filepath) or "."
+        with stage_timer("history_save"):
+            fd, tmp_path = tempfile.mkstemp(prefix=".history-", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f, indent=2)
+                replace_keeping_mode(tmp_path, self.filepath)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def _source_signature(self) -> Any:
+        """Cheap fingerprint of the stored history, used to detect outside writes"""
+        try:
+            stat = os.stat(self.filepath)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _sort_key(prediction: Dict[str, Any]) -> SortKey:
+        """Total order used for listing: (timestamp, transaction_id), then insertion
+
+        Ascending keys put a later insert before an earlier one with the same
+        timestamp and ID, so newest-first listings keep such ties in insertion
+        order. The sequence number makes every key unique, which keeps keyset
+        pages from skipping ties at their boundaries.
+        """
+        return (
+            prediction.get("timestamp", ""),
+            prediction.get("transaction_id") or prediction.get("id") or "",
+            -(prediction.get("sequence_number") or 0),
+        )
+
+    def _reload_cache(self, signature: Any) -> None:
+        """Parse and sort the stored history into the cache (lock held)"""
+        predictions = self._load_history().get("predictions", [])
+        with stage_timer("stats_computation"):
+            self._stats = HistoryStats.from_predictions(predictions)
+        self._stats_signature = signature
+        self._persist_stats()
+
+        # Reverse first so the stable sort also leaves ties without a
+        # sequence number newest-inserted first
+        predictions.reverse()
+        predictions.sort(key=self._sort_key)
+
+        self._cache_total = len(predictions)
+        self._cache_complete = len(predictions) <= self.cache_max_items
+        if not self._cache_complete:
+            del predictions[:len(predictions) - self.cache_max_items]
+
+        self._cache = predictions
+        self._cache_keys = [self._sort_key(p) for p in predictions]
+        self._cache_signature = signature
+        self._id_index = {}
+        for entry in predictions:
+            self._index_entry(entry)
+
+    def _index_entry(self, entry: Dict[str, Any]) -> None:
+        """Register a cached prediction under both of its ID forms (lock held)
+
+        The first match wins, like the linear scan this replaces.
+        """
+        for field in ("id", "transaction_id"):
+            value = entry.get(field)
+            if value is not None:
+                self._id_index.setdefault(value, entry)
+
+    def _unindex_entry(self, entry: Dict[str, Any]) -> None:
+        """Drop an evicted prediction from the ID index (lock held)"""
+        for field in ("id", "transaction_id"):
+            value = entry.get(field)
+            if value is not None and self._id_index.get(value) is entry:
+                del self._id_index[value]
+
+    def _ensure_cache(self) -> List[Dict[str, Any]]:
+        """Return the cache, reloading it if storage changed (lock held)"""
+        signature = self._source_signature()
+        if self._cache is None or signature != self._cache_signature:
+            self._reload_cache(signature)
+        return self._cache
+
+    def _cache_after_write(self, entries: List[Dict[str, Any]], signature_before: Any) -> None:
+        """Apply our own write to the cache and aggregates in place (lock held)
+
+        If storage had already changed before the write (another process),
+        the stale state is dropped and rebuilt on the next read instead.
+        """
+        signature_after = self._source_signature()
+
+        if self._stats is not None and signature_before == self._stats_signature:
+            self._stats.add_many(entries)
+            self._stats_signature = signature_after
+            self._persist_stats(force=False)
+        else:
+            self._stats = None
+            self._stats_dirty = False
+
+        if self._cache is None or signature_before != self._cache_signature:
+            self._cache = None
+            return
+
+        for entry in entries:
+            key = self._sort_key(entry)
+            index = bisect.bisect_left(self._cache_keys, key)
+            self._cache_keys.insert(index, key)
+            self._cache.insert(index, entry)
+            self._index_entry(entry)
+
+        self._cache_total += len(entries)
+        excess = len(self._cache) - self.cache_max_items
+        if excess > 0:
+            # Evict the oldest predictions; they stay available from storage
+            for entry in self._cache[:excess]:
+                self._unindex_entry(entry)
+            del self._cache[:excess]
+            del self._cache_keys[:excess]
+            self._cache_complete = False
+
+        self._cache_signature = signature_after
+
+    def _cache_clear(self) -> None:
+        """Reset the cache after the history was cleared (lock held)"""
+        self._cache = []
+        self._cache_keys = []
+        self._id_index = {}
+        self._cache_complete = True
+        self._cache_total = 0
+        self._cache_signature = self._source_signature()
+        self._stats = HistoryStats()
+        self._stats_signature = self._cache_signature
+        self._persist_stats()
+
+    def _sorted_from_storage(self) -> List[Dict[str, Any]]:
+        """Full newest-first list read from storage, bypassing the cache"""
+        predictions = self._load_history().get("predictions", [])
+        return sorted(predictions, key=self._sort_key, reverse=True)
     
     def add_prediction(self, prediction: Dict[str, Any]) -> Dict[str, Any]:
         """Add a new prediction to history
@@ -54,31 +317,88 @@ class HistoryManager:
         Returns:
             The saved prediction with metadata
         """
-        history = self._load_history()
-        
-        # Add metadata
-        prediction_entry = {
-            **prediction,
-            "saved_at": datetime.now().isoformat(),
-            "sequence_number": len(history["predictions"]) + 1
-        }
-        
-        history["predictions"].append(prediction_entry)
-        self._save_history(history)
-        
+        with self._lock:
+            signature = self._source_signature()
+            history = self._load_history()
+            
+            # Add metadata
+            prediction_entry = {
+                **prediction,
+                "saved_at": datetime.now().isoformat(),
+                "sequence_number": len(history["predictions"]) + 1
+            }
+            
+            history["predictions"].append(prediction_entry)
+            self._save_history(history)
+            self._cache_after_write([prediction_entry], signature)
+
         return prediction_entry
-    
+
+    def add_predictions(self, predictions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add several predictions with a single load/save of the history file
+
+        Args:
+            predictions: The prediction responses to save
+
+        Returns:
+            The saved predictions with metadata
+        """
+        with self._lock:
+            signature = self._source_signature()
+            history = self._load_history()
+            saved_at = datetime.now().isoformat()
+            start = len(history["predictions"])
+
+            entries = [
+                {
+                    **prediction,
+                    "saved_at": saved_at,
+                    "sequence_number": start + i + 1
+                }
+                for i, prediction in enumerate(predictions)
+            ]
+
+            history["predictions"].extend(entries)
+            self._save_history(history)
+            self._cache_after_write(entries, signature)
+
+        return entries
+
     def get_all_predictions(self) -> List[Dict[str, Any]]:
         """Get all predictions sorted by timestamp (newest first)
         
         Returns:
             List of all predictions
         """
-        history = self._load_history()
-        predictions = history.get("predictions", [])
-        # Sort by timestamp descending (newest first)
-        return sorted(predictions, key=lambda x: x.get("timestamp", ""), reverse=True)
+        with self._lock:
+            cache = self._ensure_cache()
+            if self._cache_complete:
+                return cache[::-1]
+        return self._sorted_from_storage()
     
+    def get_prediction(self, prediction_id: str) -> Optional[Dict[str, Any]]:
+        """Get one prediction by its id or transaction_id
+
+        Served from the in-memory ID index in O(1); storage is only scanned
+        when the ID is not cached and older predictions were evicted.
+
+        Args:
+            prediction_id: Value of the prediction's id or transaction_id
+
+        Returns:
+            The stored prediction, or None if there is none with that ID
+        """
+        with self._lock:
+            self._ensure_cache()
+            entry = self._id_index.get(prediction_id)
+            if entry is not None or self._cache_complete:
+                return entry
+
+        for p in self._load_history().get("predictions", []):
+            if p.get("id") == prediction_id or p.get("transaction_id") == prediction_id:
+                return p
+        return None
+
     def get_predictions_paginated(
         self, 
         page: int = 1, 
@@ -95,11 +415,19 @@ class HistoryManager:
         Returns:
             Dictionary with paginated predictions and metadata
         """
-        predictions = self.get_all_predictions()
-        
-        # Apply filters if provided
-        if filters:
-            predictions = self._apply_filters(predictions, filters)
+        with self._lock:
+            cache = self._ensure_cache()
+            if not filters and (self._cache_complete or page * items_per_page <= len(cache)):
+                # Unfiltered page served straight from the cached window
+                return self._paginate_cached(cache, page, items_per_page)
+            complete = self._cache_complete
+            predictions = self._apply_filters(cache[::-1], filters) if complete else None
+
+        if predictions is None:
+            predictions = self._sorted_from_storage()
+            # Apply filters if provided
+            if filters:
+                predictions = self._apply_filters(predictions, filters)
         
         # Calculate pagination
         total_items = len(predictions)
@@ -107,8 +435,6 @@ class HistoryManager:
         
         # Validate page number
         page = max(1, min(page, max(1, total_pages)))
-
-        print(page)
         
         start_idx = (page - 1) * items_per_page
         end_idx = start_idx + items_per_page
@@ -125,6 +451,185 @@ class HistoryManager:
             "has_previous": page > 1,
         }
     
+    def _paginate_cached(
+        self,
+        cache: List[Dict[str, Any]],
+        page: int,
+        items_per_page: int
+    ) -> Dict[str, Any]:
+        """Slice one newest-first page out of the ascending cache (lock held)"""
+        total_items = self._cache_total
+        total_pages = (total_items + items_per_page - 1) // items_per_page
+        page = max(1, min(page, max(1, total_pages)))
+
+        # Newest-first index i lives at cache[len - 1 - i]
+        stop = len(cache) - (page - 1) * items_per_page
+        start = max(0, stop - items_per_page)
+        data = cache[start:stop][::-1] if stop > 0 else []
+
+        return {
+            "data": data,
+            "page": page,
+            "items_per_page": items_per_page,
+            "total_items": total_items,
+            "total_pages": total_pages,
+            "has_next": page < total_pages,
+            "has_previous": page > 1,
+        }
+
+    def get_predictions_by_cursor(
+        self,
+        cursor: Optional[str] = None,
+        items_per_page: int = 20,
+        filters: Optional[Dict[str, Any]] = None,
+        predicate: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> Dict[str, Any]:
+        """Get a newest-first page using keyset (cursor) pagination
+
+        Pages are anchored on the sort key (timestamp, transaction_id,
+        insertion) of their boundary items, so they do not shift when new predictions arrive and
+        a deep page costs O(log n + page size) on the sorted cache.
+
+        Args:
+            cursor: next_cursor/prev_cursor from a previous page, None for the newest page
+            items_per_page: Number of items per page
+            filters: Optional filters (risk_level, is_fraud, date_from, date_to)
+            predicate: Optional extra condition an item must satisfy
+
+        Returns:
+            Dictionary with the page and its next/prev cursors
+
+        Raises:
+            InvalidCursorError: If the cursor cannot be decoded
+        """
+        direction, key = decode_cursor(cursor) if cursor else ("next", None)
+        match = self._filter_predicate(filters, predicate)
+
+        with self._lock:
+            cache = self._ensure_cache()
+            if self._cache_complete:
+                return self._keyset_page(cache, self._cache_keys, direction, key, items_per_page, match)
+
+        entries = self._sorted_from_storage()
+        entries.reverse()
+        return self._keyset_page(entries, [self._sort_key(p) for p in entries], direction, key, items_per_page, match)
+
+    def iter_predictions(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """Iterate over predictions newest first, for streaming exports
+
+        Walks the history in keyset chunks, taking the lock once per chunk,
+        so memory stays constant and concurrent writes neither block nor
+        shift the export.
+
+        Args:
+            filters: Optional filters (risk_level, is_fraud, date_from, date_to)
+            chunk_size: Predictions fetched per chunk
+
+        Yields:
+            Matching predictions, newest first
+        """
+        with self._lock:
+            self._ensure_cache()
+            complete = self._cache_complete
+
+        if not complete:
+            # Older predictions only exist in storage, which is read whole anyway
+            match = self._filter_predicate(filters)
+            for prediction in self._sorted_from_storage():
+                if match is None or match(prediction):
+                    yield prediction
+            return
+
+        yield from self._iter_by_cursor(filters, chunk_size)
+
+    def _iter_by_cursor(self, filters: Optional[Dict[str, Any]], chunk_size: int) -> Iterator[Dict[str, Any]]:
+        cursor = None
+        while True:
+            page = self.get_predictions_by_cursor(cursor, chunk_size, filters)
+            yield from page["data"]
+            if not page["has_next"]:
+                return
+            cursor = page["next_cursor"]
+
+    def _keyset_page(
+        self,
+        entries: List[Dict[str, Any]],
+        keys: List[SortKey],
+        direction: str,
+        key: Optional[SortKey],
+        items_per_page: int,
+        match: Optional[Callable[[Dict[str, Any]], bool]]
+    ) -> Dict[str, Any]:
+        """Collect one page from ascending entries around a cursor key"""
+        data = []
+        more = False
+
+        if direction == "next":
+            # Older items: walk down from just below the cursor key
+            index = bisect.bisect_left(keys, key) - 1 if key is not None else len(entries) - 1
+            step = -1
+        else:
+            # Newer items: walk up from just above the cursor key
+            index = bisect.bisect_right(keys, key)
+            step = 1
+
+        while 0 <= index < len(entries):
+            entry = entries[index]
+            index += step
+            if match is not None and not match(entry):
+                continue
+            if len(data) == items_per_page:
+                more = True
+                break
+            data.append(entry)
+
+        if direction == "prev":
+            data.reverse()
+            has_next, has_previous = True, more
+        else:
+            has_next, has_previous = more, key is not None
+
+        return {
+            "data": data,
+            "items_per_page": items_per_page,
+            "next_cursor": encode_cursor("next", self._sort_key(data[-1])) if data and has_next else None,
+            "prev_cursor": encode_cursor("prev", self._sort_key(data[0])) if data and has_previous else None,
+            "has_next": bool(data) and has_next,
+            "has_previous": bool(data) and has_previous,
+        }
+
+    @staticmethod
+    def _filter_predicate(
+        filters: Optional[Dict[str, Any]],
+        predicate: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> Optional[Callable[[Dict[str, Any]], bool]]:
+        """Single-item version of _apply_filters, combined with an extra predicate"""
+        filters = filters or {}
+        risk_level = filters.get("risk_level")
+        is_fraud = filters.get("is_fraud")
+        date_from = filters.get("date_from")
+        date_to = filters.get("date_to")
+
+        if not (risk_level or is_fraud is not None or date_from or date_to or predicate):
+            return None
+
+        def match(p: Dict[str, Any]) -> bool:
+            if risk_level and p.get("risk_level") != risk_level:
+                return False
+            if is_fraud is not None and p.get("is_fraud") != is_fraud:
+                return False
+            if date_from and p.get("timestamp", "") < date_from:
+                return False
+            if date_to and p.get("timestamp", "") > date_to:
+                return False
+            return predicate is None or predicate(p)
+
+        return match
+
     def _apply_filters(
         self, 
         predictions: List[Dict[str, Any]], 
@@ -170,52 +675,80 @@ class HistoryManager:
         Returns:
             Dictionary with various statistics
         """
-        predictions = self.get_all_predictions()
-        
-        if not predictions:
-            return {
-                "total_predictions": 0,
-                "total_fraud_detected": 0,
-                "fraud_rate": 0.0,
-                "average_risk_score": 0.0,
-                "risk_distribution": {
-                    "LOW": 0,
-                    "MEDIUM": 0,
-                    "HIGH": 0,
-                    "CRITICAL": 0
-                }
-            }
-        
-        total = len(predictions)
-        fraud_count = sum(1 for p in predictions if p.get("is_fraud"))
-        fraud_rate = fraud_count / total if total > 0 else 0
-        avg_risk = sum(p.get("risk_score", 0) for p in predictions) / total if total > 0 else 0
-        
-        risk_distribution = {
-            "LOW": sum(1 for p in predictions if p.get("risk_level") == "LOW"),
-            "MEDIUM": sum(1 for p in predictions if p.get("risk_level") == "MEDIUM"),
-            "HIGH": sum(1 for p in predictions if p.get("risk_level") == "HIGH"),
-            "CRITICAL": sum(1 for p in predictions if p.get("risk_level") == "CRITICAL"),
-        }
-        
-        return {
-            "total_predictions": total,
-            "total_fraud_detected": fraud_count,
-            "fraud_rate": round(fraud_rate, 4),
-            "average_risk_score": round(avg_risk, 2),
-            "risk_distribution": risk_distribution
-        }
+        with self._lock:
+            signature = self._source_signature()
+            if self._stats is None or signature != self._stats_signature:
+                self._reload_cache(signature)
+            return self._stats.to_response()
+
+    def get_trends(self, granularity: str = "hour", limit: int = 24) -> List[Dict[str, Any]]:
+        """Get per-hour or per-day fraud trends from the incremental rollups
+
+        Args:
+            granularity: "hour" or "day"
+            limit: Number of buckets, ending with the current one
+
+        Returns:
+            List of buckets, oldest first
+        """
+        with self._lock:
+            signature = self._source_signature()
+            if self._stats is None or signature != self._stats_signature:
+                self._reload_cache(signature)
+            return self._stats.trends(granularity, limit)
     
     def clear_history(self) -> None:
         """Clear all history"""
-        self._save_history({"predictions": []})
+        with self._lock:
+            self._save_history({"predictions": []})
+            self._cache_clear()
 
 # Global instance
 _history_manager: Optional[HistoryManager] = None
 
+def create_history_manager() -> HistoryManager:
+    """Create the history manager selected by HISTORY_BACKEND
+
+    HISTORY_BACKEND=json (default) keeps everything in data/history.json;
+    HISTORY_BACKEND=segments appends to rolling JSONL files in data/history/;
+    HISTORY_BACKEND=sqlite uses an indexed SQLite database (data/history.db).
+    """
+    backend = os.getenv("HISTORY_BACKEND", "json").lower()
+    cache_max_items = int(os.getenv("HISTORY_CACHE_MAX_ITEMS", "500000"))
+    stats_persist_seconds = float(os.getenv("HISTORY_STATS_PERSIST_SECONDS", "30"))
+
+    if backend == "sqlite":
+        from app.history_sqlite import SQLiteHistoryManager
+        return SQLiteHistoryManager(
+            filepath=os.getenv("HISTORY_SQLITE_PATH", "data/history.db"),
+            legacy_filepath=os.getenv("HISTORY_FILE", "data/history.json"),
+        )
+
+    if backend == "segments":
+        from app.history_segments import SegmentedHistoryManager
+        return SegmentedHistoryManager(
+            directory=os.getenv("HISTORY_SEGMENT_DIR", "data/history"),
+            max_segment_bytes=int(float(os.getenv("HISTORY_SEGMENT_MAX_MB", "64")) * 1024 * 1024),
+            max_segment_age_seconds=float(os.getenv("HISTORY_SEGMENT_MAX_AGE_HOURS", "24")) * 3600,
+            legacy_filepath=os.getenv("HISTORY_FILE", "data/history.json"),
+            cache_max_items=cache_max_items,
+            stats_persist_seconds=stats_persist_seconds,
+        )
+
+    return HistoryManager(
+        os.getenv("HISTORY_FILE", "data/history.json"),
+        cache_max_items=cache_max_items,
+        stats_persist_seconds=stats_persist_seconds,
+    )
+
 def get_history_manager() -> HistoryManager:
     """Get or create the global history manager instance"""
     global _history_manager
     if _history_manager is None:
-        _history_manager = HistoryManager()
+        _history_manager = create_history_manager()
     return _history_manager
+
+def flush_history_stats() -> None:
+    """Save pending aggregates of the global history manager, if it was created"""
+    if _history_manager is not None:
+        _history_manager.flush_stats()
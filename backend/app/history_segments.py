@@ -0,0 +1,311 @@
+"""
+Append-only JSONL storage for prediction history
+
+Each prediction is appended as one compact JSON line to the active segment
+file. Segments roll over by size or age, so a write costs one small append
+instead of rewriting the whole history. Several processes may share the
+directory: writes take an exclusive lock on it and number their
+predictions after the newest stored line.
+"""
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are only serialized within the process
+    fcntl = None
+
+from app.history import HistoryManager
+from app.metrics import stage_timer
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+MIGRATION_MARKER = ".migrated"
+LOCK_FILE = ".lock"
+
+
+class SegmentedHistoryManager(HistoryManager):
+    """Manages prediction history as rolling JSONL segment files"""
+
+    def __init__(
+        self,
+        directory: str = "data/history",
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        max_segment_age_seconds: float = 24 * 3600,
+        legacy_filepath: Optional[str] = "data/history.json",
+        cache_max_items: int = 500_000,
+        stats_persist_seconds: float = 30.0,
+    ):
+        """Initialize segmented history manager
+
+        Args:
+            directory: Directory holding the segment files
+            max_segment_bytes: Roll over to a new segment past this size
+            max_segment_age_seconds: Roll over to a new segment past this age
+            legacy_filepath: history.json to import once, if present
+            cache_max_items: Maximum number of predictions kept in memory
+            stats_persist_seconds: Minimum interval between saves of the aggregates
+        """
+        self.directory = directory
+        self.stats_persist_seconds = stats_persist_seconds
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age_seconds = max_segment_age_seconds
+        self._init_cache(cache_max_items)
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._sealed_signature: Tuple[Tuple[str, int, int], ...] = ()
+        self._scan_segments()
+        if legacy_filepath:
+            with self._directory_lock():
+                self._migrate_legacy(legacy_filepath)
+
+        self._init_stats()
+
+    # Segment files
+
+    def _segment_paths(self) -> List[str]:
+        """Segment files in write order"""
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        return [os.path.join(self.directory, name) for name in names]
+
+    @staticmethod
+    def _parse_segment_name(path: str) -> Tuple[int, datetime]:
+        """Return (index, creation time) encoded in a segment file name"""
+        stem = os.path.basename(path)[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+        index, created = stem.split("-", 1)
+        return int(index), datetime.strptime(created, "%Y%m%dT%H%M%S")
+
+    def _new_segment_path(self, index: int) -> str:
+        created = datetime.now().strftime("%Y%m%dT%H%M%S")
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{index:06d}-{created}{SEGMENT_SUFFIX}")
+
+    @staticmethod
+    def _segment_signature(path: str) -> Tuple[str, int, int]:
+        stat = os.stat(path)
+        return (os.path.basename(path), stat.st_size, stat.st_mtime_ns)
+
+    def _scan_segments(self) -> None:
+        """Rebuild the tracked segment state from the directory
+
+        Segments before the newest one are full and no longer change, so
+        fingerprints already known for them are reused instead of stat'ed
+        again. The directory mtime is recorded to tell when a rescan is due.
+        """
+        self._directory_mtime = os.stat(self.directory).st_mtime_ns
+        paths = self._segment_paths()
+        known = {entry[0]: entry for entry in self._sealed_signature}
+        self._sealed_signature = tuple(
+            known.get(os.path.basename(path)) or self._segment_signature(path) for path in paths[:-1]
+        )
+        self._active_path: Optional[str] = None
+        self._active_size = 0
+        if paths:
+            self._active_path = paths[-1]
+            self._active_index, self._active_created = self._parse_segment_name(paths[-1])
+            self._active_size = os.path.getsize(paths[-1])
+
+    def _refresh_segments(self) -> None:
+        """Rescan when segments were created or removed, by us or another process
+
+        Creating, renaming or removing a file bumps the directory mtime, so
+        one stat of the directory tells whether the tracked state is current.
+        """
+        if os.stat(self.directory).st_mtime_ns != self._directory_mtime:
+            self._scan_segments()
+
+    def _tracked_paths(self) -> List[str]:
+        paths = [os.path.join(self.directory, entry[0]) for entry in self._sealed_signature]
+        if self._active_path is not None:
+            paths.append(self._active_path)
+        return paths
+
+    @contextmanager
+    def _directory_lock(self) -> Iterator[None]:
+        """Exclusive lock held by whichever process is writing segments"""
+        with open(os.path.join(self.directory, LOCK_FILE), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _active_segment(self) -> str:
+        """Current segment to append to, rolling over by size or age"""
+        if self._active_path is None:
+            self._start_segment(1)
+        else:
+            age = (datetime.now() - self._active_created).total_seconds()
+            if self._active_size >= self.max_segment_bytes or age >= self.max_segment_age_seconds:
+                self._sealed_signature += (self._segment_signature(self._active_path),)
+                self._start_segment(self._active_index + 1)
+        return self._active_path
+
+    def _start_segment(self, index: int) -> None:
+        self._active_path = self._new_segment_path(index)
+        self._active_index, self._active_created = self._parse_segment_name(self._active_path)
+        self._active_size = 0
+
+    @staticmethod
+    def _read_last_line(path: str) -> Optional[str]:
+        """Read the last complete line of a file without reading all of it"""
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            block = 4096
+            data = b""
+            while end > 0:
+                start = max(0, end - block)
+                f.seek(start)
+                data = f.read(end - start) + data
+                end = start
+                lines = data.rstrip(b"\n").split(b"\n")
+                if len(lines) > 1 or end == 0:
+                    return lines[-1].decode("utf-8") if lines[-1] else None
+        return None
+
+    def _last_sequence_number(self) -> int:
+        """Sequence number of the newest stored line (directory lock held)"""
+        for path in reversed(self._tracked_paths()):
+            line = self._read_last_line(path)
+            if not line:
+                continue
+            try:
+                return int(json.loads(line).get("sequence_number", 0))
+            except (json.JSONDecodeError, ValueError, TypeError):
+                # Torn last write: fall back to counting lines
+                return sum(1 for p in self._tracked_paths() for _ in self._iter_segment(p))
+        return 0
+
+    @staticmethod
+    def _iter_segment(path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def _append_lines(self, entries: List[Dict[str, Any]]) -> None:
+        payload = "".join(
+            json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n"
+            for entry in entries
+        ).encode("utf-8")
+        with open(self._active_segment(), "ab") as f:
+            f.write(payload)
+            self._active_size = f.tell()
+
+    def _migrate_legacy(self, legacy_filepath: str) -> None:
+        """Import an existing history.json once into the first segment"""
+        marker = os.path.join(self.directory, MIGRATION_MARKER)
+        if os.path.exists(marker) or self._active_path is not None:
+            return
+
+        if os.path.exists(legacy_filepath):
+            try:
+                with open(legacy_filepath, "r", encoding="utf-8") as f:
+                    predictions = json.load(f).get("predictions", [])
+            except (json.JSONDecodeError, OSError):
+                predictions = []
+            if predictions:
+                self._append_lines(predictions)
+
+        with open(marker, "w", encoding="utf-8") as f:
+            f.write(os.path.abspath(legacy_filepath) + "\n")
+
+    # HistoryManager interface
+
+    def _stats_path(self) -> str:
+        return os.path.join(self.directory, "stats.json")
+
+    def _source_signature(self) -> Any:
+        """Name, size and mtime of every segment
+
+        Costs a stat of the directory and one of the newest segment: segments
+        added or removed by any process change the directory mtime and trigger
+        a rescan, and appends to the newest segment change its own stat.
+        """
+        self._refresh_segments()
+        if self._active_path is None:
+            return self._sealed_signature
+        try:
+            active = self._segment_signature(self._active_path)
+        except FileNotFoundError:
+            self._scan_segments()
+            if self._active_path is None:
+                return self._sealed_signature
+            active = self._segment_signature(self._active_path)
+        self._active_size = active[1]
+        return self._sealed_signature + (active,)
+
+    def _load_history(self) -> Dict[str, Any]:
+        """Load every stored prediction from all segments"""
+        predictions = []
+        with stage_timer("history_load"):
+            for path in self._segment_paths():
+                predictions.extend(self._iter_segment(path))
+        return {"predictions": predictions}
+
+    def _save_history(self, data: Dict[str, Any]) -> None:
+        """Replace all segments with the given history"""
+        with stage_timer("history_save"):
+            for path in self._segment_paths():
+                os.remove(path)
+            self._scan_segments()
+            predictions = data.get("predictions", [])
+            if predictions:
+                self._append_lines(predictions)
+
+    def add_prediction(self, prediction: Dict[str, Any]) -> Dict[str, Any]:
+        """Append a new prediction to the active segment
+
+        Args:
+            prediction: The prediction response to save
+
+        Returns:
+            The saved prediction with metadata
+        """
+        return self.add_predictions([prediction])[0]
+
+    def add_predictions(self, predictions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Append several predictions with a single write
+
+        Args:
+            predictions: The prediction responses to save
+
+        Returns:
+            The saved predictions with metadata
+        """
+        saved_at = datetime.now().isoformat()
+        with self._lock, self._directory_lock():
+            signature = self._source_signature()
+            # Other processes may have appended since our last write
+            start = self._last_sequence_number()
+            entries = [
+                {
+                    **prediction,
+                    "saved_at": saved_at,
+                    "sequence_number": start + i + 1
+                }
+                for i, prediction in enumerate(predictions)
+            ]
+            with stage_timer("history_save"):
+                self._append_lines(entries)
+            self._cache_after_write(entries, signature)
+        return entries
+
+    def clear_history(self) -> None:
+        """Clear all history"""
+        with self._lock, self._directory_lock():
+            self._save_history({"predictions": []})
+            self._cache_clear()
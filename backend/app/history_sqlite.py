@@ -0,0 +1,440 @@
+"""
+SQLite-backed prediction history
+
+Stores each prediction as a row with the filterable fields in indexed
+columns and the full response as a JSON payload, so filtering, ordering,
+pagination and statistics run inside SQLite instead of over a JSON file.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.history import HistoryManager, decode_cursor, encode_cursor
+from app.history_stats import RISK_LEVELS, TREND_GRANULARITIES, HistoryStats
+from app.metrics import stage_timer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    sequence_number INTEGER PRIMARY KEY,
+    transaction_id TEXT NOT NULL DEFAULT '',
+    timestamp TEXT NOT NULL DEFAULT '',
+    risk_level TEXT,
+    is_fraud INTEGER,
+    risk_score REAL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions (timestamp);
+CREATE INDEX IF NOT EXISTS idx_predictions_risk_level ON predictions (risk_level);
+CREATE INDEX IF NOT EXISTS idx_predictions_is_fraud ON predictions (is_fraud);
+CREATE INDEX IF NOT EXISTS idx_predictions_transaction_id ON predictions (transaction_id);
+-- Listing order, ties in insertion order; replaces the (timestamp, transaction_id) index
+DROP INDEX IF EXISTS idx_predictions_keyset;
+CREATE INDEX IF NOT EXISTS idx_predictions_order ON predictions (timestamp, transaction_id, sequence_number DESC);
+CREATE INDEX IF NOT EXISTS idx_predictions_payload_id ON predictions (json_extract(payload, '$.id'));
+"""
+
+# Same order as HistoryManager: newest (timestamp, transaction_id) first, and
+# equal keys in insertion order like its stable sort
+ORDER_BY = "ORDER BY timestamp DESC, transaction_id DESC, sequence_number ASC"
+# Exact reverse, for walking towards newer items from a prev cursor
+ORDER_BY_REVERSED = "ORDER BY timestamp ASC, transaction_id ASC, sequence_number DESC"
+
+
+class SQLiteHistoryManager(HistoryManager):
+    """Manages prediction history in a local SQLite database"""
+
+    def __init__(self, filepath: str = "data/history.db", legacy_filepath: Optional[str] = "data/history.json"):
+        """Initialize SQLite history manager
+
+        Args:
+            filepath: Path to the SQLite database file
+            legacy_filepath: history.json to import when the database is created
+        """
+        self.filepath = filepath
+        self._ensure_directory()
+        created = not os.path.exists(filepath)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filepath, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+        if created and legacy_filepath and os.path.exists(legacy_filepath):
+            self._import_legacy(legacy_filepath)
+
+        # Running aggregates, rebuilt from SQL at startup and whenever another
+        # connection commits (PRAGMA data_version only moves on foreign writes)
+        self._stats: Optional[HistoryStats] = None
+        self._stats_version: Optional[int] = None
+        with self._lock:
+            self._rebuild_stats()
+
+    def _data_version(self) -> int:
+        (version,) = self._conn.execute("PRAGMA data_version").fetchone()
+        return version
+
+    def _rebuild_stats(self) -> None:
+        """Recompute aggregates with SQL (lock held)"""
+        with stage_timer("stats_computation"):
+            self._stats = self._aggregate()
+        self._stats_version = self._data_version()
+
+    def flush_stats(self) -> None:
+        """Nothing to save: aggregates are rebuilt from SQL at startup"""
+
+    def _aggregate(self) -> HistoryStats:
+        """Aggregates of the stored predictions, computed with SQL"""
+        total, fraud_count, score_sum = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(is_fraud), 0), COALESCE(SUM(risk_score), 0) FROM predictions"
+        ).fetchone()
+        levels = dict(self._conn.execute(
+            "SELECT risk_level, COUNT(*) FROM predictions GROUP BY risk_level"
+        ).fetchall())
+
+        stats = HistoryStats()
+        stats.total = total
+        stats.fraud_count = fraud_count
+        stats.score_sum = float(score_sum)
+        stats.risk_counts = {level: levels.get(level, 0) for level in RISK_LEVELS}
+
+        level_sums = ", ".join(f"SUM(risk_level = '{level}')" for level in RISK_LEVELS)
+        for granularity, (width, _) in TREND_GRANULARITIES.items():
+            rows = self._conn.execute(
+                f"SELECT substr(timestamp, 1, {width}) AS bucket, COUNT(*), COALESCE(SUM(is_fraud), 0), "
+                f"COALESCE(SUM(risk_score), 0), {level_sums} FROM predictions "
+                f"WHERE length(timestamp) >= {TREND_GRANULARITIES['hour'][0]} GROUP BY bucket"
+            ).fetchall()
+            stats.buckets[granularity] = {
+                bucket: [total, fraud, float(score), *levels]
+                for bucket, total, fraud, score, *levels in rows
+            }
+        return stats
+
+    def _import_legacy(self, legacy_filepath: str) -> None:
+        """Copy an existing history.json into the new database"""
+        try:
+            with open(legacy_filepath, "r", encoding="utf-8") as f:
+                predictions = json.load(f).get("predictions", [])
+        except (json.JSONDecodeError, OSError):
+            return
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._insert(predictions)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _row(entry: Dict[str, Any]) -> Tuple[Any, ...]:
+        is_fraud = entry.get("is_fraud")
+        return (
+            entry["sequence_number"],
+            entry.get("transaction_id") or entry.get("id") or "",
+            entry.get("timestamp", ""),
+            entry.get("risk_level"),
+            None if is_fraud is None else int(bool(is_fraud)),
+            entry.get("risk_score", 0),
+            json.dumps(entry, ensure_ascii=False),
+        )
+
+    def _insert(self, entries: List[Dict[str, Any]]) -> None:
+        self._conn.executemany(
+            "INSERT INTO predictions (sequence_number, transaction_id, timestamp, risk_level, is_fraud, risk_score, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [self._row(entry) for entry in entries],
+        )
+
+    @staticmethod
+    def _where(filters: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        """Translate history filters into a WHERE clause"""
+        clauses, params = [], []
+        filters = filters or {}
+
+        if filters.get("risk_level"):
+            clauses.append("risk_level = ?")
+            params.append(filters["risk_level"])
+        if filters.get("is_fraud") is not None:
+            clauses.append("is_fraud = ?")
+            params.append(int(bool(filters["is_fraud"])))
+        if filters.get("date_from"):
+            clauses.append("timestamp >= ?")
+            params.append(filters["date_from"])
+        if filters.get("date_to"):
+            clauses.append("timestamp <= ?")
+            params.append(filters["date_to"])
+
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, params
+
+    def _query_payloads(self, sql: str, params: List[Any]) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    # HistoryManager interface
+
+    def _load_history(self) -> Dict[str, Any]:
+        """Load history in insertion order"""
+        with stage_timer("history_load"):
+            return {"predictions": self._query_payloads("SELECT payload FROM predictions ORDER BY sequence_number", [])}
+
+    def _save_history(self, data: Dict[str, Any]) -> None:
+        """Replace the stored history"""
+        with self._lock:
+            with stage_timer("history_save"):
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.execute("DELETE FROM predictions")
+                    self._insert(data.get("predictions", []))
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            self._rebuild_stats()
+
+    def add_prediction(self, prediction: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a new prediction to history
+
+        Args:
+            prediction: The prediction response to save
+
+        Returns:
+            The saved prediction with metadata
+        """
+        return self.add_predictions([prediction])[0]
+
+    def add_predictions(self, predictions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add several predictions in one transaction
+
+        Args:
+            predictions: The prediction responses to save
+
+        Returns:
+            The saved predictions with metadata
+        """
+        saved_at = datetime.now().isoformat()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so concurrent writers
+            # (other workers) cannot hand out the same sequence numbers
+            version = self._data_version()
+            with stage_timer("history_save"):
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    (last,) = self._conn.execute("SELECT COALESCE(MAX(sequence_number), 0) FROM predictions").fetchone()
+                    entries = [
+                        {
+                            **prediction,
+                            "saved_at": saved_at,
+                            "sequence_number": last + i + 1
+                        }
+                        for i, prediction in enumerate(predictions)
+                    ]
+                    self._insert(entries)
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+
+            if self._stats is not None and version == self._stats_version:
+                self._stats.add_many(entries)
+                # Another connection may have committed while we waited for the lock
+                if self._data_version() != version:
+                    self._stats = None
+            else:
+                self._stats = None
+        return entries
+
+    def get_all_predictions(self) -> List[Dict[str, Any]]:
+        """Get all predictions sorted by timestamp (newest first)
+
+        Returns:
+            List of all predictions
+        """
+        return self._query_payloads(f"SELECT payload FROM predictions {ORDER_BY}", [])
+
+    def get_prediction(self, prediction_id: str) -> Optional[Dict[str, Any]]:
+        """Get one prediction by its id or transaction_id
+
+        Args:
+            prediction_id: Value of the prediction's id or transaction_id
+
+        Returns:
+            The stored prediction, or None if there is none with that ID
+        """
+        rows = self._query_payloads(
+            "SELECT payload FROM predictions WHERE transaction_id = ? OR json_extract(payload, '$.id') = ? "
+            "ORDER BY sequence_number LIMIT 1",
+            [prediction_id, prediction_id],
+        )
+        return rows[0] if rows else None
+
+    def get_predictions_paginated(
+        self,
+        page: int = 1,
+        items_per_page: int = 20,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Get paginated predictions with optional filtering
+
+        Args:
+            page: Page number (1-indexed)
+            items_per_page: Number of items per page
+            filters: Optional filters (risk_level, is_fraud, date_from, date_to)
+
+        Returns:
+            Dictionary with paginated predictions and metadata
+        """
+        where, params = self._where(filters)
+
+        with self._lock:
+            (total_items,) = self._conn.execute(f"SELECT COUNT(*) FROM predictions {where}", params).fetchone()
+        total_pages = (total_items + items_per_page - 1) // items_per_page
+
+        # Validate page number
+        page = max(1, min(page, max(1, total_pages)))
+
+        data = self._query_payloads(
+            f"SELECT payload FROM predictions {where} {ORDER_BY} LIMIT ? OFFSET ?",
+            params + [items_per_page, (page - 1) * items_per_page],
+        )
+
+        return {
+            "data": data,
+            "page": page,
+            "items_per_page": items_per_page,
+            "total_items": total_items,
+            "total_pages": total_pages,
+            "has_next": page < total_pages,
+            "has_previous": page > 1,
+        }
+
+    def get_predictions_by_cursor(
+        self,
+        cursor: Optional[str] = None,
+        items_per_page: int = 20,
+        filters: Optional[Dict[str, Any]] = None,
+        predicate: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> Dict[str, Any]:
+        """Get a newest-first page using keyset (cursor) pagination
+
+        Args:
+            cursor: next_cursor/prev_cursor from a previous page, None for the newest page
+            items_per_page: Number of items per page
+            filters: Optional filters (risk_level, is_fraud, date_from, date_to)
+            predicate: Optional extra condition an item must satisfy
+
+        Returns:
+            Dictionary with the page and its next/prev cursors
+
+        Raises:
+            InvalidCursorError: If the cursor cannot be decoded
+        """
+        direction, key = decode_cursor(cursor) if cursor else ("next", None)
+        where, params = self._where(filters)
+        clauses = [where[len("WHERE "):]] if where else []
+
+        if key is not None:
+            # Strictly past the cursor in ORDER_BY order; written as a range on
+            # (timestamp, transaction_id) so the listing index still applies
+            timestamp, transaction_id, sequence_number = key[0], key[1], -key[2]
+            if direction == "next":
+                clauses.append(
+                    "(timestamp, transaction_id) <= (?, ?) "
+                    "AND NOT (timestamp = ? AND transaction_id = ? AND sequence_number <= ?)"
+                )
+            else:
+                clauses.append(
+                    "(timestamp, transaction_id) >= (?, ?) "
+                    "AND NOT (timestamp = ? AND transaction_id = ? AND sequence_number >= ?)"
+                )
+            params = params + [timestamp, transaction_id, timestamp, transaction_id, sequence_number]
+        order = ORDER_BY if direction == "next" else ORDER_BY_REVERSED
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+
+        # Fetch one extra match to know whether another page exists; with a
+        # predicate, keep pulling chunks until the page is full
+        data: List[Dict[str, Any]] = []
+        offset = 0
+        chunk = items_per_page + 1
+        while len(data) <= items_per_page:
+            rows = self._query_payloads(
+                f"SELECT payload FROM predictions {where} {order} LIMIT ? OFFSET ?",
+                params + [chunk, offset],
+            )
+            data.extend(row for row in rows if predicate is None or predicate(row))
+            if len(rows) < chunk:
+                break
+            offset += chunk
+            chunk *= 2
+
+        more = len(data) > items_per_page
+        data = data[:items_per_page]
+        if direction == "prev":
+            data.reverse()
+            has_next, has_previous = True, more
+        else:
+            has_next, has_previous = more, key is not None
+
+        return {
+            "data": data,
+            "items_per_page": items_per_page,
+            "next_cursor": encode_cursor("next", self._sort_key(data[-1])) if data and has_next else None,
+            "prev_cursor": encode_cursor("prev", self._sort_key(data[0])) if data and has_previous else None,
+            "has_next": bool(data) and has_next,
+            "has_previous": bool(data) and has_previous,
+        }
+
+    def iter_predictions(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """Iterate over predictions newest first with keyset queries of chunk_size rows
+
+        Args:
+            filters: Optional filters (risk_level, is_fraud, date_from, date_to)
+            chunk_size: Rows fetched per query
+
+        Yields:
+            Matching predictions, newest first
+        """
+        return self._iter_by_cursor(filters, chunk_size)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get statistics about all predictions
+
+        Returns:
+            Dictionary with various statistics
+        """
+        with self._lock:
+            if self._stats is None or self._data_version() != self._stats_version:
+                self._rebuild_stats()
+            return self._stats.to_response()
+
+    def get_trends(self, granularity: str = "hour", limit: int = 24) -> List[Dict[str, Any]]:
+        """Get per-hour or per-day fraud trends from the incremental rollups
+
+        Args:
+            granularity: "hour" or "day"
+            limit: Number of buckets, ending with the current one
+
+        Returns:
+            List of buckets, oldest first
+        """
+        with self._lock:
+            if self._stats is None or self._data_version() != self._stats_version:
+                self._rebuild_stats()
+            return self._stats.trends(granularity, limit)
+
+    def clear_history(self) -> None:
+        """Clear all history"""
+        with self._lock:
+            self._conn.execute("DELETE FROM predictions")
+            self._rebuild_stats()
@@ -0,0 +1,215 @@
+"""
+Running aggregates over prediction history
+
+HistoryStats is updated in O(1) per saved prediction, so the statistics
+and trends endpoints never have to walk the whole history.
+"""
+import json
+import os
+import stat
+import tempfile
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
+# Trend bucket sizes: length of the ISO timestamp prefix that names a
+# bucket ("2025-12-10T10" / "2025-12-10") and the distance between buckets
+TREND_GRANULARITIES = {
+    "hour": (13, timedelta(hours=1)),
+    "day": (10, timedelta(days=1)),
+}
+
+# Per-bucket counters: total, fraud count, risk score sum, then one count per risk level
+BUCKET_FIELDS = ("total", "fraud", "score", *RISK_LEVELS)
+
+# Read once at import: os.umask can only be read by setting it, which is
+# not safe while other threads create files
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class HistoryStats:
+    """Total, fraud count, risk score sum and risk level counts"""
+
+    def __init__(self):
+        self.total = 0
+        self.fraud_count = 0
+        self.score_sum = 0.0
+        self.risk_counts: Dict[str, int] = {level: 0 for level in RISK_LEVELS}
+        # Rollups per granularity: bucket name -> counters in BUCKET_FIELDS order
+        self.buckets: Dict[str, Dict[str, List[float]]] = {granularity: {} for granularity in TREND_GRANULARITIES}
+
+    @classmethod
+    def from_predictions(cls, predictions: Iterable[Dict[str, Any]]) -> "HistoryStats":
+        """Build aggregates over stored predictions with vectorized pandas groupbys"""
+        stats = cls()
+        frame = pd.DataFrame.from_records(
+            list(predictions), columns=["timestamp", "is_fraud", "risk_score", "risk_level"]
+        )
+        if frame.empty:
+            return stats
+
+        counters = pd.DataFrame({
+            "total": 1,
+            "fraud": frame["is_fraud"].fillna(False).astype(bool).astype("int64"),
+            "score": pd.to_numeric(frame["risk_score"], errors="coerce").fillna(0.0),
+        })
+        for level in RISK_LEVELS:
+            counters[level] = (frame["risk_level"] == level).astype("int64")
+
+        totals = counters.sum()
+        stats.total = int(totals["total"])
+        stats.fraud_count = int(totals["fraud"])
+        stats.score_sum = float(totals["score"])
+        stats.risk_counts = {level: int(totals[level]) for level in RISK_LEVELS}
+
+        timestamps = frame["timestamp"].astype("string")
+        valid = (timestamps.str.len() >= TREND_GRANULARITIES["hour"][0]).fillna(False).to_numpy(dtype=bool)
+        for granularity, (width, _) in TREND_GRANULARITIES.items():
+            sums = counters[valid].groupby(timestamps[valid].str.slice(0, width).to_numpy()).sum()
+            stats.buckets[granularity] = {
+                key: [int(row[0]), int(row[1]), float(row[2]), *(int(count) for count in row[3:])]
+                for key, row in zip(sums.index, sums.to_numpy().tolist())
+            }
+        return stats
+
+    def add(self, prediction: Dict[str, Any]) -> None:
+        """Account for one saved prediction"""
+        self.total += 1
+        fraud = 1 if prediction.get("is_fraud") else 0
+        self.fraud_count += fraud
+        # Records from POST /transactions may carry risk_score=None
+        score = prediction.get("risk_score") or 0
+        self.score_sum += score
+        level = prediction.get("risk_level")
+        if level in self.risk_counts:
+            self.risk_counts[level] += 1
+
+        timestamp = prediction.get("timestamp")
+        if not isinstance(timestamp, str) or len(timestamp) < TREND_GRANULARITIES["hour"][0]:
+            return
+        level_index = 3 + RISK_LEVELS.index(level) if level in self.risk_counts else None
+        for granularity, (width, _) in TREND_GRANULARITIES.items():
+            buckets = self.buckets[granularity]
+            bucket = buckets.get(timestamp[:width])
+            if bucket is None:
+                bucket = buckets[timestamp[:width]] = [0, 0, 0.0, 0, 0, 0, 0]
+            bucket[0] += 1
+            bucket[1] += fraud
+            bucket[2] += score
+            if level_index is not None:
+                bucket[level_index] += 1
+
+    def add_many(self, predictions: Iterable[Dict[str, Any]]) -> None:
+        for prediction in predictions:
+            self.add(prediction)
+
+    def to_response(self) -> Dict[str, Any]:
+        """Statistics in the /predict/history/stats response format"""
+        total = self.total
+        return {
+            "total_predictions": total,
+            "total_fraud_detected": self.fraud_count,
+            "fraud_rate": round(self.fraud_count / total, 4) if total > 0 else 0.0,
+            "average_risk_score": round(self.score_sum / total, 2) if total > 0 else 0.0,
+            "risk_distribution": dict(self.risk_counts)
+        }
+
+    def trends(self, granularity: str = "hour", limit: int = 24, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Last `limit` buckets up to the current one, oldest first
+
+        Buckets without predictions are included with zero counts so the
+        series has a regular time axis. fraud_rate is a percentage, as the
+        dashboard trend charts expect.
+        """
+        width, step = TREND_GRANULARITIES[granularity]
+        end = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+        if granularity == "day":
+            end = end.replace(hour=0)
+        buckets = self.buckets[granularity]
+
+        series = []
+        for offset in range(limit - 1, -1, -1):
+            start = end - offset * step
+            bucket = buckets.get(start.isoformat()[:width])
+            total, fraud, score_sum, *levels = bucket if bucket is not None else (0, 0, 0.0, 0, 0, 0, 0)
+            series.append({
+                "timestamp": start.isoformat(),
+                "total_transactions": total,
+                "fraud_detected": fraud,
+                "fraud_rate": round(fraud / total * 100, 2) if total > 0 else 0.0,
+                "average_risk_score": round(score_sum / total, 2) if total > 0 else 0.0,
+                "risk_distribution": dict(zip(RISK_LEVELS, levels)),
+            })
+        return series
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "fraud_count": self.fraud_count,
+            "score_sum": self.score_sum,
+            "risk_counts": dict(self.risk_counts),
+            "buckets": self.buckets,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HistoryStats":
+        stats = cls()
+        stats.total = int(data["total"])
+        stats.fraud_count = int(data["fraud_count"])
+        stats.score_sum = float(data["score_sum"])
+        stats.risk_counts.update({level: int(data["risk_counts"].get(level, 0)) for level in RISK_LEVELS})
+        # Files written before rollups existed have no "buckets" and are rebuilt
+        stats.buckets = {granularity: dict(data["buckets"][granularity]) for granularity in TREND_GRANULARITIES}
+        return stats
+
+
+def replace_keeping_mode(tmp_path: str, path: str) -> None:
+    """Rename a temporary file over path, keeping the permissions path had
+
+    mkstemp creates files readable by their owner only; a new file gets the
+    mode open() would have given it (0o666 minus the umask).
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+
+def save_stats(path: str, stats: HistoryStats, signature: Any) -> None:
+    """Persist aggregates with the storage signature they correspond to
+
+    Each save writes its own temporary file, so workers saving at the same
+    time never write into each other's; the last rename wins.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=".stats-", suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"signature": signature, "stats": stats.to_dict()}, f)
+        replace_keeping_mode(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_stats(path: str) -> Tuple[Optional[HistoryStats], Any]:
+    """Load persisted aggregates and their signature, (None, None) if unusable"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return HistoryStats.from_dict(data["stats"]), _as_tuple(data["signature"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
+
+
+def _as_tuple(value: Any) -> Any:
+    """JSON turns signature tuples into lists; turn them back for comparison"""
+    if isinstance(value, list):
+        return tuple(_as_tuple(item) for item in value)
+    return value
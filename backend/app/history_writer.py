@@ -0,0 +1,158 @@
+"""
+Write-behind persistence for prediction history
+
+Request handlers hand predictions to a bounded in-memory queue and return
+immediately; a single background thread drains the queue and saves each
+batch with one HistoryManager.add_predictions call. Because only that
+thread writes, concurrent requests can no longer interleave file rewrites.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.history import HistoryManager, get_history_manager
+from app.metrics import HISTORY_WRITE_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Queued after the last prediction to tell the writer thread to exit
+_STOP = object()
+
+
+class HistoryWriter:
+    """Bounded queue plus background flusher in front of a HistoryManager"""
+
+    def __init__(
+        self,
+        manager: HistoryManager,
+        max_queue_size: int = 10000,
+        flush_interval_ms: float = 200.0,
+        flush_batch_size: int = 500,
+    ):
+        """Initialize the writer
+
+        Args:
+            manager: History manager the batches are saved to
+            max_queue_size: Pending predictions before submit() blocks the caller
+            flush_interval_ms: Maximum time a prediction waits before it is written
+            flush_batch_size: Batch is written as soon as this many are pending
+        """
+        self.manager = manager
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_batch_size = max(1, flush_batch_size)
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_queue_size))
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, prediction: Dict[str, Any]) -> None:
+        """Queue one prediction for saving
+
+        Blocks while the queue is full, so a slow disk slows requests down
+        instead of growing memory without bound.
+        """
+        self._ensure_started()
+        self._queue.put(prediction)
+
+    def submit_many(self, predictions: List[Dict[str, Any]]) -> None:
+        """Queue several predictions for saving"""
+        for prediction in predictions:
+            self.submit(prediction)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            if stop:
+                self._queue.task_done()
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            self.manager.add_predictions(batch)
+        except Exception as e:
+            HISTORY_WRITE_ERRORS.inc(len(batch))
+            logger.warning("Could not save %d predictions to history: %s", len(batch), e)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until everything queued so far has been written"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def stop(self) -> None:
+        """Write everything still queued, then stop the writer thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+
+# Global instance, only created when HISTORY_WRITE_BEHIND is enabled
+_history_writer: Optional[HistoryWriter] = None
+_history_writer_lock = threading.Lock()
+
+
+def write_behind_enabled() -> bool:
+    return os.getenv("HISTORY_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+
+
+def get_history_writer() -> Optional[HistoryWriter]:
+    """Get the global history writer, or None when writes are synchronous"""
+    global _history_writer
+    if _history_writer is None and write_behind_enabled():
+        with _history_writer_lock:
+            if _history_writer is None:
+                _history_writer = HistoryWriter(
+                    get_history_manager(),
+                    max_queue_size=int(os.getenv("HISTORY_WRITE_QUEUE_SIZE", "10000")),
+                    flush_interval_ms=float(os.getenv("HISTORY_FLUSH_INTERVAL_MS", "200")),
+                    flush_batch_size=int(os.getenv("HISTORY_FLUSH_BATCH_SIZE", "500")),
+                )
+    return _history_writer
+
+
+def flush_history_writes() -> None:
+    """Write out queued predictions, e.g. before clearing the history"""
+    if _history_writer is not None:
+        _history_writer.flush()
+
+
+def stop_history_writer() -> None:
+    """Drain the queue on shutdown"""
+    if _history_writer is not None:
+        _history_writer.stop()
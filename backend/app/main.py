@@ -1,12 +1,23 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import transactions, predict
 from app.routers import chatbot
+from app.routers import analytics
+from app.routers import model
+from app.metrics import CONTENT_TYPE, MetricsMiddleware, render as render_metrics
 import os
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await predict.shutdown()
+
 app = FastAPI(
     title="Fraud Shield API",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -19,10 +30,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so latency includes CORS handling and in-flight counts every request
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(transactions.router, prefix="/api/v1/transactions", tags=["Transactions"])
 app.include_router(predict.router, prefix="/api/v1/predict", tags=["Fraud Detection"])
 app.include_router(chatbot.router, prefix="/api/v1", tags=["Chatbot"])
+app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["Analytics"])
+app.include_router(model.router, prefix="/api/v1/model", tags=["Model"])
 
 
 @app.get("/")
@@ -32,3 +47,8 @@ def root():
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text format: per-route latency, in-flight requests, stage timings"""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
@@ -0,0 +1,386 @@
+"""
+Prometheus-style metrics
+
+Counters, gauges and histograms rendered in the Prometheus text format by
+GET /metrics. Recording never takes a lock: every thread writes into its own
+list of values (a shard), registered once on the thread's first write, and
+only a scrape sums the shards. A shard has a single writer, so plain list
+updates cannot lose increments, and threads that exit are folded into a
+retired total on the next scrape. Values are in memory, per worker process.
+
+MetricsMiddleware records per-route latency and in-flight requests; the
+stage histogram is fed by stage_timer() around model inference, feature
+array construction, history load/save and stats computation. The /predict
+micro-batcher records its batch sizes, queue waits and dispatches here too.
+"""
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds (inclusive) in seconds; stages take from ~10 µs to seconds
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Upper bounds (inclusive) for the micro-batch size histogram
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class _Shards:
+    """Per-thread value lists, summed on read"""
+
+    __slots__ = ("size", "_local", "_lock", "_shards", "_retired")
+
+    def __init__(self, size: int):
+        self.size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[Any, List[float]]] = []  # (thread weakref, values)
+        self._retired = [0.0] * size
+
+    def values(self) -> List[float]:
+        """The calling thread's shard, created on its first write"""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = [0.0] * self.size
+            with self._lock:
+                self._shards.append((weakref.ref(threading.current_thread()), values))
+            self._local.values = values
+            return values
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            # Copied under the lock: a concurrent scrape may retire shards into it
+            totals = list(self._retired)
+            live = []
+            for ref, values in self._shards:
+                thread = ref()
+                if thread is None or not thread.is_alive():
+                    # Its thread is gone, so the shard no longer changes
+                    for i, value in enumerate(values):
+                        self._retired[i] += value
+                else:
+                    live.append((ref, values))
+                for i, value in enumerate(values):
+                    totals[i] += value
+            self._shards = live
+        return totals
+
+    def reset(self) -> None:
+        with self._lock:
+            for _, values in self._shards:
+                for i in range(self.size):
+                    values[i] = 0.0
+            self._retired = [0.0] * self.size
+
+
+class _Metric:
+    """Metric family; labels(*values) returns the child for one label set"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._children_lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        # Children are stored under string keys, so labels(200) finds the
+        # child created by labels("200") without taking the lock
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._children_lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child()
+        return child
+
+    def _child(self) -> Any:
+        if self.labelnames:
+            raise ValueError(f"{self.name} is labelled; use labels() first")
+        return self._children[()]
+
+    def reset(self) -> None:
+        for child in list(self._children.values()):
+            child.shards.reset()
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """(sample name, labels, value) for every child"""
+        samples = []
+        for key, child in sorted(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            samples.extend(child.samples(self.name, labels))
+        return samples
+
+
+class _CounterChild:
+    __slots__ = ("shards",)
+
+    def __init__(self):
+        self.shards = _Shards(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.shards.values()[0] += amount
+
+    def samples(self, name: str, labels: Dict[str, str]):
+        return [(name, labels, self.shards.totals()[0])]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.shards.values()[0] -= amount
+
+
+class _Timer:
+    """Context manager observing its elapsed time on a histogram child"""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: "_HistogramChild"):
+        self.histogram = histogram
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _HistogramChild:
+    # values: one count per bucket, one for +Inf, then the sum
+    __slots__ = ("bounds", "shards")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.shards = _Shards(len(bounds) + 2)
+
+    def observe(self, value: float) -> None:
+        values = self.shards.values()
+        values[bisect_left(self.bounds, value)] += 1
+        values[-1] += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    def samples(self, name: str, labels: Dict[str, str]):
+        totals = self.shards.totals()
+        samples, cumulative = [], 0.0
+        for bound, count in zip(self.bounds + (float("inf"),), totals):
+            cumulative += count
+            samples.append((name + "_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+        samples.append((name + "_sum", labels, totals[-1]))
+        samples.append((name + "_count", labels, cumulative))
+        return samples
+
+
+class Counter(_Metric):
+    """Monotonic total, e.g. requests served"""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._child().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. requests in flight"""
+
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._child().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._child().dec(amount)
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        registry: Optional["Registry"] = None,
+    ):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._child().observe(value)
+
+    def time(self) -> _Timer:
+        return self._child().time()
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Registry:
+    """Metric families rendered together by /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def reset(self) -> None:
+        """Zero every metric (tests)"""
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    rendered = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                    lines.append(f"{name}{{{rendered}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = Counter(
+    "fraudshield_http_requests_total", "HTTP requests served", ("method", "route", "status")
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "fraudshield_http_request_duration_seconds", "HTTP request latency, until the last body byte", ("method", "route")
+)
+HTTP_IN_FLIGHT = Gauge(
+    "fraudshield_http_requests_in_flight", "HTTP requests being handled", ("method",)
+)
+STAGE_SECONDS = Histogram(
+    "fraudshield_stage_duration_seconds",
+    "Time spent in an instrumented stage (model_inference, feature_construction, "
+    "history_load, history_save, stats_computation)",
+    ("stage",),
+)
+HISTORY_WRITE_ERRORS = Counter(
+    "fraudshield_history_write_errors_total", "Predictions that could not be saved to history"
+)
+PREDICT_BATCH_SIZE = Histogram(
+    "fraudshield_predict_batch_size", "Requests scored per /predict micro-batch", buckets=BATCH_SIZE_BUCKETS
+)
+PREDICT_BATCH_QUEUE_WAIT = Histogram(
+    "fraudshield_predict_batch_queue_wait_seconds", "Time a /predict request waited for its micro-batch"
+)
+PREDICT_BATCHES = Counter(
+    "fraudshield_predict_batches_total",
+    "Micro-batches dispatched, by trigger (full: max batch size reached, window: wait window expired)",
+    ("trigger",),
+)
+PREDICT_BATCH_PENDING = Gauge(
+    "fraudshield_predict_batch_pending", "/predict requests waiting for a micro-batch"
+)
+
+
+def stage_timer(stage: str) -> _Timer:
+    """Time a block into fraudshield_stage_duration_seconds{stage=...}
+
+    Usage: with stage_timer("model_inference"): ...
+    """
+    return STAGE_SECONDS.labels(stage).time()
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# Route label of requests that matched no route, so unknown paths cannot
+# create unbounded label values
+UNMATCHED_ROUTE = "unmatched"
+# Method label values; any other request method is counted as OTHER_METHOD
+KNOWN_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+OTHER_METHOD = "OTHER"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight requests per route
+
+    Requests are labelled with the path template of the route that handled
+    them (/api/v1/transactions/{transaction_id}), never the raw path.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        if method not in KNOWN_METHODS:
+            method = OTHER_METHOD
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            HTTP_REQUEST_SECONDS.labels(method, path).observe(elapsed)
+            HTTP_REQUESTS.labels(method, path, status).inc()
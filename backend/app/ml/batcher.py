@@ -0,0 +1,176 @@
+"""
+Asyncio micro-batching in front of FraudDetector
+
+Concurrent requests await a future while a single background task gathers
+them for up to `window_ms` (or until `max_batch_size` are pending), scores
+the whole batch with one FraudDetector.predict_batch call in a worker
+thread, and resolves every future with its score. Batch sizes, queue waits
+and dispatches are recorded in the /metrics registry.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.metrics import (
+    BATCH_SIZE_BUCKETS,
+    PREDICT_BATCH_PENDING,
+    PREDICT_BATCH_QUEUE_WAIT,
+    PREDICT_BATCH_SIZE,
+    PREDICT_BATCHES,
+    Histogram,
+)
+
+
+class PredictionBatcher:
+    """Collects concurrent predict calls into vectorized batches"""
+
+    def __init__(self, detector: Any, window_ms: float = 2.0, max_batch_size: int = 256):
+        """Initialize the batcher
+
+        Args:
+            detector: Object exposing predict_batch(list of feature dicts)
+            window_ms: Maximum time a request waits for others to join its batch
+            max_batch_size: Batch is dispatched as soon as this many are pending
+        """
+        self.detector = detector
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._pending: Deque[Tuple[Dict[str, Any], asyncio.Future, float]] = deque()
+        self._has_items: Optional[asyncio.Event] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._has_items = asyncio.Event()
+            self._batch_full = asyncio.Event()
+            if self._pending:
+                self._has_items.set()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def predict(self, features: Dict[str, Any]) -> float:
+        """Queue one transaction and wait for its score
+
+        Args:
+            features: Feature dict in the format accepted by FraudDetector.predict
+
+        Returns:
+            Fraud probability for the transaction
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((features, future, time.perf_counter()))
+        PREDICT_BATCH_PENDING.inc()
+
+        self._has_items.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._batch_full.set()
+
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_items.wait()
+
+            trigger = "full"
+            if len(self._pending) < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.window)
+                except asyncio.TimeoutError:
+                    trigger = "window"
+
+            batch = []
+            while self._pending and len(batch) < self.max_batch_size:
+                batch.append(self._pending.popleft())
+            PREDICT_BATCH_PENDING.dec(len(batch))
+
+            if len(self._pending) < self.max_batch_size:
+                self._batch_full.clear()
+            if not self._pending:
+                self._has_items.clear()
+
+            if batch:
+                PREDICT_BATCHES.labels(trigger).inc()
+                await self._score(batch)
+
+    async def _score(self, batch: List[Tuple[Dict[str, Any], asyncio.Future, float]]) -> None:
+        started = time.perf_counter()
+        self._record(batch, started)
+
+        try:
+            scores = await asyncio.get_running_loop().run_in_executor(
+                None, self.detector.predict_batch, [features for features, _, _ in batch]
+            )
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Prediction batcher stopped"))
+            raise
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), score in zip(batch, scores):
+            if not future.done():
+                future.set_result(score)
+
+    def _record(self, batch: List[Tuple[Dict[str, Any], asyncio.Future, float]], started: float) -> None:
+        PREDICT_BATCH_SIZE.observe(len(batch))
+        for _, _, enqueued in batch:
+            PREDICT_BATCH_QUEUE_WAIT.observe(started - enqueued)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch size and queue wait summary, read back from the /metrics series
+
+        Like the metrics, the figures are per worker process since startup.
+        """
+        batches, requests, size_counts = _histogram_totals(PREDICT_BATCH_SIZE)
+        waits, wait_total, _ = _histogram_totals(PREDICT_BATCH_QUEUE_WAIT)
+        histogram = {f"le_{bound}": int(count) for bound, count in zip(BATCH_SIZE_BUCKETS, size_counts)}
+        histogram[f"gt_{BATCH_SIZE_BUCKETS[-1]}"] = int(size_counts[-1])
+
+        return {
+            "enabled": True,
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "pending": len(self._pending),
+            "batches": int(batches),
+            "requests": int(requests),
+            "avg_batch_size": round(requests / batches, 2) if batches else 0.0,
+            "batch_size_histogram": histogram,
+            "avg_queue_wait_ms": round(wait_total / waits * 1000.0, 3) if waits else 0.0,
+        }
+
+    async def stop(self) -> None:
+        """Cancel the background task and fail requests still waiting"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        while self._pending:
+            _, future, _ = self._pending.popleft()
+            PREDICT_BATCH_PENDING.dec()
+            if not future.done():
+                future.set_exception(RuntimeError("Prediction batcher stopped"))
+
+
+def _histogram_totals(histogram: Histogram) -> Tuple[float, float, List[float]]:
+    """Count, sum and per-bucket (not cumulative) counts of an unlabelled histogram"""
+    count, total, buckets, cumulative = 0.0, 0.0, [], 0.0
+    for name, _, value in histogram.samples():
+        if name.endswith("_bucket"):
+            buckets.append(value - cumulative)
+            cumulative = value
+        elif name.endswith("_sum"):
+            total = value
+        else:
+            count = value
+    return count, total, buckets
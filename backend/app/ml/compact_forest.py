@@ -0,0 +1,172 @@
+"""
+Forest compaction
+
+Greedily picks the smallest subset of trees whose averaged probabilities
+stay within a tolerance of the full forest's on a validation set. At every
+step it adds the tree that brings the subset's squared error closest to
+the full forest. It stops once the largest absolute deviation fits the
+tolerance. The held-out split is halved: one half drives the selection,
+the other reports fidelity, ROC AUC change and the measured speedup.
+
+The result is a regular RandomForestClassifier holding only the selected
+trees, saved as model.compact.joblib. FraudDetector loads it like any model
+file (FRAUD_MODEL_PATH=model.compact.joblib).
+
+Usage: python -m app.ml.compact_forest [--tolerance 0.01] [--data-path ...]
+"""
+import argparse
+import copy
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from app.ml.model_info import metrics_path
+from app.ml.model_search import measure_latency
+from app.ml.train_model import DATA_PATH, MODEL_PATH, load_data, save_metrics
+
+# Largest allowed |p_compact - p_full| on the validation rows
+TOLERANCE = 0.01
+
+
+def compact_path(model_path: str) -> str:
+    """Compacted model written next to the original (model.compact.joblib)"""
+    return os.path.splitext(model_path)[0] + ".compact.joblib"
+
+
+def tree_probabilities(model: Any, X: np.ndarray) -> np.ndarray:
+    """(rows, trees) fraud probability of every tree; their mean is predict_proba"""
+    X = np.asarray(X, dtype=np.float32)
+    return np.column_stack([estimator.predict_proba(X)[:, 1] for estimator in model.estimators_])
+
+
+def select_trees(per_tree: np.ndarray, tolerance: float) -> Tuple[List[int], float]:
+    """Greedy forward selection of trees reproducing the full forest
+
+    Args:
+        per_tree: (rows, trees) probabilities from tree_probabilities
+        tolerance: Largest allowed absolute deviation from the full forest
+
+    Returns:
+        (selected tree indices in selection order, their max absolute deviation)
+    """
+    target = per_tree.mean(axis=1)
+    n_trees = per_tree.shape[1]
+    total = np.zeros_like(target)
+    remaining = np.ones(n_trees, dtype=bool)
+    selected: List[int] = []
+
+    while len(selected) < n_trees:
+        k = len(selected) + 1
+        # Squared error of the subset mean for every candidate tree at once
+        errors = (((total[:, None] + per_tree) / k - target[:, None]) ** 2).mean(axis=0)
+        errors[~remaining] = np.inf
+        best = int(np.argmin(errors))
+
+        selected.append(best)
+        remaining[best] = False
+        total += per_tree[:, best]
+        deviation = float(np.abs(total / k - target).max())
+        if deviation <= tolerance:
+            break
+
+    return selected, deviation
+
+
+def compact_model(model: Any, selected: List[int]) -> Any:
+    """Copy of the forest keeping only the selected trees, in forest order"""
+    compact = copy.copy(model)
+    compact.estimators_ = [model.estimators_[i] for i in sorted(selected)]
+    compact.n_estimators = len(compact.estimators_)
+    return compact
+
+
+def compact_forest(
+    model_path: str = MODEL_PATH,
+    data_path: str = DATA_PATH,
+    tolerance: float = TOLERANCE,
+    output_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Compact a saved forest and report fidelity, AUC change and speedup
+
+    Args:
+        model_path: Fitted forest to compact
+        data_path: Training CSV; its held-out split is used for validation
+        tolerance: Largest allowed probability deviation on the validation half
+        output_path: Where to save the result (defaults to model.compact.joblib)
+
+    Returns:
+        Compaction report, also saved in the compacted model's metrics file
+    """
+    output_path = output_path or compact_path(model_path)
+    model = joblib.load(model_path)
+
+    _, X_test, _, y_test = load_data(data_path)
+    val_idx, eval_idx = train_test_split(
+        np.arange(len(y_test)), test_size=0.5, random_state=42, stratify=np.asarray(y_test)
+    )
+    X_eval, y_eval = X_test.iloc[eval_idx], np.asarray(y_test)[eval_idx]
+
+    selected, val_deviation = select_trees(tree_probabilities(model, X_test.to_numpy()[val_idx]), tolerance)
+    compact = compact_model(model, selected)
+
+    full_probs = model.predict_proba(X_eval)[:, 1]
+    compact_probs = compact.predict_proba(X_eval)[:, 1]
+
+    joblib.dump(compact, output_path)
+    save_metrics(y_eval, compact.predict(X_eval), compact_probs, len(y_test) - len(eval_idx), output_path)
+
+    rows = [dict(zip(X_test.columns, map(float, row))) for row in X_test.to_numpy()[:500]]
+    full_latency = measure_latency(model_path, rows)
+    compact_latency = measure_latency(output_path, rows)
+
+    report = {
+        "source_model": os.path.basename(model_path),
+        "n_estimators": len(model.estimators_),
+        "n_estimators_compact": len(selected),
+        "tolerance": tolerance,
+        "max_deviation_validation": round(val_deviation, 6),
+        "max_deviation_eval": round(float(np.abs(compact_probs - full_probs).max()), 6),
+        "roc_auc": round(float(roc_auc_score(y_eval, full_probs)), 4),
+        "roc_auc_compact": round(float(roc_auc_score(y_eval, compact_probs)), 4),
+        "single_p99_ms": full_latency["single_p99_ms"],
+        "single_p99_ms_compact": compact_latency["single_p99_ms"],
+        "batch_p99_ms": full_latency["batch_p99_ms"],
+        "batch_p99_ms_compact": compact_latency["batch_p99_ms"],
+    }
+    report["roc_auc_change"] = round(report["roc_auc_compact"] - report["roc_auc"], 4)
+    report["single_speedup"] = round(report["single_p99_ms"] / report["single_p99_ms_compact"], 2)
+    report["batch_speedup"] = round(report["batch_p99_ms"] / report["batch_p99_ms_compact"], 2)
+
+    # Keep the report with the compacted model's metrics (shown in /model/info)
+    with open(metrics_path(output_path), "r", encoding="utf-8") as f:
+        metrics = json.load(f)
+    metrics["compaction"] = report
+    with open(metrics_path(output_path), "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2)
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compacta el bosque conservando sus probabilidades")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--data-path", default=DATA_PATH)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Desviación máxima de probabilidad")
+    parser.add_argument("--output", default=None, help="Por defecto model.compact.joblib")
+    args = parser.parse_args()
+
+    report = compact_forest(args.model_path, args.data_path, args.tolerance, args.output)
+    print(
+        f"\nÁrboles: {report['n_estimators']} -> {report['n_estimators_compact']} "
+        f"(desviación máx. {report['max_deviation_eval']:.4f})\n"
+        f"ROC AUC: {report['roc_auc']:.4f} -> {report['roc_auc_compact']:.4f} ({report['roc_auc_change']:+.4f})\n"
+        f"p99 una fila: {report['single_p99_ms']:.3f} ms -> {report['single_p99_ms_compact']:.3f} ms "
+        f"({report['single_speedup']}x)\n"
+        f"p99 lote: {report['batch_p99_ms']:.3f} ms -> {report['batch_p99_ms_compact']:.3f} ms "
+        f"({report['batch_speedup']}x)"
+    )
@@ -0,0 +1,131 @@
+"""
+Training data loading
+
+The CSV is parsed once, in chunks, straight into float32 arrays (the dtype
+the forest trains on) and cached as .npy files next to it. Later runs
+memory-map the cache instead of parsing again. The train/test split is
+done on row indices, so only the selected rows are ever copied into memory.
+"""
+import json
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+LABEL_COLUMN = "Class"
+CHUNK_ROWS = 100_000
+
+
+def cache_paths(csv_path: str) -> Tuple[str, str, str]:
+    """(features .npy, labels .npy, metadata .json) cached next to the CSV"""
+    base = os.path.splitext(csv_path)[0]
+    return base + ".features.npy", base + ".labels.npy", base + ".cache.json"
+
+
+def _source_signature(csv_path: str) -> dict:
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _count_rows(csv_path: str) -> int:
+    """Data rows in the CSV (lines after the header), without parsing"""
+    lines, last = 0, b"\n"
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(0, lines - 1)
+
+
+def _build_cache(csv_path: str, chunk_rows: int) -> List[str]:
+    """Parse the CSV chunk by chunk into the .npy cache; returns the feature names"""
+    features_path, labels_path, meta_path = cache_paths(csv_path)
+    columns = list(pd.read_csv(csv_path, nrows=0).columns)
+    if LABEL_COLUMN not in columns:
+        raise ValueError(f"{csv_path} has no {LABEL_COLUMN} column")
+    features = [column for column in columns if column != LABEL_COLUMN]
+
+    capacity = _count_rows(csv_path)
+    tmp_features, tmp_labels = features_path + ".tmp", labels_path + ".tmp"
+    X = np.lib.format.open_memmap(tmp_features, mode="w+", dtype=np.float32, shape=(capacity, len(features)))
+    y = np.lib.format.open_memmap(tmp_labels, mode="w+", dtype=np.int8, shape=(capacity,))
+
+    dtypes = {column: np.float32 for column in features}
+    dtypes[LABEL_COLUMN] = np.int8
+    rows = 0
+    for chunk in pd.read_csv(csv_path, dtype=dtypes, chunksize=chunk_rows):
+        n = len(chunk)
+        X[rows:rows + n] = chunk[features].to_numpy()
+        y[rows:rows + n] = chunk[LABEL_COLUMN].to_numpy()
+        rows += n
+    X.flush()
+    y.flush()
+
+    if rows != capacity:
+        # Blank lines are counted but not parsed; rewrite at the exact size
+        np.save(tmp_features + ".npy", X[:rows])
+        np.save(tmp_labels + ".npy", y[:rows])
+        del X, y
+        os.replace(tmp_features + ".npy", tmp_features)
+        os.replace(tmp_labels + ".npy", tmp_labels)
+    else:
+        del X, y
+
+    os.replace(tmp_features, features_path)
+    os.replace(tmp_labels, labels_path)
+    # Metadata last: it marks the cache as complete
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"features": features, "rows": rows, "source": _source_signature(csv_path)}, f, indent=2)
+    return features
+
+
+def load_dataset(
+    csv_path: str, use_cache: bool = True, chunk_rows: int = CHUNK_ROWS
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """Features and labels of a training CSV as memory-mapped float32/int8 arrays
+
+    Args:
+        csv_path: CSV with the feature columns and a Class column
+        use_cache: Reuse the .npy cache when it matches the CSV (size and mtime)
+        chunk_rows: Rows parsed at a time when (re)building the cache
+
+    Returns:
+        (X, y, feature names)
+    """
+    features_path, labels_path, meta_path = cache_paths(csv_path)
+
+    meta: Optional[dict] = None
+    if use_cache:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+    if meta is None or meta.get("source") != _source_signature(csv_path):
+        features = _build_cache(csv_path, chunk_rows)
+    else:
+        features = meta["features"]
+
+    X = np.load(features_path, mmap_mode="r")
+    y = np.load(labels_path, mmap_mode="r")
+    return X, y, features
+
+
+def stratified_split(
+    y: np.ndarray, test_size: float = 0.2, random_state: int = 42
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Stratified train/test row indices
+
+    Same rows, in the same order, as train_test_split(X, y, stratify=y) with
+    these arguments, without copying X.
+    """
+    return train_test_split(
+        np.arange(len(y)),
+        test_size=test_size,
+        random_state=random_state,
+        stratify=np.asarray(y),
+    )
@@ -0,0 +1,312 @@
+"""
+Flat-array inference engine for sklearn tree ensembles
+
+export_forest() flattens the fitted trees of a RandomForestClassifier into
+contiguous NumPy arrays (feature, threshold, children and leaf value per
+node). CompiledForest re-lays those trees out as complete binary trees of
+the ensemble's max depth, so a whole batch can be scored level by level
+across all trees at once with plain array indexing. The layout can be saved
+as plain .npy files and memory-mapped back, so several processes share one
+copy of the arrays through the page cache.
+"""
+import json
+import os
+import shutil
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# A complete tree of depth D has 2**D leaves; past this depth the padded
+# layout costs more memory than it saves.
+MAX_COMPILED_DEPTH = 12
+
+# Rows are scored in chunks so the (rows x trees) index arrays stay in cache
+CHUNK_ROWS = 256
+
+# Files of a saved layout; the arrays are stored exactly as scoring reads them
+FOREST_META = "meta.json"
+FOREST_ARRAYS = ("feature", "threshold", "leaf_by_class")
+
+
+def export_forest(model: Any) -> Dict[str, np.ndarray]:
+    """Flatten a fitted forest into contiguous per-node arrays
+
+    Node ids are global: tree t owns nodes tree_offsets[t]..tree_offsets[t+1]-1
+    and its children arrays point at global ids (-1 marks a leaf).
+
+    Args:
+        model: Fitted RandomForestClassifier (or any forest of tree classifiers)
+
+    Returns:
+        Dictionary with feature, threshold, children_left, children_right,
+        value (class probabilities per node) and tree_offsets
+    """
+    estimators = getattr(model, "estimators_", None)
+    if not estimators:
+        raise ValueError("Model is not a fitted tree ensemble")
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Multi-output forests are not supported")
+
+    features, thresholds, lefts, rights, values = [], [], [], [], []
+    offsets = [0]
+
+    for estimator in estimators:
+        tree = estimator.tree_
+        offset = offsets[-1]
+        is_leaf = tree.children_left == -1
+
+        value = tree.value[:, 0, :].astype(np.float64)
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+
+        features.append(np.where(is_leaf, -1, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(is_leaf, -1, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, -1, tree.children_right + offset).astype(np.int32))
+        values.append(value / normalizer)
+        offsets.append(offset + tree.node_count)
+
+    return {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "children_left": np.concatenate(lefts),
+        "children_right": np.concatenate(rights),
+        "value": np.concatenate(values),
+        "tree_offsets": np.asarray(offsets, dtype=np.int64),
+    }
+
+
+class CompiledForest:
+    """Vectorized evaluator over complete-binary-tree node arrays"""
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        leaf_value: np.ndarray,
+        n_features: int,
+    ):
+        """Initialize from the compiled layout
+
+        Args:
+            feature: (n_trees, 2**depth - 1) split feature per internal slot
+            threshold: (n_trees, 2**depth - 1) split threshold per internal slot
+            leaf_value: (n_trees, 2**depth, n_classes) class probabilities per leaf
+            n_features: Number of input columns expected
+        """
+        self.n_trees, n_internal = feature.shape
+        self.depth = int(np.log2(n_internal + 1))
+        self.n_features = n_features
+        self.n_classes = leaf_value.shape[2]
+
+        self.feature = feature
+        self.threshold = threshold
+        self.leaf_value = leaf_value
+
+        # Flattened views plus per-tree base offsets for 1-D gathers
+        self._feature_flat = feature.reshape(-1)
+        self._threshold_flat = _floor_float32(threshold.reshape(-1))
+        self._leaf_by_class = np.ascontiguousarray(leaf_value.reshape(-1, self.n_classes).T)
+        self._set_bases(n_internal)
+
+    def _set_bases(self, n_internal: int) -> None:
+        self._node_base = np.arange(self.n_trees, dtype=np.intp) * n_internal
+        self._leaf_base = np.arange(self.n_trees, dtype=np.intp) * (n_internal + 1) - n_internal
+
+    @classmethod
+    def from_flat(cls, flat: Dict[str, np.ndarray], n_features: int) -> "CompiledForest":
+        """Compile export_forest() arrays into the complete-tree layout"""
+        feature_in = flat["feature"]
+        threshold_in = flat["threshold"]
+        left_in = flat["children_left"]
+        right_in = flat["children_right"]
+        value_in = flat["value"]
+        offsets = flat["tree_offsets"]
+        n_trees = len(offsets) - 1
+
+        # Depth of every tree, computed over the global child pointers
+        node_depth = np.zeros(len(feature_in), dtype=np.int64)
+        for t in range(n_trees):
+            for node in range(offsets[t], offsets[t + 1]):
+                if left_in[node] != -1:
+                    node_depth[left_in[node]] = node_depth[node] + 1
+                    node_depth[right_in[node]] = node_depth[node] + 1
+        depth = int(node_depth.max()) if len(node_depth) else 0
+        depth = max(depth, 1)
+        if depth > MAX_COMPILED_DEPTH:
+            raise ValueError(f"Trees of depth {depth} are too deep to compile")
+
+        n_internal = 2 ** depth - 1
+        n_classes = value_in.shape[1]
+        feature = np.zeros((n_trees, n_internal), dtype=np.intp)
+        # +inf sends every row left, which pads shallow leaves down to full depth
+        threshold = np.full((n_trees, n_internal), np.inf, dtype=np.float64)
+        leaf_value = np.zeros((n_trees, n_internal + 1, n_classes), dtype=np.float64)
+
+        for t in range(n_trees):
+            stack = [(int(offsets[t]), 0, 0)]
+            while stack:
+                node, slot, level = stack.pop()
+                if level == depth:
+                    leaf_value[t, slot - n_internal] = value_in[node]
+                    continue
+                if left_in[node] == -1:
+                    # Leaf above full depth: both padded children repeat it
+                    stack.append((node, 2 * slot + 1, level + 1))
+                    stack.append((node, 2 * slot + 2, level + 1))
+                    continue
+                feature[t, slot] = feature_in[node]
+                threshold[t, slot] = threshold_in[node]
+                stack.append((int(left_in[node]), 2 * slot + 1, level + 1))
+                stack.append((int(right_in[node]), 2 * slot + 2, level + 1))
+
+        return cls(feature, threshold, leaf_value, n_features)
+
+    @classmethod
+    def from_estimator(cls, model: Any) -> "CompiledForest":
+        """Export and compile a fitted sklearn forest"""
+        return cls.from_flat(export_forest(model), int(model.n_features_in_))
+
+    def save(self, directory: str, meta: Optional[Dict[str, Any]] = None) -> None:
+        """Save the scoring arrays as uncompressed .npy files
+
+        The directory is written under a temporary name and renamed into
+        place, so concurrent loaders see either the old or the new layout.
+
+        Args:
+            directory: Target directory (replaced if it exists)
+            meta: Extra JSON-serializable fields stored in meta.json
+        """
+        tmp_directory = f"{directory}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+
+        arrays = {
+            "feature": self._feature_flat.astype(np.int32),
+            "threshold": self._threshold_flat,
+            "leaf_by_class": self._leaf_by_class,
+        }
+        for name in FOREST_ARRAYS:
+            np.save(os.path.join(tmp_directory, f"{name}.npy"), np.ascontiguousarray(arrays[name]))
+        with open(os.path.join(tmp_directory, FOREST_META), "w", encoding="utf-8") as f:
+            json.dump({
+                **(meta or {}),
+                "n_trees": self.n_trees,
+                "depth": self.depth,
+                "n_features": self.n_features,
+                "n_classes": self.n_classes,
+            }, f, indent=2)
+
+        old_directory = f"{directory}.old-{os.getpid()}"
+        try:
+            os.rename(directory, old_directory)
+        except FileNotFoundError:
+            pass
+        try:
+            os.rename(tmp_directory, directory)
+        except OSError:
+            # Another process published a layout first; use theirs
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+        shutil.rmtree(old_directory, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = "r") -> "CompiledForest":
+        """Load a layout written by save()
+
+        With mmap_mode="r" the arrays are read-only memory maps: nothing is
+        copied, and every process mapping the same files shares their pages.
+        The 2-D feature/threshold/leaf_value attributes become views of the
+        stored arrays (thresholds already floored to float32).
+        """
+        meta = read_forest_meta(directory)
+        if not meta:
+            raise ValueError(f"No compiled forest in {directory}")
+
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in FOREST_ARRAYS
+        }
+
+        forest = cls.__new__(cls)
+        forest.n_trees = int(meta["n_trees"])
+        forest.depth = int(meta["depth"])
+        forest.n_features = int(meta["n_features"])
+        forest.n_classes = int(meta["n_classes"])
+        n_internal = 2 ** forest.depth - 1
+
+        forest._feature_flat = arrays["feature"]
+        forest._threshold_flat = arrays["threshold"]
+        forest._leaf_by_class = arrays["leaf_by_class"]
+        forest.feature = forest._feature_flat.reshape(forest.n_trees, n_internal)
+        forest.threshold = forest._threshold_flat.reshape(forest.n_trees, n_internal)
+        forest.leaf_value = forest._leaf_by_class.T.reshape(forest.n_trees, n_internal + 1, forest.n_classes)
+        forest._set_bases(n_internal)
+        return forest
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities, matching RandomForestClassifier.predict_proba
+
+        Args:
+            X: (n_rows, n_features) matrix in training column order
+
+        Returns:
+            (n_rows, n_classes) array of averaged tree probabilities
+        """
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got shape {X.shape}")
+        if np.isnan(X).any():
+            # sklearn routes missing values per split; leave those rows to it
+            raise ValueError("Missing values are not supported by the compiled forest")
+
+        out = np.empty((X.shape[0], self.n_classes), dtype=np.float64)
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            chunk = X[start:start + CHUNK_ROWS]
+            out[start:start + CHUNK_ROWS] = self._score_chunk(chunk)
+        return out
+
+    def _score_chunk(self, X: np.ndarray) -> np.ndarray:
+        values = X.reshape(-1)
+        row_base = (np.arange(X.shape[0], dtype=np.intp) * X.shape[1])[:, None]
+        slot = np.zeros((X.shape[0], self.n_trees), dtype=np.intp)
+
+        for _ in range(self.depth):
+            node = slot + self._node_base
+            x = values.take(row_base + self._feature_flat.take(node))
+            slot = 2 * slot + 1 + (x > self._threshold_flat.take(node))
+
+        leaf = slot + self._leaf_base
+        proba = np.empty((X.shape[0], self.n_classes), dtype=np.float64)
+        for c in range(self.n_classes):
+            proba[:, c] = self._leaf_by_class[c].take(leaf).sum(axis=1)
+        return proba / self.n_trees
+
+
+def _floor_float32(threshold: np.ndarray) -> np.ndarray:
+    """Largest float32 <= each threshold
+
+    For float32 inputs x, x <= t exactly when x <= floor32(t), so the
+    comparison can run in float32 without changing any split decision.
+    """
+    rounded = threshold.astype(np.float32)
+    above = rounded.astype(np.float64) > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def read_forest_meta(directory: str) -> Dict[str, Any]:
+    """meta.json of a saved layout, or {} if there is none"""
+    try:
+        with open(os.path.join(directory, FOREST_META), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def compile_model(model: Any) -> Optional[CompiledForest]:
+    """Compile a fitted model, or return None if it cannot be compiled"""
+    try:
+        return CompiledForest.from_estimator(model)
+    except (AttributeError, ValueError, TypeError):
+        return None
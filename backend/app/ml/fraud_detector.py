@@ -1,20 +1,39 @@
 import os
+import threading
+import time
+import warnings
 import joblib
+import numpy as np
 import pandas as pd
 import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.ml.forest_engine import CompiledForest, compile_model, read_forest_meta
+from app.ml.model_info import build_model_info, file_sha256, file_signature, model_summary
+from app.ml.prediction_cache import PredictionCache
+from app.metrics import stage_timer
 
 logger = logging.getLogger(__name__)
 if not logger.handlers:
     # Basic configuration for simple debugging in local/dev
     logging.basicConfig(level=logging.INFO)
 
+# Above this many rows sklearn's per-tree C loops (threaded with n_jobs)
+# outrun the level-by-level array walk, so large batches go to sklearn.
+ENGINE_MAX_ROWS = 1024
+
+
+def forest_path(model_path: str) -> str:
+    """Directory holding the memory-mappable compiled forest (model.forest)"""
+    return os.path.splitext(model_path)[0] + ".forest"
+
 
 class FraudDetector:
-    def __init__(self):
+    def __init__(self, model_path: Optional[str] = None):
         base_path = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(base_path, "model.joblib")
-
-        self.model = joblib.load(model_path)
+        # FRAUD_MODEL_PATH selects another model file, e.g. model.compact.joblib
+        # written by compact_forest.py (relative paths are resolved against app/ml)
+        self.model_path = model_path or os.path.join(base_path, os.getenv("FRAUD_MODEL_PATH", "model.joblib"))
 
         # ORDEN Y NOMBRES EXACTOS DEL CSV
         self.expected_features = (
@@ -23,7 +42,182 @@ class FraudDetector:
             ["Amount"]
         )
 
-    def predict(self, features: dict) -> float:
+        # Request key -> column index. Upper-case names cover any casing via
+        # key.upper(); the request and CSV spellings are added so the common
+        # case is a single dict lookup.
+        self._feature_index: Dict[str, int] = {}
+        for index, feature in enumerate(self.expected_features):
+            for key in (feature, feature.upper(), feature.lower()):
+                self._feature_index[key] = index
+
+        self._local = threading.local()
+        self._reload_lock = threading.Lock()
+        self._model_lock = threading.RLock()
+        # MODEL_LOAD_MODE=mmap memory-maps the compiled forest instead of
+        # unpickling the sklearn model in every worker
+        self.load_mode = os.getenv("MODEL_LOAD_MODE", "joblib").lower()
+        # Scoring calls check the model file for changes at most this often (0 disables)
+        self.reload_interval = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", "5"))
+        self._next_reload_check = 0.0
+
+        self.cache: Optional[PredictionCache] = None
+        self._load()
+
+        # Optional score cache for repeated feature rows (PREDICT_CACHE_SIZE > 0)
+        cache_size = int(os.getenv("PREDICT_CACHE_SIZE", "0"))
+        if cache_size > 0:
+            self.cache = PredictionCache(cache_size, float(os.getenv("PREDICT_CACHE_TTL_SECONDS", "300")))
+
+    def _load(self) -> None:
+        """Load the model file and derive the engine and metadata from it"""
+        signature = file_signature(self.model_path)
+
+        if self.load_mode == "mmap":
+            mapped = self._load_mapped_engine()
+            if mapped is not None:
+                # Metadata comes from meta.json; the sklearn model is only
+                # unpickled if something needs it (see the model property)
+                engine, meta = mapped
+                info = build_model_info(meta["model_summary"], self.model_path, "mmap", meta["model_sha256"])
+                self._model, self.engine, self._info = None, engine, info
+                self._signature = signature
+                self._invalidate_cache()
+                return
+
+        model = joblib.load(self.model_path)
+        engine = self._load_engine(model)
+        info = build_model_info(
+            model_summary(model, self.expected_features),
+            self.model_path,
+            "compiled" if engine is not None else "sklearn",
+        )
+
+        self._model, self.engine, self._info = model, engine, info
+        self._signature = signature
+        self._invalidate_cache()
+
+    def _invalidate_cache(self) -> None:
+        """Scores from a previous model must not be served after a (re)load"""
+        if self.cache is not None:
+            self.cache.clear()
+
+    def _load_mapped_engine(self) -> Optional[Tuple[CompiledForest, Dict[str, Any]]]:
+        """Memory-map model.forest, exporting it first if missing or stale
+
+        The layout records the sha256 of the model file it was compiled
+        from and the model_summary served by /model/info; the first worker
+        to find it missing or outdated rebuilds it.
+
+        Returns:
+            The mapped engine and its meta.json, or None to load with joblib
+        """
+        if os.getenv("FRAUD_ENGINE", "compiled").lower() == "sklearn":
+            logger.warning("MODEL_LOAD_MODE=mmap needs the compiled engine, loading with joblib")
+            return None
+
+        path = forest_path(self.model_path)
+        sha256 = file_sha256(self.model_path)
+        try:
+            meta = read_forest_meta(path)
+            if meta.get("model_sha256") != sha256 or "model_summary" not in meta:
+                model = joblib.load(self.model_path)
+                engine = compile_model(model)
+                if engine is None:
+                    logger.warning("Compiled forest engine unavailable, loading with joblib")
+                    return None
+                engine.save(path, {
+                    "model_sha256": sha256,
+                    "model_summary": model_summary(model, self.expected_features),
+                })
+                logger.info("Exported compiled forest to %s", path)
+            engine = CompiledForest.load(path, mmap_mode="r")
+            # Another worker may have published the layout first
+            meta = read_forest_meta(path)
+            if meta.get("model_sha256") != sha256 or "model_summary" not in meta:
+                raise ValueError("layout does not match the model file")
+            return engine, meta
+        except (OSError, ValueError) as e:
+            logger.warning("Could not memory-map %s (%s), loading with joblib", path, e)
+            return None
+
+    @property
+    def model(self) -> Any:
+        """The sklearn model, loaded on first access in mmap mode"""
+        model = self._model
+        if model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = joblib.load(self.model_path)
+                model = self._model
+        return model
+
+    def reload_if_changed(self) -> bool:
+        """Reload the model if its file (or metrics file) changed on disk
+
+        Returns:
+            True if the model was reloaded
+        """
+        if file_signature(self.model_path) == self._signature:
+            return False
+        with self._reload_lock:
+            if file_signature(self.model_path) == self._signature:
+                return False
+            logger.info("Model file changed, reloading %s", self.model_path)
+            self._load()
+        return True
+
+    def _check_reload(self) -> None:
+        """Throttled reload_if_changed for the scoring path
+
+        A model file that fails to load (e.g. still being written) is logged
+        and the loaded model keeps serving; the check is retried next interval.
+        """
+        if self.reload_interval <= 0:
+            return
+        now = time.monotonic()
+        if now < self._next_reload_check:
+            return
+        self._next_reload_check = now + self.reload_interval
+        try:
+            self.reload_if_changed()
+        except Exception:
+            logger.exception("Could not reload %s, keeping the loaded model", self.model_path)
+
+    def get_info(self) -> Dict[str, Any]:
+        """Model metadata computed at load time (params, features, importances, metrics, hash)"""
+        return self._info
+
+    def _load_engine(self, model: Any) -> Optional[CompiledForest]:
+        """Compile the forest to flat arrays unless disabled via FRAUD_ENGINE=sklearn"""
+        if os.getenv("FRAUD_ENGINE", "compiled").lower() == "sklearn":
+            return None
+
+        engine = compile_model(model)
+        if engine is None:
+            logger.warning("Compiled forest engine unavailable, using sklearn predict_proba")
+        return engine
+
+    def _predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Score a feature matrix with the compiled engine, falling back to sklearn
+
+        Large batches only go to sklearn when its model is already in memory,
+        so mmap mode does not unpickle a private copy just for them.
+        """
+        with stage_timer("model_inference"):
+            if self.engine is not None and (X.shape[0] <= ENGINE_MAX_ROWS or self._model is None):
+                try:
+                    return self.engine.predict_proba(X)
+                except ValueError:
+                    pass
+            model = self.model
+            with warnings.catch_warnings():
+                # X is a plain array already in expected_features order; the
+                # model was fitted on a DataFrame and would warn on every call
+                warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+                return model.predict_proba(X)
+
+    def _format_features(self, features: Dict[str, Any]) -> Dict[str, Any]:
+        """Map request keys (amount, time, v1...) to the CSV column names"""
         formatted = {}
 
         for key, value in features.items():
@@ -36,15 +230,115 @@ class FraudDetector:
             elif key_upper.startswith("V"):
                 formatted[key_upper] = value
 
-        row = {
-            feature: formatted.get(feature, 0.0)
-            for feature in self.expected_features
-        }
+        return formatted
+
+    def _fill_row(self, row: np.ndarray, features: Dict[str, Any]) -> None:
+        """Write a feature dict into a float64 row in expected_features order"""
+        row.fill(0.0)
+        index = self._feature_index
+        for key, value in features.items():
+            i = index.get(key)
+            if i is None:
+                i = index.get(key.upper())
+                if i is None:
+                    continue
+            row[i] = value
+
+    def _row_buffer(self) -> np.ndarray:
+        """Preallocated (1, n_features) buffer owned by the calling thread"""
+        buffer = getattr(self._local, "row", None)
+        if buffer is None:
+            buffer = np.zeros((1, len(self.expected_features)), dtype=np.float64)
+            self._local.row = buffer
+        return buffer
+
+    def predict(self, features: dict) -> float:
+        self._check_reload()
+        buffer = self._row_buffer()
+        with stage_timer("feature_construction"):
+            self._fill_row(buffer[0], features)
+
+        cache = self.cache
+        if cache is None:
+            score = self._predict_proba(buffer)[0][1]
+            return round(float(score), 4)
+
+        # +0.0 turns -0.0 into 0.0 so equal rows have equal bytes
+        np.add(buffer, 0.0, out=buffer)
+        key = buffer.tobytes()
+        generation = cache.generation
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
 
-        df = pd.DataFrame([row])
+        score = round(float(self._predict_proba(buffer)[0][1]), 4)
+        cache.put(key, score, generation)
+        return score
 
-        print(self.model.feature_names_in_)
-        print(df.columns.tolist())
+    def predict_dataframe(self, features: dict) -> float:
+        """Original pandas-based scoring path, kept as the reference for predict"""
+        with stage_timer("feature_construction"):
+            formatted = self._format_features(features)
 
-        score = self.model.predict_proba(df)[0][1]
+            row = {
+                feature: formatted.get(feature, 0.0)
+                for feature in self.expected_features
+            }
+
+            df = pd.DataFrame([row])
+
+        model = self.model
+        with stage_timer("model_inference"):
+            score = model.predict_proba(df)[0][1]
         return round(float(score), 4)
+
+    def predict_batch(self, features_list: List[Dict[str, Any]]) -> List[float]:
+        """Score many transactions with a single predict_proba call
+
+        Args:
+            features_list: Feature dicts in the same format accepted by predict
+
+        Returns:
+            Fraud probabilities, in the same order as the input
+        """
+        if not features_list:
+            return []
+
+        self._check_reload()
+        with stage_timer("feature_construction"):
+            matrix = np.empty((len(features_list), len(self.expected_features)), dtype=np.float64)
+            for i, features in enumerate(features_list):
+                self._fill_row(matrix[i], features)
+
+        cache = self.cache
+        if cache is None:
+            scores = self._predict_proba(matrix)[:, 1]
+            return [round(float(score), 4) for score in scores]
+
+        # Only rows missing from the cache go to the model
+        np.add(matrix, 0.0, out=matrix)
+        generation = cache.generation
+        keys = [row.tobytes() for row in matrix]
+        results = [cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(results) if score is None]
+        if missing:
+            rows = matrix if len(missing) == len(matrix) else matrix[missing]
+            for i, score in zip(missing, self._predict_proba(rows)[:, 1]):
+                results[i] = round(float(score), 4)
+                cache.put(keys[i], results[i], generation)
+        return results
+
+
+# Global instance shared by the routers
+_fraud_detector: Optional[FraudDetector] = None
+_fraud_detector_lock = threading.Lock()
+
+
+def get_fraud_detector() -> FraudDetector:
+    """Get or create the global FraudDetector instance"""
+    global _fraud_detector
+    if _fraud_detector is None:
+        with _fraud_detector_lock:
+            if _fraud_detector is None:
+                _fraud_detector = FraudDetector()
+    return _fraud_detector
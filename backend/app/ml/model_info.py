@@ -0,0 +1,136 @@
+"""
+Model metadata for /model/info
+
+Everything here is derived once per loaded model file: estimator
+parameters, feature list, impurity-based feature importances (a walk over
+every tree), training metrics saved by train_model.py and the file hash.
+The estimator-derived part (model_summary) is JSON, so it can be stored
+next to a compiled forest and served without unpickling the model.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Top-level metric keys read by the frontend's getModelInfo
+METRIC_KEYS = ("accuracy", "precision", "recall", "f1_score", "roc_auc")
+
+
+def metrics_path(model_path: str) -> str:
+    """Training metrics file written next to the model (model.metrics.json)"""
+    return os.path.splitext(model_path)[0] + ".metrics.json"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_signature(model_path: str) -> Any:
+    """(mtime, size) of the model and its metrics file, to detect changes cheaply"""
+    signature = []
+    for path in (model_path, metrics_path(model_path)):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def load_training_metrics(model_path: str, sha256: str) -> Optional[Dict[str, Any]]:
+    """Metrics saved at training time, or None if missing or for another model file"""
+    try:
+        with open(metrics_path(model_path), "r", encoding="utf-8") as f:
+            metrics = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(metrics, dict):
+        return None
+    if metrics.get("model_sha256") not in (None, sha256):
+        return None
+    return metrics
+
+
+def _json_safe(value: Any) -> Any:
+    """Estimator params as plain JSON values (numpy scalars, dict keys, objects)"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, dict):
+        return {str(key): _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if hasattr(value, "item"):
+        return value.item()
+    return repr(value)
+
+
+def model_summary(model: Any, features: List[str]) -> Dict[str, Any]:
+    """Metadata read from the fitted estimator itself
+
+    Args:
+        model: Fitted estimator
+        features: Feature names used when the model has no feature_names_in_
+
+    Returns:
+        Model type, parameters, classes, features and ranked importances
+    """
+    names = [str(name) for name in getattr(model, "feature_names_in_", features)]
+
+    importances = getattr(model, "feature_importances_", None)
+    ranked = []
+    if importances is not None:
+        ranked = sorted(
+            ({"feature": name, "importance": round(float(value), 6)} for name, value in zip(names, importances)),
+            key=lambda item: item["importance"],
+            reverse=True,
+        )
+
+    return {
+        "model_type": type(model).__name__,
+        "n_estimators": len(getattr(model, "estimators_", [])) or None,
+        "params": _json_safe(model.get_params()) if hasattr(model, "get_params") else {},
+        "classes": _json_safe(list(getattr(model, "classes_", []))),
+        "features": names,
+        "n_features": len(names),
+        "feature_importances": ranked,
+    }
+
+
+def build_model_info(
+    summary: Dict[str, Any], model_path: str, engine: str, sha256: Optional[str] = None
+) -> Dict[str, Any]:
+    """Collect the /model/info response for a freshly loaded model
+
+    Args:
+        summary: model_summary() of the estimator in model_path
+        model_path: File the estimator was loaded from
+        engine: Scoring engine in use ("compiled", "sklearn" or "mmap")
+        sha256: Hash of model_path, if the caller already computed it
+
+    Returns:
+        JSON-ready model metadata
+    """
+    sha256 = sha256 or file_sha256(model_path)
+    stat = os.stat(model_path)
+    metrics = load_training_metrics(model_path, sha256)
+
+    info = {
+        **summary,
+        "training_metrics": metrics,
+        "engine": engine,
+        "file": {
+            "name": os.path.basename(model_path),
+            "sha256": sha256,
+            "size_bytes": stat.st_size,
+            "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+        },
+        "loaded_at": datetime.now().isoformat(),
+    }
+    for key in METRIC_KEYS:
+        info[key] = metrics.get(key) if metrics else None
+    return info
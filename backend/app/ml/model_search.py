@@ -0,0 +1,197 @@
+"""
+Hyperparameter search with an inference latency budget
+
+Candidates from a grid of n_estimators, max_depth and class_weight are fitted
+in a process pool (one single-threaded fit per worker) and scored on the
+held-out split. Their inference latency is then measured one candidate at a
+time, through FraudDetector as the API serves it: single-row predict and
+predict_batch. The best candidate by ROC AUC (then recall) whose single-row
+p99 fits the budget becomes model.joblib, and the full results table is
+saved next to it as model.search.csv.
+"""
+import csv
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import precision_score, recall_score, roc_auc_score
+
+from app.ml.dataset import load_dataset
+from app.ml.fraud_detector import FraudDetector
+from app.ml.train_model import MODEL_PARAMS, MODEL_PATH, load_data, save_metrics
+
+SEARCH_GRID = {
+    "n_estimators": [100, 250, 500],
+    "max_depth": [5, 8, 12],
+    "class_weight": [{0: 1, 1: 20}, "balanced", None],
+}
+# Single-row p99 allowed by default, in milliseconds
+LATENCY_BUDGET_MS = 5.0
+LATENCY_SAMPLES = 500
+BATCH_SIZE = 256
+BATCH_ROUNDS = 20
+
+RESULT_COLUMNS = [
+    "n_estimators", "max_depth", "class_weight",
+    "roc_auc", "recall", "precision", "fit_seconds",
+    "single_p50_ms", "single_p99_ms", "batch_p99_ms",
+    "within_budget", "selected",
+]
+
+# Split loaded once per worker process
+_worker_data = None
+
+
+def search_results_path(model_path: str = MODEL_PATH) -> str:
+    """Results table written next to the model (model.search.csv)"""
+    return os.path.splitext(model_path)[0] + ".search.csv"
+
+
+def _init_worker(data_path: str) -> None:
+    global _worker_data
+    _worker_data = load_data(data_path)
+
+
+def _fit_candidate(params: Dict[str, Any], output_path: str) -> Dict[str, Any]:
+    """Fit one candidate in a worker, save it and score it on the held-out split"""
+    X_train, X_test, y_train, y_test = _worker_data
+
+    start = time.perf_counter()
+    model = RandomForestClassifier(**{**MODEL_PARAMS, **params, "n_jobs": 1}).fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    probs = model.predict_proba(X_test)[:, 1]
+    preds = (probs > 0.5).astype(int)
+    joblib.dump(model, output_path)
+    return {
+        "roc_auc": round(float(roc_auc_score(y_test, probs)), 4),
+        "recall": round(float(recall_score(y_test, preds, zero_division=0)), 4),
+        "precision": round(float(precision_score(y_test, preds, zero_division=0)), 4),
+        "fit_seconds": round(fit_seconds, 2),
+    }
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    return float(np.percentile(samples, pct))
+
+
+def measure_latency(model_path: str, rows: List[Dict[str, float]]) -> Dict[str, float]:
+    """Single-row and batch latency of a saved model, in milliseconds"""
+    detector = FraudDetector(model_path)
+    # Fresh rows on every call, so an enabled PREDICT_CACHE_SIZE cannot hit
+    detector.cache = None
+
+    for features in rows[:20]:
+        detector.predict(features)
+    single = []
+    for features in rows[:LATENCY_SAMPLES]:
+        start = time.perf_counter()
+        detector.predict(features)
+        single.append((time.perf_counter() - start) * 1000)
+
+    batch = []
+    for i in range(BATCH_ROUNDS):
+        chunk = rows[(i * BATCH_SIZE) % len(rows):][:BATCH_SIZE]
+        start = time.perf_counter()
+        detector.predict_batch(chunk)
+        batch.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "single_p50_ms": round(_percentile(single, 50), 4),
+        "single_p99_ms": round(_percentile(single, 99), 4),
+        "batch_p99_ms": round(_percentile(batch, 99), 4),
+    }
+
+
+def save_results(results: List[Dict[str, Any]], path: str) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        for result in results:
+            writer.writerow({**result, "class_weight": repr(result["class_weight"])})
+
+
+def search_model(
+    data_path: str,
+    latency_budget_ms: Optional[float] = None,
+    workers: Optional[int] = None,
+    grid: Optional[Dict[str, List[Any]]] = None,
+    model_path: str = MODEL_PATH,
+) -> List[Dict[str, Any]]:
+    """Run the search and install the selected candidate as the model
+
+    Args:
+        data_path: Training CSV
+        latency_budget_ms: Maximum single-row p99 (defaults to LATENCY_BUDGET_MS)
+        workers: Fit processes (defaults to the CPU count)
+        grid: Values to try per parameter (defaults to SEARCH_GRID)
+        model_path: Where the selected model is saved
+
+    Returns:
+        One result row per candidate, in grid order
+    """
+    budget = LATENCY_BUDGET_MS if latency_budget_ms is None else latency_budget_ms
+    grid = grid or SEARCH_GRID
+    candidates = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+    # Build the .npy cache once, before the workers memory-map it
+    X, _, features = load_dataset(data_path)
+    tmp_dir = tempfile.mkdtemp(prefix="model_search_")
+    try:
+        paths = [os.path.join(tmp_dir, f"candidate_{i}.joblib") for i in range(len(candidates))]
+
+        print(f"Entrenando {len(candidates)} candidatos...")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_path,)) as pool:
+            scores = list(pool.map(_fit_candidate, candidates, paths))
+
+        # Latency is measured sequentially so candidates do not compete for CPU
+        latency_rows = [dict(zip(features, map(float, row))) for row in X[:max(LATENCY_SAMPLES, BATCH_SIZE)]]
+        results = []
+        for params, score, path in zip(candidates, scores, paths):
+            latency = measure_latency(path, latency_rows)
+            results.append({
+                **params, **score, **latency,
+                "within_budget": latency["single_p99_ms"] <= budget,
+                "selected": False,
+            })
+
+        eligible = [i for i, result in enumerate(results) if result["within_budget"]]
+        if eligible:
+            best = max(eligible, key=lambda i: (results[i]["roc_auc"], results[i]["recall"]))
+        else:
+            best = min(range(len(results)), key=lambda i: results[i]["single_p99_ms"])
+            print(f"Ningún candidato cumple p99 <= {budget} ms; se usa el más rápido")
+        results[best]["selected"] = True
+
+        print(f"\n{'n_est':>6}{'depth':>6}  {'class_weight':<16}{'auc':>8}{'recall':>8}{'p99 ms':>9}{'batch ms':>10}")
+        for result in results:
+            mark = " *" if result["selected"] else ("" if result["within_budget"] else " (lento)")
+            print(
+                f"{result['n_estimators']:>6}{result['max_depth']:>6}  {repr(result['class_weight']):<16}"
+                f"{result['roc_auc']:>8.4f}{result['recall']:>8.4f}{result['single_p99_ms']:>9.3f}"
+                f"{result['batch_p99_ms']:>10.3f}{mark}"
+            )
+
+        results_path = search_results_path(model_path)
+        save_results(results, results_path)
+        print(f"\nResultados guardados en {results_path}")
+
+        # Install the selected model and its metrics
+        shutil.copyfile(paths[best], model_path + ".tmp")
+        os.replace(model_path + ".tmp", model_path)
+        print(f"Modelo guardado en {model_path}")
+
+        X_train, X_test, y_train, y_test = load_data(data_path)
+        model = joblib.load(model_path)
+        probs = model.predict_proba(X_test)[:, 1]
+        save_metrics(y_test, model.predict(X_test), probs, len(X_train), model_path)
+        return results
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
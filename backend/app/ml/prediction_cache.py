@@ -0,0 +1,94 @@
+"""
+Bounded LRU/TTL cache of fraud scores
+
+Keys are the raw bytes of the normalized float64 feature row, so identical
+transactions (retries, duplicate submissions) map to the same entry exactly
+and no collision handling is needed. Entries expire after a TTL and the
+least recently used one is evicted once the cache is full.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss/eviction counters"""
+
+    def __init__(self, max_items: int = 10000, ttl_seconds: float = 300.0):
+        """Initialize the cache
+
+        Args:
+            max_items: Maximum number of cached scores
+            ttl_seconds: Seconds a score stays valid (0 disables expiry)
+        """
+        self.max_items = max(1, max_items)
+        self.ttl = ttl_seconds
+
+        self._entries: "OrderedDict[bytes, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by clear(); scores computed before a clear are not stored
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: bytes) -> Optional[float]:
+        """Cached score for a feature row, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            score, expires_at = entry
+            if self.ttl and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, key: bytes, score: float, generation: Optional[int] = None) -> None:
+        """Store a score
+
+        Args:
+            key: Feature row bytes
+            score: Fraud probability for that row
+            generation: Value of `generation` read before scoring; the score
+                is dropped if the cache was cleared (model reloaded) since
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (score, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry, e.g. after the model was reloaded"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit/miss/eviction counters since startup"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "size": len(self._entries),
+                "max_items": self.max_items,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.generation,
+            }
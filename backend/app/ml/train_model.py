@@ -1,41 +1,56 @@
+import os
+import sys
+
+if __package__ in (None, ""):
+    # Ejecutado como script (python train_model.py): hace importable el paquete app
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import argparse
 import pandas as pd
-from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, roc_auc_score
+from sklearn.metrics import (
+    accuracy_score, classification_report, f1_score, precision_score, recall_score, roc_auc_score
+)
+from datetime import datetime
+import hashlib
 import joblib
-import os
+import json
+
+from app.ml.dataset import load_dataset, stratified_split
+from app.ml.model_info import metrics_path
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 DATA_PATH = os.path.join(BASE_DIR, "data", "creditcard.csv")
 MODEL_PATH = os.path.join(BASE_DIR, "model.joblib")
+# Read by FraudDetector for /model/info
+METRICS_PATH = os.path.join(BASE_DIR, "model.metrics.json")
+
+# Hiperparámetros del modelo en producción
+MODEL_PARAMS = {
+    "n_estimators": 500,
+    "max_depth": 5,
+    "min_samples_leaf": 50,
+    "min_samples_split": 20,
+    "class_weight": {0: 1, 1: 20},
+    "random_state": 42,
+}
+
+def load_data(data_path=DATA_PATH):
+    # float32 memory-mapped desde la caché .npy (se genera en la primera ejecución)
+    X, y, features = load_dataset(data_path)
+    train_idx, test_idx = stratified_split(y, test_size=0.2, random_state=42)
 
-def load_data():
-    df = pd.read_csv(DATA_PATH)
-
-    # Features del dataset
-    X = df.drop("Class", axis=1)
-    y = df["Class"]
-
-    return train_test_split(
-        X, y,
-        test_size=0.2,
-        random_state=42,
-        stratify=y
-    )
-
-def train_model():
-    X_train, X_test, y_train, y_test = load_data()
-
-    model = RandomForestClassifier(
-        n_estimators=500,     
-        max_depth=5,         
-        min_samples_leaf=50,
-        min_samples_split=20,
-        class_weight={0: 1, 1: 20},
-        n_jobs=-1,
-        random_state=42
-    )
+    # Solo se copian las filas de cada partición; los nombres de columna
+    # se conservan para que el modelo tenga feature_names_in_
+    X_train = pd.DataFrame(X[train_idx], columns=features, copy=False)
+    X_test = pd.DataFrame(X[test_idx], columns=features, copy=False)
+    return X_train, X_test, y[train_idx], y[test_idx]
+
+def train_model(data_path=DATA_PATH):
+    X_train, X_test, y_train, y_test = load_data(data_path)
+
+    model = RandomForestClassifier(**MODEL_PARAMS, n_jobs=-1)
 
     print("Entrenando modelo (modo DEMO)...")
     model.fit(X_train, y_train)
@@ -53,5 +68,39 @@ def train_model():
     joblib.dump(model, MODEL_PATH)
     print(f"\nModelo guardado en {MODEL_PATH}")
 
+    save_metrics(y_test, preds, probs, len(X_train))
+
+def save_metrics(y_test, preds, probs, n_train, model_path=MODEL_PATH):
+    """Guardar métricas de evaluación junto al modelo"""
+    with open(model_path, "rb") as f:
+        model_sha256 = hashlib.sha256(f.read()).hexdigest()
+
+    metrics = {
+        "accuracy": round(float(accuracy_score(y_test, preds)), 4),
+        "precision": round(float(precision_score(y_test, preds, zero_division=0)), 4),
+        "recall": round(float(recall_score(y_test, preds, zero_division=0)), 4),
+        "f1_score": round(float(f1_score(y_test, preds, zero_division=0)), 4),
+        "roc_auc": round(float(roc_auc_score(y_test, probs)), 4),
+        "threshold": 0.5,
+        "n_train": int(n_train),
+        "n_test": int(len(y_test)),
+        "trained_at": datetime.now().isoformat(),
+        "model_sha256": model_sha256,
+    }
+    with open(metrics_path(model_path), "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2)
+    print(f"Métricas guardadas en {metrics_path(model_path)}")
+
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Entrena el modelo de detección de fraude")
+    parser.add_argument("--data-path", default=DATA_PATH, help="CSV de entrenamiento con columna Class")
+    parser.add_argument("--search", action="store_true", help="Búsqueda de hiperparámetros con presupuesto de latencia")
+    parser.add_argument("--latency-budget-ms", type=float, default=None, help="p99 máximo de una predicción (modo --search)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para la búsqueda (modo --search)")
+    args = parser.parse_args()
+
+    if args.search:
+        from app.ml.model_search import search_model
+        search_model(args.data_path, args.latency_budget_ms, args.workers)
+    else:
+        train_model(args.data_path)
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Query
+from app.history import get_history_manager
+
+router = APIRouter()
+
+@router.get("/trends")
+def get_trends(
+    granularity: str = Query("hour", pattern="^(hour|day)$"),
+    limit: int = Query(24, ge=1, le=1000),
+):
+    """Get fraud trends per hour or per day, oldest first
+
+    Served from rollups that are updated as predictions are saved, so the
+    cost depends on the number of buckets, not on the size of the history.
+    """
+    return get_history_manager().get_trends(granularity, limit)
@@ -1,112 +1,230 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+import csv
 import re
 import uuid
 
-router = APIRouter()
+import numpy as np
+
+from app.chat_intents import IntentMatcher
+from app.chat_sessions import get_session_store
+from app.velocity import get_velocity_store
 
-# Memoria en RAM por sesión
-SESSIONS: Dict[str, Dict[str, Any]] = {}
+router = APIRouter()
 
 class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
 
-def compute_risk(tx: Dict[str, Any]) -> Dict[str, Any]:
-    """Calcula el riesgo basado en monto y número de intentos"""
-    amount = float(tx.get("amount", 0))
-    attempts_10min = int(tx.get("attempts_10min", 1))
-
-    score = 0
+# (decisión, recomendación) por nivel: alto, medio, bajo
+RISK_DECISIONS = (
+    ("BLOQUEAR", "Riesgo alto detectado. Se recomienda bloquear la transacción y escalar a revisión."),
+    ("REVISAR", "Riesgo medio. Se requiere verificación adicional (OTP, 2FA) antes de aprobar."),
+    ("APROBAR", "Riesgo bajo. La transacción puede procesarse normalmente."),
+)
 
-    # Reglas de riesgo por monto
-    if amount >= 2000:
-        score += 50
-    elif amount >= 800:
-        score += 30
-    elif amount >= 300:
-        score += 15
+# Máximo de transacciones analizadas por mensaje
+MAX_BATCH_TX = 500
 
-    # Reglas de riesgo por intentos
-    if attempts_10min >= 6:
-        score += 50
-    elif attempts_10min >= 3:
-        score += 25
+def compute_risk_batch(txs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Calcula el riesgo de varias transacciones con operaciones vectorizadas"""
+    amount = np.array([float(tx.get("amount", 0)) for tx in txs], dtype=np.float64)
+    attempts_10min = np.array([int(tx.get("attempts_10min", 1)) for tx in txs], dtype=np.int64)
 
-    score = min(score, 100)
+    # Reglas de riesgo por monto y por intentos
+    score = (
+        np.select([amount >= 2000, amount >= 800, amount >= 300], [50, 30, 15], 0)
+        + np.select([attempts_10min >= 6, attempts_10min >= 3], [50, 25], 0)
+    )
+    score = np.minimum(score, 100)
 
     # Decisión basada en el score
-    if score >= 70:
-        decision = "BLOQUEAR"
-        advice = "Riesgo alto detectado. Se recomienda bloquear la transacción y escalar a revisión."
-    elif score >= 40:
-        decision = "REVISAR"
-        advice = "Riesgo medio. Se requiere verificación adicional (OTP, 2FA) antes de aprobar."
-    else:
-        decision = "APROBAR"
-        advice = "Riesgo bajo. La transacción puede procesarse normalmente."
-
-    return {"risk_score": score, "decision": decision, "advice": advice}
+    level = np.select([score >= 70, score >= 40], [0, 1], 2)
 
-def try_extract_tx_from_text(text: str) -> Optional[Dict[str, Any]]:
-    """
-    Extrae datos de transacción del texto.
-    Formato esperado: tx amount=3500 attempts=7
-    """
-    if not text.lower().startswith("tx"):
-        return None
+    return [
+        {"risk_score": s, "decision": RISK_DECISIONS[l][0], "advice": RISK_DECISIONS[l][1]}
+        for s, l in zip(score.tolist(), level.tolist())
+    ]
 
+def compute_risk(tx: Dict[str, Any]) -> Dict[str, Any]:
+    """Calcula el riesgo basado en monto y número de intentos"""
+    return compute_risk_batch([tx])[0]
+
+# Saludos
+GREETINGS = {
+    "hola": "Bienvenido al sistema de detección de fraude FraudShield AI. ¿En qué puedo asistirle?",
+    "buenos días": "Buenos días. ¿Necesita evaluar alguna transacción?",
+    "buenas tardes": "Buenas tardes. Estoy disponible para analizar transacciones sospechosas.",
+    "buenas noches": "Buenas noches. ¿Cómo puedo ayudarle?",
+    "hi": "Welcome to FraudShield AI. How can I assist you?",
+    "hello": "Hello. Ready to analyze transactions for potential fraud.",
+}
+
+# Intenciones en orden de prioridad; todas las palabras clave se buscan en
+# una sola pasada con una expresión regular compilada al importar
+INTENTS = (
+    IntentMatcher()
+    .add_prefix("greeting", GREETINGS, max_extra_chars=5)
+    .add_keywords("how_it_works", ["funciona", "trabajo", "funcionamiento"], ["qué", "que", "cómo", "como"])
+    .add_keywords("info", ["información", "informacion", "info", "detalles"])
+    .add_keywords("small_talk", ["como estás", "cómo estás", "qué tal"])
+    .add_keywords("thanks", ["gracias", "thanks"])
+    .add_keywords("goodbye", ["adiós", "adios", "bye", "hasta luego"])
+    .add_exact("help", ["help", "ayuda", "menu", "menú"])
+    .add_exact("reset", ["reset"])
+    .add_exact("status", ["estado"])
+    .add_prefix("transaction", ["tx"])
+    .add_keywords("fraud", ["fraude", "fraud", "sospechosa", "riesgo", "seguridad"])
+    .compile()
+)
+
+TX_PAIR_RE = re.compile(r"(\w+)\s*=\s*([^\s]+)")
+TX_LINE_SPLIT_RE = re.compile(r"\n\s*(?=tx)", re.IGNORECASE)
+
+TX_AMOUNT_KEYS = {"amount", "monto"}
+TX_ATTEMPTS_KEYS = {"attempts", "attempts_10min", "intentos"}
+TX_USER_KEYS = {"user", "user_id", "usuario"}
+
+def _parse_tx_fields(fields, defaults: bool = True) -> Dict[str, Any]:
+    """Convierte pares (clave, valor) en una transacción, con o sin valores por defecto"""
     tx = {}
-    pairs = re.findall(r"(\w+)\s*=\s*([^\s]+)", text)
-    
-    for k, v in pairs:
-        k = k.lower()
-        v_raw = v.strip()
+    for k, v in fields:
+        k = k.strip().lower()
+        v_raw = (v or "").strip()
 
-        if k in {"amount", "monto"}:
+        if k in TX_AMOUNT_KEYS:
             try:
                 tx["amount"] = float(v_raw)
             except ValueError:
                 continue
-        elif k in {"attempts", "attempts_10min", "intentos"}:
+        elif k in TX_ATTEMPTS_KEYS:
             try:
                 tx["attempts_10min"] = int(v_raw)
             except ValueError:
                 continue
+        elif k in TX_USER_KEYS and v_raw:
+            tx["user_id"] = v_raw
+
+    # Sin intentos explícitos, se usan los del usuario en los últimos 10 minutos
+    if "attempts_10min" not in tx and "user_id" in tx:
+        tx["attempts_10min"] = get_velocity_store().features(tx["user_id"])["count_10m"] + 1
 
     # Valores por defecto
-    tx.setdefault("amount", 0.0)
+    if defaults:
+        tx.setdefault("amount", 0.0)
     tx.setdefault("attempts_10min", 1)
-    
+
     return tx
 
+def try_extract_tx_from_text(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Extrae datos de transacción del texto.
+    Formato esperado: tx amount=3500 attempts=7
+    """
+    if not text.lower().startswith("tx"):
+        return None
+
+    return _parse_tx_fields(TX_PAIR_RE.findall(text))
+
+def try_extract_txs_from_text(text: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Extrae un bloque de transacciones, una por línea.
+    Formato esperado:
+        tx amount=3500 attempts=7
+        tx amount=120 attempts=1
+    """
+    if not text.lower().startswith("tx"):
+        return None
+
+    # Cada línea que empieza con "tx" abre una transacción; las demás la continúan
+    return [_parse_tx_fields(TX_PAIR_RE.findall(chunk)) for chunk in TX_LINE_SPLIT_RE.split(text)]
+
+def try_extract_csv_from_text(text: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Extrae transacciones de un CSV pegado con encabezado.
+    Formato esperado:
+        amount,attempts
+        3500,7
+        120,1
+    Se aceptan las mismas columnas que en `tx` y separadores , ; o tabulador.
+    Las filas sin un monto válido se ignoran.
+    """
+    lines = [line for line in text.strip().splitlines() if line.strip()]
+    if len(lines) < 2:
+        return None
+
+    header = lines[0]
+    delimiter = max(",;\t", key=header.count)
+    columns = [column.strip().lower() for column in header.split(delimiter)]
+    if not TX_AMOUNT_KEYS.intersection(columns):
+        return None
+
+    txs = [_parse_tx_fields(zip(columns, row), defaults=False) for row in csv.reader(lines[1:], delimiter=delimiter)]
+    return [tx for tx in txs if "amount" in tx]
+
+def format_batch_reply(txs: List[Dict[str, Any]], results: List[Dict[str, Any]], summary: Dict[str, Any]) -> str:
+    """Tabla resumen del análisis de un bloque de transacciones"""
+    rows = [
+        f"| {i} | {tx['amount']:.2f} | {tx['attempts_10min']} | {result['risk_score']} | {result['decision']} |"
+        for i, (tx, result) in enumerate(zip(txs, results), start=1)
+    ]
+    reply = (
+        f"**ANÁLISIS DE {summary['total']} TRANSACCIONES**\n\n"
+        "| # | Monto | Intentos | Score | Decisión |\n"
+        "|---|---|---|---|---|\n"
+        + "\n".join(rows)
+        + "\n\n"
+        f"BLOQUEAR: {summary['BLOQUEAR']} · REVISAR: {summary['REVISAR']} · APROBAR: {summary['APROBAR']}"
+    )
+    if summary["omitted"]:
+        reply += f"\n\nSe analizaron las primeras {MAX_BATCH_TX}; se omitieron {summary['omitted']}."
+    return reply
+
+def analyze_batch(session_id: str, txs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Respuesta del chat para un bloque de transacciones"""
+    omitted = max(0, len(txs) - MAX_BATCH_TX)
+    txs = txs[:MAX_BATCH_TX]
+    results = compute_risk_batch(txs)
+
+    summary = {"total": len(txs), "omitted": omitted}
+    for decision, _ in RISK_DECISIONS:
+        summary[decision] = 0
+    for result in results:
+        summary[result["decision"]] += 1
+
+    return {
+        "session_id": session_id,
+        "txs": txs,
+        "results": results,
+        "summary": summary,
+        "reply": format_batch_reply(txs, results, summary),
+    }
+
 @router.post("/chat")
 def chat(req: ChatRequest):
     session_id = req.session_id or str(uuid.uuid4())
-    state = SESSIONS.setdefault(session_id, {"history": []})
+    sessions = get_session_store()
 
     msg = req.message.strip()
-    state["history"].append({"user": msg})
+    sessions.append(session_id, {"user": msg})
 
     lower = msg.lower()
 
-    # Saludos
-    greetings = {
-        "hola": "Bienvenido al sistema de detección de fraude FraudShield AI. ¿En qué puedo asistirle?",
-        "buenos días": "Buenos días. ¿Necesita evaluar alguna transacción?",
-        "buenas tardes": "Buenas tardes. Estoy disponible para analizar transacciones sospechosas.",
-        "buenas noches": "Buenas noches. ¿Cómo puedo ayudarle?",
-        "hi": "Welcome to FraudShield AI. How can I assist you?",
-        "hello": "Hello. Ready to analyze transactions for potential fraud.",
-    }
+    # CSV pegado (encabezado con columna amount/monto)
+    if "\n" in msg:
+        txs = try_extract_csv_from_text(msg)
+        if txs:
+            return analyze_batch(session_id, txs)
 
-    for greeting, response in greetings.items():
-        if lower == greeting or (lower.startswith(greeting) and len(lower) <= len(greeting) + 5):
-            return {"session_id": session_id, "reply": response}
+    intent, phrase = INTENTS.match(lower)
+
+    # Saludos
+    if intent == "greeting":
+        return {"session_id": session_id, "reply": GREETINGS[phrase]}
 
     # Preguntas sobre funcionamiento
-    if any(word in lower for word in ["funciona", "trabajo", "funcionamiento"]) and any(word in lower for word in ["qué", "que", "cómo", "como"]):
+    if intent == "how_it_works":
         reply = (
             "**SISTEMA DE DETECCIÓN DE FRAUDE**\n\n"
             "El sistema analiza transacciones evaluando dos factores principales:\n\n"
@@ -122,7 +240,7 @@ def chat(req: ChatRequest):
         return {"session_id": session_id, "reply": reply}
 
     # Información del sistema
-    if any(word in lower for word in ["información", "informacion", "info", "detalles"]):
+    if intent == "info":
         reply = (
             "**FRAUDSHIELD AI - SISTEMA DE DETECCIÓN**\n\n"
             "**Capacidades:**\n"
@@ -138,24 +256,28 @@ def chat(req: ChatRequest):
         return {"session_id": session_id, "reply": reply}
 
     # Respuestas generales
-    if any(word in lower for word in ["como estás", "cómo estás", "qué tal"]):
+    if intent == "small_talk":
         return {"session_id": session_id, "reply": "Sistema operativo. Disponible para analizar transacciones."}
 
-    if any(word in lower for word in ["gracias", "thanks"]):
+    if intent == "thanks":
         return {"session_id": session_id, "reply": "A su servicio. ¿Necesita analizar otra transacción?"}
 
-    if any(word in lower for word in ["adiós", "adios", "bye", "hasta luego"]):
+    if intent == "goodbye":
         return {"session_id": session_id, "reply": "Sesión finalizada. Que tenga un buen día."}
 
     # Menú de ayuda
-    if lower in {"help", "ayuda", "menu", "menú"}:
+    if intent == "help":
         reply = (
             "**COMANDOS DISPONIBLES**\n\n"
             "**Analizar transacción:**\n"
             "`tx amount=1500 attempts=3`\n\n"
             "Parámetros:\n"
             "• amount: Monto de la transacción\n"
-            "• attempts: Intentos en los últimos 10 minutos\n\n"
+            "• attempts: Intentos en los últimos 10 minutos\n"
+            "• user: Usuario; sin attempts se usan sus intentos recientes\n\n"
+            "**Analizar varias transacciones:**\n"
+            "Una línea `tx amount=... attempts=...` por transacción,\n"
+            "o un CSV pegado con encabezado `amount,attempts`\n\n"
             "**Otros comandos:**\n"
             "• `estado` - Ver historial de sesión\n"
             "• `reset` - Reiniciar sesión"
@@ -163,18 +285,21 @@ def chat(req: ChatRequest):
         return {"session_id": session_id, "reply": reply}
 
     # Reset de sesión
-    if lower == "reset":
-        SESSIONS[session_id] = {"history": []}
+    if intent == "reset":
+        sessions.reset(session_id)
         return {"session_id": session_id, "reply": "Sesión reiniciada correctamente."}
 
     # Ver estado
-    if lower == "estado":
-        history_str = "\n".join([f"- {h.get('user', '')}" for h in state["history"][-5:]])
+    if intent == "status":
+        history_str = "\n".join([f"- {h.get('user', '')}" for h in sessions.recent(session_id, 5)])
         return {"session_id": session_id, "reply": f"**Últimos 5 mensajes:**\n{history_str}"}
 
     # Analizar transacción
-    tx = try_extract_tx_from_text(msg)
-    if tx:
+    txs = try_extract_txs_from_text(msg) if intent == "transaction" else None
+    if txs and len(txs) > 1:
+        return analyze_batch(session_id, txs)
+    if txs:
+        tx = txs[0]
         result = compute_risk(tx)
         reply = (
             f"**ANÁLISIS DE TRANSACCIÓN**\n\n"
@@ -185,7 +310,7 @@ def chat(req: ChatRequest):
         return {"session_id": session_id, "tx": tx, "result": result, "reply": reply}
 
     # Consultas sobre fraude
-    if any(word in lower for word in ["fraude", "fraud", "sospechosa", "riesgo", "seguridad"]):
+    if intent == "fraud":
         reply = (
             "Para evaluar el riesgo de fraude, proporcione los datos en este formato:\n\n"
             "`tx amount=950 attempts=3`\n\n"
@@ -200,4 +325,9 @@ def chat(req: ChatRequest):
         "`tx amount=1500 attempts=3`\n\n"
         "Escriba 'help' para ver todos los comandos."
     )
-    return {"session_id": session_id, "reply": reply}
\ No newline at end of file
+    return {"session_id": session_id, "reply": reply}
+
+@router.get("/chat/sessions/stats")
+def get_session_stats():
+    """Get chatbot session store metrics (sessions kept, expired, evicted)"""
+    return get_session_store().stats()
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from app.ml.fraud_detector import get_fraud_detector
+
+router = APIRouter()
+
+@router.get("/info")
+def get_model_info():
+    """Get model parameters, features, importances, training metrics and file hash
+
+    Computed once when the model is loaded and served from memory. A changed
+    model file is picked up by the scoring path (MODEL_RELOAD_CHECK_SECONDS)
+    or by POST /model/reload.
+    """
+    return get_fraud_detector().get_info()
+
+@router.post("/reload")
+def reload_model():
+    """Reload the model now if its file changed on disk"""
+    detector = get_fraud_detector()
+    reloaded = detector.reload_if_changed()
+    return {"reloaded": reloaded, "file": detector.get_info()["file"]}
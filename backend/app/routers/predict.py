@@ -1,16 +1,43 @@
-from fastapi import APIRouter
-from app.schemas import PredictionRequest, PredictionResponse, FullTransactionFeatures
-from app.ml.fraud_detector import FraudDetector
-from app.history import get_history_manager
-import pandas as pd
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app.schemas import PredictionRequest, FullTransactionFeatures, BatchPredictionRequest
+from app.ml.fraud_detector import get_fraud_detector
+from app.ml.batcher import PredictionBatcher
+from app.history import get_history_manager, flush_history_stats, InvalidCursorError
+from app.history_writer import get_history_writer, flush_history_writes, stop_history_writer
+from app.metrics import HISTORY_WRITE_ERRORS
 from datetime import datetime
-from typing import Optional
+from typing import Iterable, Iterator, Optional
+import csv
+import io
 import uuid
 import json
-from pathlib import Path
+import logging
+import os
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
-model = FraudDetector()
+model = get_fraud_detector()
+
+# Columns of the CSV history export; nested fields such as factors are left out
+EXPORT_CSV_COLUMNS = [
+    "transaction_id", "timestamp", "is_fraud", "fraud_probability", "risk_score",
+    "risk_level", "confidence", "amount", "merchant", "location", "card_type",
+    "saved_at", "sequence_number",
+]
+# Rows encoded per chunk handed to the streaming response
+EXPORT_ROWS_PER_CHUNK = 500
+
+# Opt-in micro-batching of concurrent /predict calls (PREDICT_BATCHING=true)
+batcher: Optional[PredictionBatcher] = None
+if os.getenv("PREDICT_BATCHING", "false").lower() in ("1", "true", "yes"):
+    batcher = PredictionBatcher(
+        model,
+        window_ms=float(os.getenv("PREDICT_BATCH_WINDOW_MS", "2")),
+        max_batch_size=int(os.getenv("PREDICT_BATCH_MAX_SIZE", "256")),
+    )
 
 # No need for separate transactions file - use history manager only
 
@@ -35,45 +62,93 @@ def get_risk_level(score: float) -> str:
     else:
         return "CRITICAL"
 
+def build_prediction(data: PredictionRequest, score: float) -> dict:
+    """Build the prediction response for a scored /predict request"""
+    fraud = score >= 0.05
+    risk_level = get_risk_level(score)
+
+    transaction_id = str(uuid.uuid4())
+    timestamp = datetime.now().isoformat()
+
+    return {
+        "transaction_id": transaction_id,
+        "id": transaction_id,
+        "is_fraud": fraud,
+        "fraud_probability": float(score),
+        "risk_score": int(score * 100),
+        "risk_level": risk_level,
+        "confidence": max(score, 1 - score),
+        "factors": [
+            {"feature": "Amount", "impact": "High", "value": data.amount},
+            {"feature": "Time", "impact": "Medium", "value": data.time},
+        ],
+        "timestamp": timestamp,
+        "amount": data.amount,
+        "merchant": "Online",
+        "location": "N/A",
+        "card_type": "Unknown"
+    }
+
+def save_prediction(prediction: dict) -> None:
+    """Save a prediction to history without failing the request
+
+    With HISTORY_WRITE_BEHIND enabled the prediction is only queued here and
+    written by the background history writer.
+    """
+    try:
+        writer = get_history_writer()
+        if writer is not None:
+            writer.submit(prediction)
+        else:
+            get_history_mgr().add_prediction(prediction)
+    except Exception as e:
+        HISTORY_WRITE_ERRORS.inc()
+        logger.warning("Could not save prediction to history: %s", e)
+
+def save_predictions(predictions: list) -> None:
+    """Save several predictions to history without failing the request"""
+    try:
+        writer = get_history_writer()
+        if writer is not None:
+            writer.submit_many(predictions)
+        else:
+            get_history_mgr().add_predictions(predictions)
+    except Exception as e:
+        HISTORY_WRITE_ERRORS.inc(len(predictions))
+        logger.warning("Could not save batch predictions to history: %s", e)
+
 @router.post("/")
-def predict_fraud(data: PredictionRequest):
+async def predict_fraud(data: PredictionRequest):
     """Predict fraud probability for a transaction"""
     try:
-        score = model.predict(data.dict())
-        fraud = score >= 0.05
-        risk_level = get_risk_level(score)
-        
-        transaction_id = str(uuid.uuid4())
-        timestamp = datetime.now().isoformat()
-        
-        prediction = {
-            "transaction_id": transaction_id,
-            "id": transaction_id,
-            "is_fraud": fraud,
-            "fraud_probability": float(score),
-            "risk_score": int(score * 100),
-            "risk_level": risk_level,
-            "confidence": max(score, 1 - score),
-            "factors": [
-                {"feature": "Amount", "impact": "High", "value": data.amount},
-                {"feature": "Time", "impact": "Medium", "value": data.time},
-            ],
-            "timestamp": timestamp,
-            "amount": data.amount,
-            "merchant": "Online",
-            "location": "N/A",
-            "card_type": "Unknown"
-        }
+        features = data.dict()
+        if batcher is not None:
+            score = await batcher.predict(features)
+        else:
+            score = await run_in_threadpool(model.predict, features)
+        prediction = build_prediction(data, score)
         
-        # Save to history manager (which saves to history.json)
-        try:
-            get_history_mgr().add_prediction(prediction)
-        except Exception as e:
-            print(f"Warning: Could not save prediction to history: {e}")
+        # Save to history manager (queued when write-behind is enabled)
+        await run_in_threadpool(save_prediction, prediction)
         
         return prediction
-    except Exception as e:
-        print(f"Error in predict_fraud: {e}")
+    except Exception:
+        logger.exception("Error in predict_fraud")
+        raise
+
+@router.post("/batch")
+def predict_fraud_batch(data: BatchPredictionRequest):
+    """Predict fraud probability for many transactions in one model call"""
+    try:
+        scores = model.predict_batch([tx.dict() for tx in data.transactions])
+        predictions = [build_prediction(tx, score) for tx, score in zip(data.transactions, scores)]
+
+        # One bulk write for the whole batch
+        save_predictions(predictions)
+
+        return {"predictions": predictions, "count": len(predictions)}
+    except Exception:
+        logger.exception("Error in predict_fraud_batch")
         raise
 
 @router.post("/full")
@@ -84,6 +159,7 @@ def predict_full(data: FullTransactionFeatures):
         score = model.predict(features)
         fraud = score > 0.005
         risk_level = get_risk_level(score)
+        transaction_id = str(uuid.uuid4())
         
         prediction = {
             "transaction_id": transaction_id,
@@ -99,25 +175,62 @@ def predict_full(data: FullTransactionFeatures):
         }
         
         # Save to history
-        try:
-            get_history_mgr().add_prediction(prediction)
-        except Exception as e:
-            # Log error but don't fail the prediction
-            print(f"Warning: Could not save prediction to history: {e}")
+        save_prediction(prediction)
         
         return prediction
-    except Exception as e:
-        print(f"Error in predict_full: {e}")
+    except Exception:
+        logger.exception("Error in predict_full")
         raise
 
+@router.get("/batching/stats")
+def get_batching_stats():
+    """Get a micro-batching summary (batch sizes, queue wait) derived from the /metrics series"""
+    if batcher is None:
+        return {"enabled": False}
+    return batcher.stats()
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """Get prediction cache metrics (size, hits, misses, evictions)"""
+    if model.cache is None:
+        return {"enabled": False}
+    return model.cache.stats()
+
+async def shutdown() -> None:
+    """Stop background work started by this router"""
+    if batcher is not None:
+        await batcher.stop()
+    # Drain queued history writes after the last predictions were scored
+    await run_in_threadpool(stop_history_writer)
+    # Then save the aggregates whose periodic save is still pending
+    await run_in_threadpool(flush_history_stats)
+
 @router.get("/history")
-def get_history(page: int = 1, items_per_page: int = 20, risk_level: Optional[str] = None, is_fraud: Optional[bool] = None):
-    """Get prediction history with pagination and optional filters"""
+def get_history(
+    page: int = 1,
+    items_per_page: int = 20,
+    risk_level: Optional[str] = None,
+    is_fraud: Optional[bool] = None,
+    pagination: str = Query("offset", pattern="^(offset|cursor)$"),
+    cursor: Optional[str] = None,
+):
+    """Get prediction history with pagination and optional filters
+
+    Offset pagination (page/items_per_page) is the default. Pass
+    pagination=cursor for the newest page, then follow next_cursor or
+    prev_cursor for stable keyset pages.
+    """
     filters = {}
     if risk_level:
         filters["risk_level"] = risk_level
     if is_fraud is not None:
         filters["is_fraud"] = is_fraud
+
+    if pagination == "cursor" or cursor:
+        try:
+            return get_history_mgr().get_predictions_by_cursor(cursor, items_per_page, filters if filters else None)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     
     return get_history_mgr().get_predictions_paginated(page, items_per_page, filters if filters else None)
 
@@ -126,6 +239,73 @@ def get_history_all():
     """Get all predictions in history"""
     return {"predictions": get_history_mgr().get_all_predictions()}
 
+def ndjson_chunks(predictions: Iterable[dict]) -> Iterator[str]:
+    """Encode predictions as NDJSON, a few hundred lines per chunk"""
+    lines = []
+    for prediction in predictions:
+        lines.append(json.dumps(prediction, ensure_ascii=False))
+        if len(lines) >= EXPORT_ROWS_PER_CHUNK:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+def csv_chunks(predictions: Iterable[dict]) -> Iterator[str]:
+    """Encode predictions as CSV rows in EXPORT_CSV_COLUMNS, header first"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    rows = 0
+    for prediction in predictions:
+        writer.writerow({
+            **prediction,
+            "transaction_id": prediction.get("transaction_id") or prediction.get("id"),
+        })
+        rows += 1
+        if rows >= EXPORT_ROWS_PER_CHUNK:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@router.get("/history/export")
+def export_history(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    risk_level: Optional[str] = None,
+    is_fraud: Optional[bool] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+):
+    """Stream the prediction history as NDJSON or CSV, newest first
+
+    Takes the same filters as /history (plus a timestamp range) and reads
+    the history in chunks, so memory use does not grow with its size.
+    """
+    filters = {}
+    if risk_level:
+        filters["risk_level"] = risk_level
+    if is_fraud is not None:
+        filters["is_fraud"] = is_fraud
+    if date_from:
+        filters["date_from"] = date_from
+    if date_to:
+        filters["date_to"] = date_to
+
+    predictions = get_history_mgr().iter_predictions(filters if filters else None)
+    if format == "csv":
+        return StreamingResponse(
+            csv_chunks(predictions),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="history.csv"'},
+        )
+    return StreamingResponse(
+        ndjson_chunks(predictions),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="history.ndjson"'},
+    )
+
 @router.get("/history/stats")
 def get_history_stats():
     """Get statistics about prediction history"""
@@ -134,5 +314,7 @@ def get_history_stats():
 @router.delete("/history")
 def clear_history():
     """Clear all prediction history"""
+    # Queued predictions were made before the clear, so they go too
+    flush_history_writes()
     get_history_mgr().clear_history()
     return {"message": "History cleared successfully"}
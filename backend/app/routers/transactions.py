@@ -1,53 +1,33 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 from app.schemas import TransactionCreate
+from app.history import get_history_manager, InvalidCursorError
+from app.history_writer import flush_history_writes
+from app.routers.chatbot import compute_risk
+from app.velocity import get_velocity_store
 from datetime import datetime, timedelta
-import random
-import json
-import os
-from pathlib import Path
 
 router = APIRouter()
 
-# Path to JSON file for persistence
-DATA_DIR = Path(__file__).parent.parent.parent / "data"
-HISTORY_FILE = DATA_DIR / "history.json"
-
 def load_transactions():
-    """Load transactions from history.json file"""
-    if HISTORY_FILE.exists():
-        try:
-            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # Extract predictions array from history.json structure
-                return data.get("predictions", [])
-        except Exception as e:
-            print(f"Error loading transactions: {e}")
-            return []
-    return []
-
-def save_transactions(transactions):
-    """Save transactions to history.json file"""
-    try:
-        DATA_DIR.mkdir(exist_ok=True)
-        # Maintain history.json structure with predictions array
-        data = {"predictions": transactions}
-        with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        print(f"Error saving transactions: {e}")
+    """Load stored transactions newest first, the order of the cursor pages and /predict/history"""
+    return get_history_manager().get_all_predictions()
 
 @router.post("/")
 def create_transaction(t: TransactionCreate):
     """Create a new transaction"""
-    transactions = load_transactions()
+    manager = get_history_manager()
+    now = datetime.now()
+    velocity = get_velocity_store().record(t.user_id, t.amount, now.timestamp())
+    risk = compute_risk({"amount": t.amount, "attempts_10min": velocity["count_10m"]})
     transaction = {
         **t.dict(),
-        "id": f"txn_{len(transactions) + 1:06d}",
-        "timestamp": datetime.now().isoformat(),
-        "risk_score": random.randint(0, 100),
+        "id": f"txn_{manager.get_statistics()['total_predictions'] + 1:06d}",
+        "timestamp": now.isoformat(),
+        "risk_score": risk["risk_score"],
+        "decision": risk["decision"],
+        "velocity": velocity,
     }
-    transactions.append(transaction)
-    save_transactions(transactions)
+    manager.add_prediction(transaction)
     return {"msg": "Transaction received", "transaction": transaction}
 
 @router.get("/")
@@ -56,9 +36,36 @@ def get_transactions(
     limit: int = Query(20, ge=1, le=1000),
     risk_level: str = Query(None, alias="risk_level"),
     is_fraud: bool = Query(None, alias="is_fraud"),
+    pagination: str = Query("offset", pattern="^(offset|cursor)$"),
+    cursor: str = Query(None),
 ):
-    """Get transactions with pagination and filters"""
-    # Load fresh data from file
+    """Get transactions with pagination and filters, newest first
+
+    pagination=cursor (or a cursor from a previous page) switches to keyset
+    pagination over the sorted history index; both modes list in the same order.
+    """
+    if pagination == "cursor" or cursor:
+        def matches(t):
+            if risk_level and get_risk_level(t.get("risk_score", 0)) != risk_level.upper():
+                return False
+            return is_fraud is None or t.get("is_fraud", False) == is_fraud
+
+        try:
+            page_data = get_history_manager().get_predictions_by_cursor(
+                cursor, limit, predicate=matches if (risk_level or is_fraud is not None) else None
+            )
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return {
+            "transactions": page_data["data"],
+            "limit": limit,
+            "next_cursor": page_data["next_cursor"],
+            "prev_cursor": page_data["prev_cursor"],
+            "has_next": page_data["has_next"],
+            "has_previous": page_data["has_previous"],
+        }
+
     transactions = load_transactions()
     
     # Filter transactions
@@ -81,14 +88,23 @@ def get_transactions(
         "totalPages": max(1, (len(filtered) + limit - 1) // limit),
     }
 
+@router.get("/velocity/stats")
+def get_velocity_stats():
+    """Get velocity store metrics (users tracked, expired, evicted)"""
+    return get_velocity_store().stats()
+
+@router.get("/velocity/{user_id}")
+def get_user_velocity(user_id: str):
+    """Get a user's transaction count and amount over the last 10 minutes, 1 hour and 24 hours"""
+    return {"user_id": user_id, **get_velocity_store().features(user_id)}
+
 @router.get("/{transaction_id}")
 def get_transaction(transaction_id: str):
     """Get a specific transaction by ID"""
-    transactions = load_transactions()
-    for t in transactions:
-        if t.get("id") == transaction_id or t.get("transaction_id") == transaction_id:
-            return t
-    return {"error": "Transaction not found"}
+    transaction = get_history_manager().get_prediction(transaction_id)
+    if transaction is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return transaction
 
 def get_risk_level(score: int) -> str:
     """Determine risk level based on score"""
@@ -104,5 +120,7 @@ def get_risk_level(score: int) -> str:
 @router.delete("/")
 def clear_transactions():
     """Clear all transactions"""
-    save_transactions([])
+    flush_history_writes()
+    get_history_manager().clear_history()
+    get_velocity_store().clear()
     return {"msg": "All transactions cleared", "count": 0}
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List
 
 class TransactionCreate(BaseModel):
     user_id: str
@@ -38,6 +39,9 @@ class PredictionRequest(BaseModel):
     v27: float = 0.0
     v28: float = 0.0
 
+class BatchPredictionRequest(BaseModel):
+    transactions: List[PredictionRequest] = Field(..., min_length=1, max_length=10000)
+
 class PredictionResponse(BaseModel):
     transaction_id: str
     amount: float
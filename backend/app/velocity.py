@@ -0,0 +1,183 @@
+"""
+Per-user velocity features
+
+Counts and amount sums of each user's transactions over the last 10 minutes,
+1 hour and 24 hours. Each window is a ring of time buckets (10 x 1 min,
+12 x 5 min, 24 x 1 h) with running totals, so recording an event or reading
+the features is O(1) and a user costs the same memory however many
+transactions they make. Windows slide one bucket at a time. Users idle for
+longer than the largest window are dropped, and at most `max_users` are
+kept, least recently active evicted first. State is in memory, per worker.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# (name, span in seconds, buckets)
+WINDOWS = (
+    ("10m", 600, 10),
+    ("1h", 3600, 12),
+    ("24h", 86400, 24),
+)
+
+
+class RingCounter:
+    """Event count and amount sum over a sliding window of time buckets"""
+
+    __slots__ = ("width", "counts", "amounts", "last", "count", "amount")
+
+    def __init__(self, span: float, buckets: int):
+        self.width = span / buckets
+        self.counts = [0] * buckets
+        self.amounts = [0.0] * buckets
+        self.last: Optional[int] = None  # newest bucket number seen
+        self.count = 0
+        self.amount = 0.0
+
+    def _advance(self, bucket: int) -> None:
+        """Slide the window forward to `bucket`, clearing the buckets left behind"""
+        if self.last is None or bucket - self.last >= len(self.counts):
+            for i in range(len(self.counts)):
+                self.counts[i] = 0
+                self.amounts[i] = 0.0
+            self.count, self.amount = 0, 0.0
+        else:
+            for b in range(self.last + 1, bucket + 1):
+                i = b % len(self.counts)
+                self.count -= self.counts[i]
+                self.amount -= self.amounts[i]
+                self.counts[i] = 0
+                self.amounts[i] = 0.0
+            if not self.count:
+                # Do not let float error accumulate in an empty window
+                self.amount = 0.0
+        self.last = bucket
+
+    def add(self, timestamp: float, amount: float) -> None:
+        bucket = int(timestamp // self.width)
+        if self.last is None or bucket > self.last:
+            self._advance(bucket)
+        elif bucket <= self.last - len(self.counts):
+            return  # older than the window
+        i = bucket % len(self.counts)
+        self.counts[i] += 1
+        self.amounts[i] += amount
+        self.count += 1
+        self.amount += amount
+
+    def totals(self, timestamp: float):
+        """(count, amount) in the window ending at `timestamp`"""
+        bucket = int(timestamp // self.width)
+        if self.last is not None and bucket > self.last:
+            self._advance(bucket)
+        return self.count, self.amount
+
+
+class VelocityStore:
+    """Bounded in-memory per-user velocity counters"""
+
+    def __init__(self, max_users: int = 100000, idle_ttl_seconds: Optional[float] = None):
+        """Initialize velocity store
+
+        Args:
+            max_users: Maximum number of users tracked
+            idle_ttl_seconds: Idle time after which a user is dropped
+                (defaults to the largest window, after which all counters are zero)
+        """
+        self.max_users = max(1, max_users)
+        self.ttl = idle_ttl_seconds if idle_ttl_seconds is not None else max(span for _, span, _ in WINDOWS)
+
+        # user_id -> [last event time, counters per window], least recently active first
+        self._users: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def _evict(self, now: float) -> None:
+        """Drop idle users and the least recently active beyond the limit (lock held)"""
+        cutoff = now - self.ttl
+        while self._users:
+            user_id, (last_seen, _) = next(iter(self._users.items()))
+            if last_seen < cutoff:
+                self.expired += 1
+            elif len(self._users) > self.max_users:
+                self.evicted += 1
+            else:
+                break
+            del self._users[user_id]
+
+    @staticmethod
+    def _features(counters: List[RingCounter], now: float) -> Dict[str, Any]:
+        features = {}
+        for (name, _, _), counter in zip(WINDOWS, counters):
+            count, amount = counter.totals(now)
+            features[f"count_{name}"] = count
+            features[f"amount_{name}"] = round(amount, 2)
+        return features
+
+    def record(self, user_id: str, amount: float, timestamp: Optional[float] = None) -> Dict[str, Any]:
+        """Count a transaction and return the user's features including it
+
+        Args:
+            user_id: User the transaction belongs to
+            amount: Transaction amount
+            timestamp: Event time in epoch seconds (defaults to now)
+
+        Returns:
+            count_<window> and amount_<window> for every window
+        """
+        now = time.time() if timestamp is None else timestamp
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                entry = [now, [RingCounter(span, buckets) for _, span, buckets in WINDOWS]]
+                self._users[user_id] = entry
+            entry[0] = max(entry[0], now)
+            self._users.move_to_end(user_id)
+            for counter in entry[1]:
+                counter.add(now, amount)
+            features = self._features(entry[1], entry[0])
+            self._evict(now)
+        return features
+
+    def features(self, user_id: str, timestamp: Optional[float] = None) -> Dict[str, Any]:
+        """The user's current features (all zero for unknown users)"""
+        now = time.time() if timestamp is None else timestamp
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None or entry[0] < now - self.ttl:
+                return {f"{kind}_{name}": 0 for name, _, _ in WINDOWS for kind in ("count", "amount")}
+            return self._features(entry[1], now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._evict(time.time())
+            return {
+                "users": len(self._users),
+                "max_users": self.max_users,
+                "idle_ttl_seconds": self.ttl,
+                "windows": [name for name, _, _ in WINDOWS],
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+# Global instance
+_velocity_store: Optional[VelocityStore] = None
+_velocity_store_lock = threading.Lock()
+
+
+def get_velocity_store() -> VelocityStore:
+    """Get or create the global velocity store instance"""
+    global _velocity_store
+    if _velocity_store is None:
+        with _velocity_store_lock:
+            if _velocity_store is None:
+                _velocity_store = VelocityStore(int(os.getenv("VELOCITY_MAX_USERS", "100000")))
+    return _velocity_store
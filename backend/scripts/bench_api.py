@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""In-process benchmark of the API hot paths
+
+Seeds a synthetic prediction history of each requested size, then drives the
+FastAPI app through httpx's ASGI transport (no server, no network) and
+reports throughput and p50/p95/p99 latency per endpoint scenario. Every size
+runs in its own process against its own data directory, with the current
+environment (HISTORY_BACKEND, HISTORY_WRITE_BEHIND, MODEL_LOAD_MODE, ...), so
+results only depend on the code and the settings being compared.
+
+Results are saved as JSON; pass a previous file with --compare to print the
+change per scenario, e.g. between two commits:
+
+    python scripts/bench_api.py --sizes 1000,100000 --output before.json
+    git checkout other-branch
+    python scripts/bench_api.py --sizes 1000,100000 --compare before.json
+
+Usage: python scripts/bench_api.py [--sizes 1000,100000,1000000] [--requests 200]
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_SIZES = "1000,100000,1000000"
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
+CHAT_MESSAGES = [
+    "hola",
+    "¿cómo funciona el sistema?",
+    "tx amount=1500 attempts=3",
+    "tx amount=3500 attempts=7\ntx amount=120 attempts=1\ntx amount=900 attempts=4",
+    "amount,attempts\n3500,7\n120,1\n900,4\n2500,2",
+    "es sospechosa esta transacción?",
+    "estado",
+    "no entiendo",
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed_history(path, size, rng):
+    """Write a history.json of `size` predictions, one per 30 s up to now"""
+    start = datetime.now() - timedelta(seconds=30 * size)
+    predictions = []
+    for i in range(size):
+        score = rng.betavariate(0.6, 6)
+        transaction_id = f"bench-{i:08d}"
+        predictions.append({
+            "transaction_id": transaction_id,
+            "id": transaction_id,
+            "is_fraud": score >= 0.05,
+            "fraud_probability": round(score, 4),
+            "risk_score": int(score * 100),
+            "risk_level": RISK_LEVELS[min(3, int(score * 4))],
+            "confidence": max(score, 1 - score),
+            "factors": [],
+            "timestamp": (start + timedelta(seconds=30 * i)).isoformat(),
+            "amount": round(rng.expovariate(1 / 120), 2),
+            "merchant": "Online",
+            "location": "N/A",
+            "card_type": "Unknown",
+            "sequence_number": i + 1,
+        })
+    with open(path, "w") as f:
+        json.dump({"predictions": predictions}, f)
+
+
+def scenarios(size, rng):
+    """(name, method, path or path factory, body factory or None, is_write)"""
+    last_page = max(1, size // 20)
+
+    def features():
+        body = {"amount": round(rng.uniform(1, 5000), 2), "time": rng.uniform(0, 172800)}
+        for i in range(1, 29):
+            body[f"v{i}"] = rng.gauss(0, 2)
+        return body
+
+    def full_features():
+        body = features()
+        return {"time": body["time"], "amount": body["amount"], **{f"V{i}": body[f"v{i}"] for i in range(1, 29)}}
+
+    return [
+        ("predict", "POST", "/api/v1/predict/", features, True),
+        ("predict_full", "POST", "/api/v1/predict/full", full_features, True),
+        ("history_page_1", "GET", "/api/v1/predict/history?page=1&items_per_page=20", None, False),
+        ("history_page_100", "GET", "/api/v1/predict/history?page=100&items_per_page=20", None, False),
+        ("history_last_page", "GET", f"/api/v1/predict/history?page={last_page}&items_per_page=20", None, False),
+        ("history_risk_high", "GET", "/api/v1/predict/history?page=2&items_per_page=20&risk_level=HIGH", None, False),
+        ("history_fraud", "GET", "/api/v1/predict/history?page=1&items_per_page=50&is_fraud=true", None, False),
+        ("history_cursor", "GET", "/api/v1/predict/history?pagination=cursor&items_per_page=20", None, False),
+        ("history_stats", "GET", "/api/v1/predict/history/stats", None, False),
+        ("transaction_by_id", "GET", lambda: f"/api/v1/transactions/bench-{rng.randrange(size):08d}", None, False),
+        ("chat", "POST", "/api/v1/chat", lambda: {"message": rng.choice(CHAT_MESSAGES), "session_id": "bench"}, False),
+    ]
+
+
+async def run_scenario(client, method, path, body, requests, concurrency):
+    latencies, errors = [], 0
+    queue = list(range(requests))
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            queue.pop()
+            url = path() if callable(path) else path
+            payload = body() if body else None
+            start = time.perf_counter()
+            response = await client.request(method, url, json=payload)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+async def bench_size(size, requests, write_requests, concurrency, seed):
+    """Run every scenario against the app; history already seeded via env"""
+    import httpx
+    from app.main import app
+
+    rng = random.Random(seed)
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # First read loads the history (cache, stats); reported separately
+            start = time.perf_counter()
+            await client.get("/api/v1/predict/history?page=1&items_per_page=20")
+            warmup_ms = (time.perf_counter() - start) * 1000
+
+            for name, method, path, body, is_write in scenarios(size, rng):
+                n = write_requests if is_write else requests
+                await run_scenario(client, method, path, body, 1 if is_write else 5, 1)
+                latencies, errors, elapsed = await run_scenario(client, method, path, body, n, concurrency)
+                results.append({
+                    "size": size,
+                    "scenario": name,
+                    "requests": n,
+                    "errors": errors,
+                    "throughput_rps": round(n / elapsed, 2),
+                    "mean_ms": round(sum(latencies) / len(latencies), 3),
+                    "p50_ms": round(percentile(latencies, 50), 3),
+                    "p95_ms": round(percentile(latencies, 95), 3),
+                    "p99_ms": round(percentile(latencies, 99), 3),
+                })
+    return {"size": size, "first_read_ms": round(warmup_ms, 1), "results": results}
+
+
+def run_worker(args):
+    """Child process: seed the history, benchmark the app, write JSON to args.worker_output"""
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    seed_history(os.environ["HISTORY_FILE"], args.worker_size, rng)
+    seed_seconds = time.perf_counter() - start
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    report = asyncio.run(bench_size(args.worker_size, args.requests, args.write_requests, args.concurrency, args.seed))
+    report["seed_seconds"] = round(seed_seconds, 2)
+    with open(args.worker_output, "w") as f:
+        json.dump(report, f)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results, previous_path):
+    with open(previous_path) as f:
+        previous = {(r["size"], r["scenario"]): r for r in json.load(f)["results"]}
+    print(f"\nChange vs {previous_path} (p99 and throughput)")
+    print(f"{'size':>9}  {'scenario':<20}{'p99 ms':>10}{'Δ p99':>9}{'rps':>10}{'Δ rps':>9}")
+    for r in results:
+        old = previous.get((r["size"], r["scenario"]))
+        if old is None:
+            continue
+        d_p99 = (r["p99_ms"] - old["p99_ms"]) / old["p99_ms"] * 100 if old["p99_ms"] else 0.0
+        d_rps = (r["throughput_rps"] - old["throughput_rps"]) / old["throughput_rps"] * 100 if old["throughput_rps"] else 0.0
+        print(f"{r['size']:>9}  {r['scenario']:<20}{r['p99_ms']:>10.3f}{d_p99:>+8.1f}%{r['throughput_rps']:>10.1f}{d_rps:>+8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated history sizes")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per read scenario")
+    parser.add_argument(
+        "--write-requests", type=int, default=20,
+        help="Requests per write scenario (predict); the json backend rewrites the whole file on each",
+    )
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests in flight per scenario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_api.json")
+    parser.add_argument("--compare", default=None, help="Previous results file to compare against")
+    parser.add_argument("--worker-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_size is not None:
+        run_worker(args)
+        return
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    reports = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="bench_api_") as tmp:
+            output = os.path.join(tmp, "report.json")
+            env = {
+                **os.environ,
+                "HISTORY_FILE": os.path.join(tmp, "history.json"),
+                "HISTORY_SQLITE_PATH": os.path.join(tmp, "history.db"),
+                "HISTORY_SEGMENT_DIR": os.path.join(tmp, "history"),
+                "CHAT_SESSION_SQLITE_PATH": os.path.join(tmp, "chat_sessions.db"),
+            }
+            print(f"Benchmarking {size:,} records...", flush=True)
+            subprocess.run(
+                [sys.executable, __file__, "--worker-size", str(size), "--worker-output", output,
+                 "--requests", str(args.requests), "--write-requests", str(args.write_requests),
+                 "--concurrency", str(args.concurrency), "--seed", str(args.seed)],
+                cwd=tmp, env=env, check=True,
+            )
+            with open(output) as f:
+                reports.append(json.load(f))
+
+    results = [r for report in reports for r in report["results"]]
+    print(f"\n{'size':>9}  {'scenario':<20}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for r in results:
+        print(
+            f"{r['size']:>9}  {r['scenario']:<20}{r['throughput_rps']:>10.1f}"
+            f"{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['errors']:>8}"
+        )
+
+    document = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "settings": {
+                key: os.environ[key] for key in sorted(os.environ)
+                if key.startswith(("HISTORY_", "PREDICT_", "MODEL_", "FRAUD_", "CHAT_"))
+            },
+            "requests": args.requests,
+            "write_requests": args.write_requests,
+            "concurrency": args.concurrency,
+        },
+        "sizes": [{k: v for k, v in report.items() if k != "results"} for report in reports],
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
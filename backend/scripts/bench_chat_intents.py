@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Throughput of the /chat intent dispatch
+
+Compares the precompiled IntentMatcher (one regex pass per message) with the
+original chain of `any(word in lower ...)` scans, over a corpus of
+representative messages, and checks both pick the same intent.
+
+Usage: python scripts/bench_chat_intents.py [messages]
+"""
+from pathlib import Path
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.routers.chatbot import GREETINGS, INTENTS  # noqa: E402
+
+TEMPLATES = [
+    "hola", "hola!!", "buenos días", "buenas tardes equipo", "hi", "hello there",
+    "¿cómo funciona el sistema?", "que trabajo hace esto", "dame información del sistema",
+    "quiero mas detalles", "info", "cómo estás", "qué tal todo", "gracias", "thanks a lot",
+    "adiós", "bye", "hasta luego", "help", "ayuda", "menú", "reset", "estado",
+    "tx amount={amount} attempts={attempts}", "tx monto={amount} intentos={attempts}",
+    "TX amount={amount}", "¿esta transacción es sospechosa?", "hay riesgo de fraude con {amount}?",
+    "revisa la seguridad de mi cuenta", "necesito revisar un pago de {amount} dolares de ayer por la tarde",
+    "no entiendo nada", "{amount}", "el cliente reporta un cargo desconocido en su tarjeta",
+]
+
+
+def legacy_intent(lower):
+    """The original keyword chain from chatbot.chat, kept as the reference"""
+    for greeting in GREETINGS:
+        if lower == greeting or (lower.startswith(greeting) and len(lower) <= len(greeting) + 5):
+            return "greeting"
+    if any(word in lower for word in ["funciona", "trabajo", "funcionamiento"]) and any(word in lower for word in ["qué", "que", "cómo", "como"]):
+        return "how_it_works"
+    if any(word in lower for word in ["información", "informacion", "info", "detalles"]):
+        return "info"
+    if any(word in lower for word in ["como estás", "cómo estás", "qué tal"]):
+        return "small_talk"
+    if any(word in lower for word in ["gracias", "thanks"]):
+        return "thanks"
+    if any(word in lower for word in ["adiós", "adios", "bye", "hasta luego"]):
+        return "goodbye"
+    if lower in {"help", "ayuda", "menu", "menú"}:
+        return "help"
+    if lower == "reset":
+        return "reset"
+    if lower == "estado":
+        return "status"
+    if lower.startswith("tx"):
+        return "transaction"
+    if any(word in lower for word in ["fraude", "fraud", "sospechosa", "riesgo", "seguridad"]):
+        return "fraud"
+    return None
+
+
+def make_corpus(n):
+    rng = random.Random(42)
+    return [
+        rng.choice(TEMPLATES).format(amount=rng.randint(1, 9000), attempts=rng.randint(1, 9)).strip().lower()
+        for _ in range(n)
+    ]
+
+
+def throughput(fn, corpus, rounds=5):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for message in corpus:
+            fn(message)
+        best = min(best, time.perf_counter() - start)
+    return len(corpus) / best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    corpus = make_corpus(n)
+
+    mismatches = [m for m in corpus if legacy_intent(m) != INTENTS.match(m)[0]]
+    print(f"Parity: {n - len(mismatches)}/{n} identical intents")
+    for message in sorted(set(mismatches))[:10]:
+        print(f"  {message!r}: legacy={legacy_intent(message)} matcher={INTENTS.match(message)[0]}")
+
+    print(f"\n{'dispatch':<12}{'msgs/s':>12}{'µs/msg':>10}")
+    for name, fn in (("legacy", legacy_intent), ("matcher", INTENTS.match)):
+        rate = throughput(fn, corpus)
+        print(f"{name:<12}{rate:>12,.0f}{1e6 / rate:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
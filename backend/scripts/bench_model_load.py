@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Per-worker memory and cold start of FraudDetector in each load mode
+
+Starts N worker processes per mode (MODEL_LOAD_MODE=joblib and =mmap), each
+building a FraudDetector and scoring one transaction, keeps them all alive
+at once and reports per-worker cold start, RSS and PSS. PSS splits shared
+pages between the processes mapping them, so it shows what a worker really
+adds on a node (Linux only: read from /proc/self/smaps_rollup).
+
+Usage: python scripts/bench_model_load.py [workers]
+"""
+from pathlib import Path
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+WORKER = r'''
+import time
+start = time.perf_counter()
+import json, sys, warnings
+warnings.filterwarnings("ignore")
+sys.path.insert(0, sys.argv[1])
+from app.ml.fraud_detector import FraudDetector
+
+detector = FraudDetector()
+detector.predict({"amount": 120.0, "time": 3600.0})
+cold_start = time.perf_counter() - start
+
+def memory_kb():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields
+
+sys.stdout.write(json.dumps({"cold_start": cold_start, "pid": __import__("os").getpid()}) + "\n")
+sys.stdout.flush()
+sys.stdin.readline()  # wait until every worker is up, then measure
+sys.stdout.write(json.dumps(memory_kb()) + "\n")
+sys.stdout.flush()
+sys.stdin.readline()
+'''
+
+
+def run_mode(mode, workers):
+    env = {**os.environ, "MODEL_LOAD_MODE": mode}
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER, str(BACKEND_DIR)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env, cwd=BACKEND_DIR,
+        )
+        for _ in range(workers)
+    ]
+    try:
+        starts = [json.loads(p.stdout.readline())["cold_start"] for p in procs]
+        for p in procs:
+            p.stdin.write("\n")
+            p.stdin.flush()
+        memory = [json.loads(p.stdout.readline()) for p in procs]
+    finally:
+        for p in procs:
+            try:
+                p.stdin.write("\n")
+                p.stdin.flush()
+            except OSError:
+                pass
+            p.wait()
+    return starts, memory
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("This benchmark reads /proc/self/smaps_rollup and needs Linux")
+
+    # Warm-up run so mmap mode finds model.forest already exported
+    run_mode("mmap", 1)
+
+    print(f"{workers} workers per mode\n")
+    print(f"{'mode':<8}{'cold start s':>14}{'RSS MB':>10}{'PSS MB':>10}{'shared MB':>11}")
+    for mode in ("joblib", "mmap"):
+        starts, memory = run_mode(mode, workers)
+        mean = lambda values: sum(values) / len(values)
+        rss = mean([m["Rss"] for m in memory]) / 1024
+        pss = mean([m["Pss"] for m in memory]) / 1024
+        shared = mean([m.get("Shared_Clean", 0) + m.get("Shared_Dirty", 0) for m in memory]) / 1024
+        print(f"{mode:<8}{mean(starts):>14.3f}{rss:>10.1f}{pss:>10.1f}{shared:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
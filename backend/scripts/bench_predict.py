@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Microbenchmark for FraudDetector single-row scoring
+
+Compares the array fast path (FraudDetector.predict) against the original
+pandas path (FraudDetector.predict_dataframe) and reports p50/p99 latency.
+
+Usage: python scripts/bench_predict.py [iterations]
+"""
+from pathlib import Path
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.ml.fraud_detector import FraudDetector  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_cases(n):
+    rng = random.Random(42)
+    cases = []
+    for _ in range(n):
+        case = {'amount': rng.uniform(0, 5000), 'time': rng.uniform(0, 172800)}
+        for i in range(1, 29):
+            case[f'v{i}'] = rng.gauss(0, 2)
+        cases.append(case)
+    return cases
+
+
+def run(fn, cases, warmup=20):
+    for case in cases[:warmup]:
+        fn(case)
+    samples = []
+    for case in cases:
+        start = time.perf_counter()
+        fn(case)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    fd = FraudDetector()
+    cases = make_cases(iterations)
+
+    mismatches = sum(1 for c in cases if fd.predict(c) != fd.predict_dataframe(c))
+    print(f'Parity: {iterations - mismatches}/{iterations} identical scores')
+
+    print(f"\n{'path':<12}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name, fn in (('dataframe', fd.predict_dataframe), ('fast', fd.predict)):
+        samples = run(fn, cases)
+        mean = sum(samples) / len(samples)
+        print(f'{name:<12}{percentile(samples, 50):>10.3f}{percentile(samples, 99):>10.3f}{mean:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
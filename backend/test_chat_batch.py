@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Test script for bulk transaction analysis in the chatbot"""
+
+from app.routers.chatbot import (
+    analyze_batch,
+    compute_risk_batch,
+    try_extract_csv_from_text,
+    try_extract_txs_from_text,
+)
+
+
+def scalar_risk(amount, attempts):
+    """Reference rules, one transaction at a time"""
+    score = 50 if amount >= 2000 else 30 if amount >= 800 else 15 if amount >= 300 else 0
+    score += 50 if attempts >= 6 else 25 if attempts >= 3 else 0
+    score = min(score, 100)
+    return score, "BLOQUEAR" if score >= 70 else "REVISAR" if score >= 40 else "APROBAR"
+
+
+def test_vectorized_rules():
+    txs = [
+        {"amount": amount, "attempts_10min": attempts}
+        for amount in (0, 299.99, 300, 799, 800, 1999, 2000, 10**6)
+        for attempts in (0, 1, 2, 3, 5, 6, 50)
+    ]
+    for tx, result in zip(txs, compute_risk_batch(txs)):
+        assert (result["risk_score"], result["decision"]) == scalar_risk(tx["amount"], tx["attempts_10min"])
+
+
+def test_tx_block():
+    txs = try_extract_txs_from_text("tx amount=3500 attempts=7\ntx monto=100\nTX amount=900 intentos=4")
+    assert txs == [
+        {"amount": 3500.0, "attempts_10min": 7},
+        {"amount": 100.0, "attempts_10min": 1},
+        {"amount": 900.0, "attempts_10min": 4},
+    ]
+    # Lines without "tx" continue the previous transaction
+    assert try_extract_txs_from_text("tx\namount=900\nattempts=3") == [{"amount": 900.0, "attempts_10min": 3}]
+
+
+def test_pasted_csv():
+    txs = try_extract_csv_from_text("Monto;Intentos\n2500;1\nfoo;2\n\n10;9")
+    assert txs == [{"amount": 2500.0, "attempts_10min": 1}, {"amount": 10.0, "attempts_10min": 9}]
+    assert try_extract_csv_from_text("hola\nque tal") is None
+
+    response = analyze_batch("s", txs)
+    assert response["summary"] == {"total": 2, "omitted": 0, "BLOQUEAR": 0, "REVISAR": 2, "APROBAR": 0}
+    assert response["reply"].count("| REVISAR |") == 2
+
+
+if __name__ == "__main__":
+    test_vectorized_rules()
+    print("✓ Vectorized risk rules")
+    test_tx_block()
+    print("✓ Multi-line tx blocks")
+    test_pasted_csv()
+    print("✓ Pasted CSV")
+    print("\n✅ All tests passed!")
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Test script for the chatbot intent matcher"""
+
+from app.chat_intents import IntentMatcher
+from app.routers.chatbot import INTENTS
+
+
+def test_priority_order():
+    assert INTENTS.match("hola") == ("greeting", "hola")
+    assert INTENTS.match("hello!!")[0] == "greeting"
+    assert INTENTS.match("hola, necesito ayuda con algo")[0] is None
+    assert INTENTS.match("¿cómo funciona?")[0] == "how_it_works"
+    # "como estás" also counts as the question word "como"
+    assert INTENTS.match("como estás, funciona?")[0] == "how_it_works"
+    assert INTENTS.match("cómo estás")[0] == "small_talk"
+    assert INTENTS.match("info de fraude")[0] == "info"
+    assert INTENTS.match("menú")[0] == "help"
+    assert INTENTS.match("tx amount=5 attempts=1")[0] == "transaction"
+    assert INTENTS.match("es sospechosa?")[0] == "fraud"
+    assert INTENTS.match("no entiendo") == (None, None)
+
+
+def test_overlapping_keywords():
+    matcher = IntentMatcher().add_keywords("a", ["abc"]).add_keywords("b", ["cde"]).compile()
+    # "cde" starts inside the "abc" match
+    assert matcher.match("abcde")[0] == "a"
+    assert matcher.match("xxcde")[0] == "b"
+    assert INTENTS.match("graciasospechosa")[0] == "thanks"
+    assert INTENTS.match("adiósospechosa")[0] == "goodbye"
+
+
+if __name__ == "__main__":
+    test_priority_order()
+    print("✓ Intent priority order")
+    test_overlapping_keywords()
+    print("✓ Overlapping keywords")
+    print("\n✅ All tests passed!")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Test script for the chatbot session stores"""
+
+import os
+import tempfile
+import time
+
+from app.chat_sessions import SessionStore, SQLiteSessionStore
+
+
+def check_store(make_store):
+    store = make_store(max_sessions=2, ttl_seconds=0.2, history_size=3)
+
+    # Ring buffer keeps the last history_size messages
+    for i in range(5):
+        store.append("a", {"user": f"m{i}"})
+    assert [m["user"] for m in store.recent("a", 5)] == ["m2", "m3", "m4"]
+
+    # Third session evicts the least recently active one (b)
+    store.append("b", {"user": "hi"})
+    store.append("a", {"user": "m5"})
+    store.append("c", {"user": "hi"})
+    assert store.recent("b") == []
+    assert store.stats()["evicted"] >= 1
+
+    store.reset("a")
+    assert store.recent("a") == []
+
+    # Idle sessions expire
+    store.append("c", {"user": "again"})
+    time.sleep(0.25)
+    assert store.recent("c") == []
+    assert store.stats()["expired"] >= 1
+
+
+def test_memory_store():
+    check_store(SessionStore)
+
+
+def test_sqlite_store():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.db")
+        check_store(lambda **options: SQLiteSessionStore(path, **options))
+
+        # Sessions survive a restart (another store on the same file)
+        SQLiteSessionStore(path).append("s", {"user": "persisted"})
+        assert SQLiteSessionStore(path).recent("s") == [{"user": "persisted"}]
+
+
+if __name__ == "__main__":
+    test_memory_store()
+    print("✓ In-memory session store")
+    test_sqlite_store()
+    print("✓ SQLite session store")
+    print("\n✅ All tests passed!")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Test script for forest compaction on the shipped model"""
+
+import numpy as np
+
+from app.ml.compact_forest import compact_model, select_trees, tree_probabilities
+from app.ml.forest_engine import compile_model
+from app.ml.fraud_detector import FraudDetector
+
+detector = FraudDetector()
+rng = np.random.default_rng(7)
+
+
+def random_rows(n):
+    X = rng.normal(0, 3, size=(n, len(detector.expected_features)))
+    X[:, 0] = rng.uniform(0, 172800, size=n)   # Time
+    X[:, -1] = rng.uniform(0, 10000, size=n)   # Amount
+    return X
+
+
+def test_per_tree_mean_is_forest_probability():
+    X = random_rows(300)
+    per_tree = tree_probabilities(detector.model, X)
+    assert np.allclose(per_tree.mean(axis=1), detector.model.predict_proba(X)[:, 1])
+
+
+def test_selection_within_tolerance():
+    X = random_rows(500)
+    per_tree = tree_probabilities(detector.model, X)
+    selected, deviation = select_trees(per_tree, tolerance=0.02)
+    assert deviation <= 0.02 and len(selected) == len(set(selected))
+
+    compact = compact_model(detector.model, selected)
+    assert compact.n_estimators == len(selected) < len(detector.model.estimators_)
+    full, reduced = detector.model.predict_proba(X)[:, 1], compact.predict_proba(X)[:, 1]
+    assert np.abs(full - reduced).max() <= 0.02 + 1e-9
+
+    # The compiled engine serves the compacted forest like any other
+    assert np.allclose(compile_model(compact).predict_proba(X), compact.predict_proba(X))
+
+
+if __name__ == "__main__":
+    test_per_tree_mean_is_forest_probability()
+    print("✓ Per-tree probabilities average to predict_proba")
+    test_selection_within_tolerance()
+    print("✓ Greedy selection stays within tolerance")
+    print("\n✅ All tests passed!")
@@ -40,6 +40,12 @@ page = manager.get_predictions_paginated(page=1, items_per_page=10)
 print(f"✓ Paginated page 1: {len(page['data'])} items")
 print(f"✓ Total pages: {page['total_pages']}")
 
+# Lookup by ID
+found = manager.get_prediction('test-1')
+assert found is not None and found['transaction_id'] == 'test-1'
+assert manager.get_prediction('missing-id') is None
+print(f"✓ Lookup by ID: {found['transaction_id']}")
+
 # Get stats
 stats = manager.get_statistics()
 print(f"✓ Stats - Fraud count: {stats['total_fraud_detected']}")
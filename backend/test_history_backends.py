@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Parity test: JSON, segmented and SQLite history managers return the same results"""
+
+import os
+import random
+import tempfile
+
+from app.history import HistoryManager
+from app.history_segments import SegmentedHistoryManager
+from app.history_sqlite import SQLiteHistoryManager
+
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+FILTERS = [
+    None,
+    {"risk_level": "HIGH"},
+    {"is_fraud": True},
+    {"is_fraud": False, "date_from": "2025-12-10T10:02:00"},
+    {"date_from": "2025-12-10T10:01:00", "date_to": "2025-12-10T10:03:00"},
+]
+
+
+def make_predictions(n, seed=3):
+    """Predictions with repeated timestamps and some repeated transaction IDs"""
+    rng = random.Random(seed)
+    predictions = []
+    for i in range(n):
+        score = rng.random()
+        predictions.append({
+            "transaction_id": f"tx-{rng.randrange(n * 3 // 4):03d}",
+            "is_fraud": score >= 0.5,
+            "fraud_probability": round(score, 4),
+            "risk_score": int(score * 100),
+            "risk_level": rng.choice(RISK_LEVELS),
+            "timestamp": f"2025-12-10T10:0{rng.randrange(5)}:00",
+        })
+    return predictions
+
+
+def managers(tmp):
+    return {
+        "json": HistoryManager(os.path.join(tmp, "history.json")),
+        # Older predictions evicted from the cache are read back from storage
+        "json_partial_cache": HistoryManager(os.path.join(tmp, "partial.json"), cache_max_items=10),
+        "segments": SegmentedHistoryManager(os.path.join(tmp, "segments"), legacy_filepath=None),
+        "sqlite": SQLiteHistoryManager(os.path.join(tmp, "history.db"), legacy_filepath=None),
+    }
+
+
+def strip(predictions):
+    """saved_at is the wall clock of each write, so it differs per backend"""
+    return [{k: v for k, v in p.items() if k != "saved_at"} for p in predictions]
+
+
+def walk_cursor(manager, filters, items_per_page):
+    """All pages following next_cursor, then back again with prev_cursor"""
+    pages = [manager.get_predictions_by_cursor(None, items_per_page, filters)]
+    while pages[-1]["has_next"]:
+        pages.append(manager.get_predictions_by_cursor(pages[-1]["next_cursor"], items_per_page, filters))
+    back = [pages[-1]]
+    while back[-1]["has_previous"]:
+        back.append(manager.get_predictions_by_cursor(back[-1]["prev_cursor"], items_per_page, filters))
+    return [(strip(p["data"]), p["has_next"], p["has_previous"]) for p in pages + back]
+
+
+def snapshot(manager):
+    result = {
+        "all": strip(manager.get_all_predictions()),
+        "stats": manager.get_statistics(),
+        "lookup": [strip([manager.get_prediction(f"tx-{i:03d}") or {}]) for i in range(0, 60, 7)],
+    }
+    for i, filters in enumerate(FILTERS):
+        for page in range(1, 8):
+            paginated = manager.get_predictions_paginated(page, 7, filters)
+            result[f"page-{i}-{page}"] = {**paginated, "data": strip(paginated["data"])}
+        result[f"cursor-{i}"] = walk_cursor(manager, filters, 6)
+        result[f"export-{i}"] = strip(manager.iter_predictions(filters, chunk_size=5))
+    return result
+
+
+def test_backends_agree():
+    predictions = make_predictions(80)
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = managers(tmp)
+        for manager in backends.values():
+            for prediction in predictions[:30]:
+                manager.add_prediction(dict(prediction))
+            manager.add_predictions([dict(p) for p in predictions[30:]])
+
+        expected = snapshot(backends["json"])
+        assert len(expected["all"]) == 80
+        for name, manager in backends.items():
+            actual = snapshot(manager)
+            for key in expected:
+                assert actual[key] == expected[key], f"{name} differs from json in {key}"
+
+
+def test_ties_keep_insertion_order():
+    tied = [
+        {"transaction_id": "same", "timestamp": "2025-12-10T10:00:00", "risk_level": "LOW", "n": i}
+        for i in range(12)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, manager in managers(tmp).items():
+            manager.add_predictions(tied[:5])
+            for prediction in tied[5:]:
+                manager.add_prediction(prediction)
+            assert [p["n"] for p in manager.get_all_predictions()] == list(range(12)), name
+            pages = [manager.get_predictions_paginated(page, 5)["data"] for page in (1, 2, 3)]
+            assert [p["n"] for page in pages for p in page] == list(range(12)), name
+
+
+if __name__ == "__main__":
+    test_backends_agree()
+    print("✓ JSON, segments and SQLite agree on listings, filters, pages, cursors and stats")
+    test_ties_keep_insertion_order()
+    print("✓ Equal keys are listed in insertion order")
+    print("\n✅ All tests passed!")
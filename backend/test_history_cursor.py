@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Test script for keyset (cursor) pagination of the history and transaction listings"""
+
+import base64
+import os
+import tempfile
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import app.history as history
+from app.history import HistoryManager, encode_cursor
+from app.history_segments import SegmentedHistoryManager
+from app.history_sqlite import SQLiteHistoryManager
+from app.main import app
+from app.routers import predict
+from app.routers.transactions import get_risk_level
+
+
+def make_predictions(n, start_minute=0):
+    """One prediction per minute, with every fourth one sharing its neighbour's timestamp"""
+    predictions = []
+    for i in range(n):
+        minute = start_minute + i - (i % 4 == 3)
+        score = (i * 37 % 100) / 100
+        predictions.append({
+            "transaction_id": f"tx-{start_minute + i:04d}",
+            "is_fraud": score >= 0.5,
+            "fraud_probability": score,
+            "risk_score": int(score * 100),
+            "risk_level": get_risk_level(int(score * 100)),
+            "timestamp": f"2025-12-10T{10 + minute // 60:02d}:{minute % 60:02d}:00",
+        })
+    return predictions
+
+
+def managers(tmp):
+    return [
+        HistoryManager(os.path.join(tmp, "history.json")),
+        SegmentedHistoryManager(os.path.join(tmp, "segments"), legacy_filepath=None),
+        SQLiteHistoryManager(os.path.join(tmp, "history.db"), legacy_filepath=None),
+    ]
+
+
+def ids(page):
+    return [p["transaction_id"] for p in page["data"]]
+
+
+def test_next_prev_round_trip():
+    predictions = make_predictions(23)
+    # Same timestamp and ID as tx-0005: only the insertion order tells them apart
+    predictions += [dict(predictions[5], n=i) for i in range(3)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for manager in managers(tmp):
+            manager.add_predictions(predictions)
+            expected = [(p["transaction_id"], p.get("n")) for p in manager.get_all_predictions()]
+
+            forward = [manager.get_predictions_by_cursor(None, 4)]
+            while forward[-1]["has_next"]:
+                forward.append(manager.get_predictions_by_cursor(forward[-1]["next_cursor"], 4))
+            walked = [(p["transaction_id"], p.get("n")) for page in forward for p in page["data"]]
+            assert walked == expected, type(manager).__name__
+            assert not forward[0]["has_previous"] and forward[0]["prev_cursor"] is None
+            assert forward[-1]["next_cursor"] is None
+
+            # prev_cursor leads back through the same pages
+            backward = [forward[-1]]
+            while backward[-1]["has_previous"]:
+                backward.append(manager.get_predictions_by_cursor(backward[-1]["prev_cursor"], 4))
+            assert [ids(page) for page in backward] == [ids(page) for page in reversed(forward)]
+
+
+def test_pages_stable_across_inserts():
+    with tempfile.TemporaryDirectory() as tmp:
+        for manager in managers(tmp):
+            manager.add_predictions(make_predictions(20))
+            first = manager.get_predictions_by_cursor(None, 5)
+            second = manager.get_predictions_by_cursor(first["next_cursor"], 5)
+
+            # Newer predictions, one of them with the boundary item's timestamp
+            newer = make_predictions(6, start_minute=30)
+            newer[0]["timestamp"] = first["data"][-1]["timestamp"]
+            manager.add_predictions(newer[:3])
+            manager.add_prediction(newer[3])
+
+            # Following a cursor handed out before the inserts gives the same page
+            assert ids(manager.get_predictions_by_cursor(first["next_cursor"], 5)) == ids(second)
+
+            # Paging back from it reaches every newer item exactly once
+            listing = [p["transaction_id"] for p in manager.get_all_predictions()]
+            boundary = listing.index(second["data"][0]["transaction_id"])
+            pages = [manager.get_predictions_by_cursor(second["prev_cursor"], 5)]
+            while pages[-1]["has_previous"]:
+                pages.append(manager.get_predictions_by_cursor(pages[-1]["prev_cursor"], 5))
+            assert ids(pages[0]) == listing[boundary - 5:boundary]
+            assert [i for page in reversed(pages) for i in ids(page)] == listing[:boundary]
+            assert {p["transaction_id"] for p in newer[:4]} <= set(listing[:boundary])
+
+
+def isolated_history(tmp):
+    """Patch the global history managers onto a throwaway JSON history"""
+    manager = HistoryManager(os.path.join(tmp, "history.json"))
+    return manager, [
+        mock.patch.object(history, "_history_manager", manager),
+        mock.patch.object(predict, "_history_manager", manager),
+        mock.patch.dict(os.environ, {"HISTORY_WRITE_BEHIND": "false"}),
+    ]
+
+
+def test_filtered_transaction_pages():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager, patches = isolated_history(tmp)
+        for patch in patches:
+            patch.start()
+        try:
+            manager.add_predictions(make_predictions(40))
+            expected = [
+                p["transaction_id"] for p in manager.get_all_predictions()
+                if get_risk_level(p["risk_score"]) == "HIGH" and p["is_fraud"]
+            ]
+            assert len(expected) > 3
+
+            client = TestClient(app)
+            params = {"pagination": "cursor", "limit": 3, "risk_level": "high", "is_fraud": "true"}
+            pages = [client.get("/api/v1/transactions/", params=params).json()]
+            while pages[-1]["has_next"]:
+                pages.append(client.get(
+                    "/api/v1/transactions/", params={**params, "cursor": pages[-1]["next_cursor"]}
+                ).json())
+            assert [t["transaction_id"] for page in pages for t in page["transactions"]] == expected
+            assert all(len(page["transactions"]) == 3 for page in pages[:-1])
+
+            back = client.get("/api/v1/transactions/", params={**params, "cursor": pages[1]["prev_cursor"]}).json()
+            assert back["transactions"] == pages[0]["transactions"]
+        finally:
+            for patch in reversed(patches):
+                patch.stop()
+
+
+def test_offset_and_cursor_modes_agree():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager, patches = isolated_history(tmp)
+        for patch in patches:
+            patch.start()
+        try:
+            manager.add_predictions(make_predictions(30))
+            client = TestClient(app)
+            for params in ({"limit": 7}, {"limit": 4, "risk_level": "critical", "is_fraud": "true"}):
+                offset = client.get("/api/v1/transactions/", params=params).json()
+                cursor = client.get("/api/v1/transactions/", params={**params, "pagination": "cursor"}).json()
+                assert offset["transactions"] == cursor["transactions"], params
+                assert offset["transactions"][0]["timestamp"] >= offset["transactions"][-1]["timestamp"]
+
+                second = client.get("/api/v1/transactions/", params={**params, "page": 2}).json()
+                following = client.get(
+                    "/api/v1/transactions/", params={**params, "cursor": cursor["next_cursor"]}
+                ).json()
+                assert second["transactions"] == following["transactions"], params
+        finally:
+            for patch in reversed(patches):
+                patch.stop()
+
+
+def test_malformed_cursor_is_rejected():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager, patches = isolated_history(tmp)
+        for patch in patches:
+            patch.start()
+        try:
+            manager.add_predictions(make_predictions(5))
+            client = TestClient(app)
+            valid = encode_cursor("next", ("2025-12-10T10:00:00", "tx-0001", -1))
+            assert client.get("/api/v1/transactions/", params={"cursor": valid}).status_code == 200
+            malformed = [
+                "not-a-cursor",
+                "%%%",
+                *(
+                    base64.urlsafe_b64encode(raw).decode().rstrip("=")
+                    for raw in (
+                        b'["next","2025-12-10T10:00:00","tx-0001"]',       # missing sequence number
+                        b'["sideways","2025-12-10T10:00:00","tx-0001",1]',
+                        b'["next","2025-12-10T10:00:00","tx-0001","1"]',
+                        b'{"direction":"next"}',
+                    )
+                ),
+            ]
+            for cursor in malformed:
+                for url in ("/api/v1/transactions/", "/api/v1/predict/history"):
+                    response = client.get(url, params={"cursor": cursor})
+                    assert response.status_code == 400, (url, cursor, response.status_code)
+        finally:
+            for patch in reversed(patches):
+                patch.stop()
+
+
+if __name__ == "__main__":
+    test_next_prev_round_trip()
+    print("✓ next/prev cursors round-trip over every backend")
+    test_pages_stable_across_inserts()
+    print("✓ Pages are stable when new predictions arrive")
+    test_filtered_transaction_pages()
+    print("✓ Filtered cursor pages through /transactions")
+    test_offset_and_cursor_modes_agree()
+    print("✓ Offset and cursor modes list transactions in the same order")
+    test_malformed_cursor_is_rejected()
+    print("✓ Malformed cursors return 400")
+    print("\n✅ All tests passed!")
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Test script for the segmented (rolling JSONL) history backend"""
+
+import json
+import multiprocessing
+import os
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+
+from app.history_segments import MIGRATION_MARKER, SEGMENT_PREFIX, SEGMENT_SUFFIX, SegmentedHistoryManager
+
+
+def make_prediction(i):
+    return {
+        "transaction_id": f"tx-{i:03d}",
+        "is_fraud": i % 2 == 0,
+        "fraud_probability": 0.5,
+        "risk_score": 50,
+        "risk_level": "HIGH",
+        "timestamp": f"2025-12-10T10:{i % 60:02d}:00",
+    }
+
+
+def segment_names(directory):
+    return sorted(
+        name for name in os.listdir(directory)
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+    )
+
+
+def full_signature(directory):
+    """Fingerprint of every segment, computed from scratch"""
+    signature = []
+    for name in segment_names(directory):
+        stat = os.stat(os.path.join(directory, name))
+        signature.append((name, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def test_rotation_by_size():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = SegmentedHistoryManager(tmp, max_segment_bytes=1500, legacy_filepath=None)
+        # The directory is only listed again when a segment was created
+        with mock.patch("app.history_segments.os.listdir", wraps=os.listdir) as listdir:
+            for i in range(20):
+                manager.add_prediction(make_prediction(i))
+            manager.add_predictions([make_prediction(i) for i in range(20, 30)])
+
+        names = segment_names(tmp)
+        assert len(names) > 2
+        assert listdir.call_count <= len(names) + 1
+        sizes = [os.path.getsize(os.path.join(tmp, name)) for name in names]
+        # A segment only rolls over once it reached the limit
+        assert all(size >= 1500 for size in sizes[:-1])
+        assert [int(name[len(SEGMENT_PREFIX):].split("-")[0]) for name in names] == list(range(1, len(names) + 1))
+        assert manager._source_signature() == full_signature(tmp)
+
+        assert [p["sequence_number"] for p in manager.get_all_predictions()] == list(range(30, 0, -1))
+        assert manager.get_statistics()["total_predictions"] == 30
+
+
+def test_rotation_by_age_after_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = SegmentedHistoryManager(tmp, max_segment_age_seconds=3600, legacy_filepath=None)
+        manager.add_prediction(make_prediction(0))
+        manager.add_prediction(make_prediction(1))
+        assert len(segment_names(tmp)) == 1
+
+        # Pretend the segment was started two hours ago
+        (name,) = segment_names(tmp)
+        created = (datetime.now() - timedelta(hours=2)).strftime("%Y%m%dT%H%M%S")
+        old_name = f"{name[:len(SEGMENT_PREFIX) + 7]}{created}{SEGMENT_SUFFIX}"
+        os.rename(os.path.join(tmp, name), os.path.join(tmp, old_name))
+
+        manager = SegmentedHistoryManager(tmp, max_segment_age_seconds=3600, legacy_filepath=None)
+        manager.add_prediction(make_prediction(2))
+        manager.add_prediction(make_prediction(3))
+        names = segment_names(tmp)
+        assert len(names) == 2 and names[0] == old_name
+        assert names[1].startswith(f"{SEGMENT_PREFIX}000002-")
+        assert manager._source_signature() == full_signature(tmp)
+        assert len(manager.get_all_predictions()) == 4
+
+
+def test_migration_from_history_json():
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = os.path.join(tmp, "history.json")
+        predictions = [
+            {**make_prediction(i), "saved_at": "2025-12-10T10:00:00", "sequence_number": i + 1}
+            for i in range(5)
+        ]
+        with open(legacy, "w") as f:
+            json.dump({"predictions": predictions}, f)
+
+        directory = os.path.join(tmp, "history")
+        manager = SegmentedHistoryManager(directory, legacy_filepath=legacy)
+        assert os.path.exists(os.path.join(directory, MIGRATION_MARKER))
+        assert len(segment_names(directory)) == 1
+        assert manager.get_statistics()["total_predictions"] == 5
+        assert manager.add_prediction(make_prediction(5))["sequence_number"] == 6
+
+        # The import happens once, even after the segments were cleared
+        manager.clear_history()
+        manager = SegmentedHistoryManager(directory, legacy_filepath=legacy)
+        assert manager.get_all_predictions() == []
+
+
+def test_sequence_recovered_after_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = SegmentedHistoryManager(tmp, max_segment_bytes=400, legacy_filepath=None)
+        for i in range(7):
+            manager.add_prediction(make_prediction(i))
+        assert len(segment_names(tmp)) > 1
+
+        manager = SegmentedHistoryManager(tmp, max_segment_bytes=400, legacy_filepath=None)
+        assert manager.add_prediction(make_prediction(7))["sequence_number"] == 8
+
+        # A torn last write falls back to counting the stored lines
+        with open(os.path.join(tmp, segment_names(tmp)[-1]), "a") as f:
+            f.write('{"transaction_id": "tx-torn", "seq')
+        manager = SegmentedHistoryManager(tmp, max_segment_bytes=400, legacy_filepath=None)
+        assert manager.add_prediction(make_prediction(8))["sequence_number"] == 9
+        assert len(manager.get_all_predictions()) == 9
+
+
+def stored_sequence_numbers(directory):
+    numbers = []
+    for name in segment_names(directory):
+        with open(os.path.join(directory, name)) as f:
+            numbers.extend(json.loads(line)["sequence_number"] for line in f)
+    return numbers
+
+
+def test_two_managers_share_a_directory():
+    with tempfile.TemporaryDirectory() as tmp:
+        a = SegmentedHistoryManager(tmp, max_segment_bytes=500, legacy_filepath=None)
+        b = SegmentedHistoryManager(tmp, max_segment_bytes=500, legacy_filepath=None)
+        assert b.get_statistics()["total_predictions"] == 0
+
+        # a rotates through several segments b has never seen
+        for i in range(8):
+            a.add_prediction(make_prediction(i))
+        assert len(segment_names(tmp)) > 2
+        assert b.get_statistics()["total_predictions"] == 8
+        assert len(b.get_all_predictions()) == 8
+
+        for i in range(8, 20):
+            (a if i % 3 else b).add_prediction(make_prediction(i))
+        b.add_predictions([make_prediction(i) for i in range(20, 24)])
+
+        assert stored_sequence_numbers(tmp) == list(range(1, 25))
+        for manager in (a, b):
+            assert manager.get_statistics()["total_predictions"] == 24
+            assert [p["sequence_number"] for p in manager.get_all_predictions()] == list(range(24, 0, -1))
+            assert manager._source_signature() == full_signature(tmp)
+
+
+def write_from_process(directory, offset, count):
+    manager = SegmentedHistoryManager(directory, max_segment_bytes=2000, legacy_filepath=None)
+    for i in range(count):
+        manager.add_prediction(make_prediction(offset + i))
+
+
+def test_processes_get_unique_sequence_numbers():
+    with tempfile.TemporaryDirectory() as tmp:
+        processes = [
+            multiprocessing.Process(target=write_from_process, args=(tmp, offset, 40))
+            for offset in (0, 100, 200)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+
+        assert stored_sequence_numbers(tmp) == list(range(1, 121))
+        manager = SegmentedHistoryManager(tmp, legacy_filepath=None)
+        assert manager.add_prediction(make_prediction(300))["sequence_number"] == 121
+
+
+if __name__ == "__main__":
+    test_rotation_by_size()
+    print("✓ Segments roll over by size, listing the directory only on rollover")
+    test_rotation_by_age_after_restart()
+    print("✓ Segments roll over by age, also after a restart")
+    test_migration_from_history_json()
+    print("✓ history.json is imported once")
+    test_sequence_recovered_after_restart()
+    print("✓ Sequence numbers continue after a restart")
+    test_two_managers_share_a_directory()
+    print("✓ Two managers see each other's writes and rollovers")
+    test_processes_get_unique_sequence_numbers()
+    print("✓ Concurrent writer processes get unique sequence numbers")
+    print("\n✅ All tests passed!")
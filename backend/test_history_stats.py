@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Test script for persisting the history aggregates on an interval"""
+
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from app.history import HistoryManager
+from app.history_segments import SegmentedHistoryManager
+from app.history_stats import HistoryStats, load_stats, save_stats
+
+
+def make_prediction(i):
+    return {
+        "transaction_id": f"tx-{i:03d}",
+        "is_fraud": i % 3 == 0,
+        "fraud_probability": i / 100,
+        "risk_score": i,
+        "risk_level": "HIGH" if i % 3 == 0 else "LOW",
+        "timestamp": f"2025-12-10T{10 + i // 60:02d}:{i % 60:02d}:00",
+    }
+
+
+def managers(tmp, stats_persist_seconds):
+    """(name, factory) pairs; a factory reopens the same storage"""
+    return [
+        ("json", lambda: HistoryManager(
+            os.path.join(tmp, "history.json"), stats_persist_seconds=stats_persist_seconds)),
+        ("segments", lambda: SegmentedHistoryManager(
+            os.path.join(tmp, "segments"), legacy_filepath=None, stats_persist_seconds=stats_persist_seconds)),
+    ]
+
+
+def test_writes_do_not_rewrite_stats_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, open_manager in managers(tmp, stats_persist_seconds=3600):
+            manager = open_manager()
+            manager.add_prediction(make_prediction(0))
+            saved_after_first = load_stats(manager._stats_path())[1]
+            with mock.patch("app.history.save_stats") as save_stats:
+                for i in range(1, 20):
+                    manager.add_prediction(make_prediction(i))
+                manager.add_predictions([make_prediction(i) for i in range(20, 25)])
+                assert save_stats.call_count == 0, name
+            assert load_stats(manager._stats_path())[1] == saved_after_first, name
+
+            # Shutdown saves the pending aggregates against the current storage
+            manager.flush_stats()
+            stats, signature = load_stats(manager._stats_path())
+            assert signature == manager._source_signature(), name
+            assert stats.to_response() == manager.get_statistics(), name
+
+            # ...which the next start trusts without parsing the history
+            with mock.patch.object(HistoryManager, "_reload_cache") as reload_cache:
+                reopened = open_manager()
+                assert reload_cache.call_count == 0, name
+            assert reopened.get_statistics()["total_predictions"] == 25, name
+
+
+def test_stale_stats_file_is_rebuilt():
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, open_manager in managers(tmp, stats_persist_seconds=3600):
+            manager = open_manager()
+            for i in range(12):
+                manager.add_prediction(make_prediction(i))
+            expected = manager.get_statistics()
+            trends = manager.get_trends("hour")
+            # No flush: the file was saved against an older signature
+            assert load_stats(manager._stats_path())[1] != manager._source_signature(), name
+
+            reopened = open_manager()
+            assert reopened.get_statistics() == expected, name
+            assert reopened.get_trends("hour") == trends, name
+
+
+def test_interval_elapsed_saves_on_write():
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, open_manager in managers(tmp, stats_persist_seconds=0):
+            manager = open_manager()
+            for i in range(3):
+                manager.add_prediction(make_prediction(i))
+                stats, signature = load_stats(manager._stats_path())
+                assert signature == manager._source_signature(), name
+                assert stats.total == i + 1, name
+
+
+def test_concurrent_saves_do_not_collide():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.stats.json")
+        errors = []
+
+        def save(n):
+            stats = HistoryStats()
+            stats.add_many(make_prediction(i) for i in range(n))
+            try:
+                for _ in range(50):
+                    save_stats(path, stats, (n,))
+            except OSError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=save, args=(n,)) for n in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        stats, signature = load_stats(path)
+        assert stats.total == signature[0]
+        assert os.listdir(tmp) == ["history.stats.json"]
+
+
+def test_missing_risk_score_counts_as_zero():
+    records = [make_prediction(1), {**make_prediction(2), "risk_score": None}, {"id": "txn_000003"}]
+    stats = HistoryStats()
+    stats.add_many(records)
+    rebuilt = HistoryStats.from_predictions(records)
+    assert stats.to_response() == rebuilt.to_response()
+    assert stats.score_sum == 1
+
+
+if __name__ == "__main__":
+    test_writes_do_not_rewrite_stats_file()
+    print("✓ Writes within the interval leave the stats file alone until flushed")
+    test_stale_stats_file_is_rebuilt()
+    print("✓ A stats file behind the history is rebuilt at startup")
+    test_interval_elapsed_saves_on_write()
+    print("✓ Writes after the interval save the aggregates")
+    test_concurrent_saves_do_not_collide()
+    print("✓ Concurrent saves use separate temporary files")
+    test_missing_risk_score_counts_as_zero()
+    print("✓ Records without a risk score are counted")
+    print("\n✅ All tests passed!")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Test script for the write-behind history writer"""
+
+import os
+import stat
+import tempfile
+import threading
+import time
+
+from app.history import HistoryManager
+from app.history_writer import HistoryWriter
+from app.metrics import HISTORY_WRITE_ERRORS
+
+
+class RecordingManager:
+    """Stand-in history manager that records batches, optionally held at a gate"""
+
+    def __init__(self, gate=None, fail=False):
+        self.batches = []
+        self.gate = gate
+        self.fail = fail
+        self.writing = threading.Event()
+
+    def add_predictions(self, predictions):
+        self.writing.set()
+        if self.gate is not None:
+            self.gate.wait()
+        if self.fail:
+            raise OSError("disk full")
+        self.batches.append(list(predictions))
+        return predictions
+
+
+def write_errors():
+    return sum(value for _, _, value in HISTORY_WRITE_ERRORS.samples())
+
+
+def test_flush_writes_in_submit_order():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = HistoryManager(os.path.join(tmp, "history.json"))
+        writer = HistoryWriter(manager, flush_interval_ms=50, flush_batch_size=7)
+        predictions = [{"transaction_id": f"tx-{i:03d}", "timestamp": "2025-12-10T10:00:00", "n": i} for i in range(30)]
+        for prediction in predictions[:20]:
+            writer.submit(prediction)
+        writer.submit_many(predictions[20:])
+        writer.flush()
+
+        # Everything submitted before flush() is stored, sequence numbers in submit order
+        stored = sorted(manager.get_all_predictions(), key=lambda p: p["sequence_number"])
+        assert [p["n"] for p in stored] == list(range(30))
+        assert [p["sequence_number"] for p in stored] == list(range(1, 31))
+        writer.stop()
+
+    recording = RecordingManager()
+    writer = HistoryWriter(recording, flush_interval_ms=50, flush_batch_size=7)
+    writer.submit_many([{"n": i} for i in range(30)])
+    writer.flush()
+    assert [p["n"] for batch in recording.batches for p in batch] == list(range(30))
+    assert all(len(batch) <= 7 for batch in recording.batches)
+    writer.stop()
+
+
+def test_stop_drains_pending_writes():
+    recording = RecordingManager()
+    # Long interval: nothing would be written for a minute without stop()
+    writer = HistoryWriter(recording, flush_interval_ms=60_000, flush_batch_size=1000)
+    writer.submit_many([{"n": i} for i in range(25)])
+    started = time.monotonic()
+    writer.stop()
+    assert time.monotonic() - started < 5
+    assert [p["n"] for batch in recording.batches for p in batch] == list(range(25))
+    assert writer._thread is None
+
+    # stop() without a running thread is a no-op; a later submit starts a new one
+    writer.stop()
+    writer.submit({"n": 25})
+    writer.stop()
+    assert recording.batches[-1] == [{"n": 25}]
+
+
+def test_full_queue_blocks_submit():
+    gate = threading.Event()
+    recording = RecordingManager(gate=gate)
+    writer = HistoryWriter(recording, max_queue_size=3, flush_interval_ms=0, flush_batch_size=1)
+    writer.submit({"n": 0})
+    assert recording.writing.wait(5)   # the writer thread holds n=0 at the gate
+    for i in range(1, 4):
+        writer.submit({"n": i})        # fills the queue
+
+    submitted = threading.Event()
+    producer = threading.Thread(target=lambda: (writer.submit({"n": 4}), submitted.set()))
+    producer.start()
+    # The caller waits for room instead of the queue growing or dropping items
+    assert not submitted.wait(0.2)
+    assert writer._queue.qsize() == 3
+
+    gate.set()
+    assert submitted.wait(5)
+    producer.join()
+    writer.stop()
+    assert [p["n"] for batch in recording.batches for p in batch] == list(range(5))
+
+
+def test_failed_write_is_counted_and_writer_continues():
+    failing = RecordingManager(fail=True)
+    writer = HistoryWriter(failing, flush_interval_ms=10, flush_batch_size=2)
+    before = write_errors()
+    writer.submit_many([{"n": i} for i in range(3)])
+    writer.flush()                     # returns although the writes failed
+    assert write_errors() - before == 3
+
+    failing.fail = False
+    writer.submit({"n": 3})
+    writer.stop()
+    assert failing.batches == [[{"n": 3}]]
+
+
+def file_mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_atomic_save_keeps_file_mode():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.json")
+        manager = HistoryManager(path)
+        writer = HistoryWriter(manager, flush_interval_ms=10)
+        for mode in (0o644, 0o640):
+            os.chmod(path, mode)
+            writer.submit({"transaction_id": f"tx-{mode:o}", "timestamp": "2025-12-10T10:00:00"})
+            writer.flush()
+            assert file_mode(path) == mode
+        writer.stop()
+
+        # A new file gets the usual umask-based mode, not mkstemp's 0600
+        os.remove(path)
+        manager.clear_history()
+        umask = os.umask(0)
+        os.umask(umask)
+        assert file_mode(path) == 0o666 & ~umask
+        assert file_mode(path) == file_mode(manager._stats_path())
+
+
+if __name__ == "__main__":
+    test_flush_writes_in_submit_order()
+    print("✓ flush() waits for every submitted prediction, written in order")
+    test_stop_drains_pending_writes()
+    print("✓ stop() drains pending writes")
+    test_full_queue_blocks_submit()
+    print("✓ A full queue blocks submit() until the writer catches up")
+    test_failed_write_is_counted_and_writer_continues()
+    print("✓ Failed writes are counted and the writer keeps going")
+    test_atomic_save_keeps_file_mode()
+    print("✓ Replacing the history file keeps its permissions")
+    print("\n✅ All tests passed!")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Test script for the prediction cache"""
+
+import time
+
+from app.ml.prediction_cache import PredictionCache
+
+
+def test_lru_eviction():
+    cache = PredictionCache(max_items=2, ttl_seconds=0)
+    cache.put(b"a", 0.1)
+    cache.put(b"b", 0.2)
+    assert cache.get(b"a") == 0.1          # a is now most recently used
+    cache.put(b"c", 0.3)                   # evicts b
+    assert cache.get(b"b") is None
+    assert cache.get(b"c") == 0.3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 1, 1, 2)
+
+
+def test_ttl_expiry():
+    cache = PredictionCache(max_items=10, ttl_seconds=0.05)
+    cache.put(b"a", 0.5)
+    assert cache.get(b"a") == 0.5
+    time.sleep(0.06)
+    assert cache.get(b"a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_clear_drops_stale_scores():
+    cache = PredictionCache(max_items=10, ttl_seconds=0)
+    generation = cache.generation
+    cache.put(b"a", 0.5)
+    cache.clear()                          # model reloaded while b was being scored
+    cache.put(b"b", 0.7, generation)
+    assert cache.get(b"a") is None
+    assert cache.get(b"b") is None
+
+
+if __name__ == "__main__":
+    test_lru_eviction()
+    print("✓ LRU eviction")
+    test_ttl_expiry()
+    print("✓ TTL expiry")
+    test_clear_drops_stale_scores()
+    print("✓ Clear invalidates in-flight scores")
+    print("\n✅ All tests passed!")
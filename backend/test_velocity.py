@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Test script for the per-user velocity counters"""
+
+import random
+
+from app.velocity import WINDOWS, VelocityStore
+
+
+def brute_force(events, user_id, now):
+    """Count and amount per window, bucket-aligned like the ring counters"""
+    features = {}
+    for name, span, buckets in WINDOWS:
+        width = span / buckets
+        first = int(now // width) - buckets + 1
+        selected = [amount for user, ts, amount in events if user == user_id and first <= int(ts // width) <= int(now // width)]
+        features[f"count_{name}"] = len(selected)
+        features[f"amount_{name}"] = round(sum(selected), 2)
+    return features
+
+
+def test_sliding_windows():
+    rng = random.Random(7)
+    store = VelocityStore()
+    events, now = [], 1_700_000_000.0
+    for _ in range(3000):
+        now += rng.expovariate(1 / 120)
+        user = f"u{rng.randint(1, 5)}"
+        amount = round(rng.uniform(1, 500), 2)
+        events.append((user, now, amount))
+        assert store.record(user, amount, now) == brute_force(events, user, now)
+    for user in ("u1", "u2", "u9"):
+        assert store.features(user, now + 1800) == brute_force(events, user, now + 1800)
+
+
+def test_bounded_users():
+    store = VelocityStore(max_users=2)
+    store.record("a", 10, 1000.0)
+    store.record("b", 10, 1001.0)
+    store.record("c", 10, 1002.0)
+    assert store.features("a", 1003.0)["count_10m"] == 0
+    assert store.stats()["evicted"] == 1
+
+    # Idle users are dropped once every window is empty
+    store.record("d", 10, 1002.0 + 86400 * 2)
+    assert store.expired == 2
+
+
+if __name__ == "__main__":
+    test_sliding_windows()
+    print("✓ Sliding windows match a full scan")
+    test_bounded_users()
+    print("✓ Bounded users and idle eviction")
+    print("\n✅ All tests passed!")
@@ -132,5 +132,18 @@ export interface ChatResponse {
     decision: string
     advice: string
   }
+  txs?: Record<string, any>[]
+  results?: {
+    risk_score: number
+    decision: string
+    advice: string
+  }[]
+  summary?: {
+    total: number
+    omitted: number
+    BLOQUEAR: number
+    REVISAR: number
+    APROBAR: number
+  }
   history?: ChatMessage[]
 }
\ No newline at end of file